@@ -0,0 +1,272 @@
+"""
+Replay and load-test harness for the alert processor
+
+Drives handler() in-process with events exported from ObservabilityEventArchive
+or a synthetic alarm storm. AWS clients are replaced with local stubs that count
+calls and can add simulated latency, so results are comparable between runs.
+
+Usage:
+    python benchmarks/alert_load_test.py --alarms 5000 --resources 200 --flap-rate 0.3
+    python benchmarks/alert_load_test.py --archive exported-events.jsonl --batch-size 10
+    python benchmarks/alert_load_test.py --json > baseline.json
+    python benchmarks/alert_load_test.py --baseline baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+
+SEVERITIES = ['critical', 'high', 'medium', 'low']
+# Alarm name suffixes the default severity rules map to each severity
+SEVERITY_KEYWORDS = {
+    'critical': 'service-down',
+    'high': 'error-rate',
+    'medium': 'latency-slow',
+    'low': 'disk-usage'
+}
+REPORT_FIELDS = [
+    'invocations_per_s', 'alerts_per_s', 'p50_ms', 'p95_ms', 'p99_ms',
+    'sns_calls_per_alert', 'eventbridge_calls_per_alert'
+]
+
+
+class StubClient:
+    """Local stand-in for a boto3 client that counts calls and simulates latency"""
+
+    def __init__(self, responses=None, latency_ms: float = 0.0):
+        self.responses = responses or {}
+        self.latency_ms = latency_ms
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, operation):
+        if operation.startswith('_'):
+            raise AttributeError(operation)
+
+        def call(**kwargs):
+            with self._lock:
+                self.calls[operation] += 1
+            if self.latency_ms:
+                time.sleep(self.latency_ms / 1000)
+            response = self.responses.get(operation, {})
+            return response(**kwargs) if callable(response) else response
+
+        return call
+
+
+def _put_events(Entries):
+    """Accept every entry"""
+    return {'FailedEntryCount': 0, 'Entries': [{'EventId': str(uuid.uuid4())} for _ in Entries]}
+
+
+def install_stubs(sns_latency_ms: float, events_latency_ms: float):
+    """Replace every client the alert processor uses with a local stub"""
+    stubs = {
+        'sns': StubClient({'publish': {'MessageId': 'stub'}}, sns_latency_ms),
+        'events': StubClient({'put_events': _put_events}, events_latency_ms),
+        'ec2': StubClient({'describe_instances': {'Reservations': []}}),
+        'rds': StubClient({'describe_db_instances': {'DBInstances': []}}),
+        'resourcegroupstaggingapi': StubClient({'get_resources': {'ResourceTagMappingList': []}}),
+        'sts': StubClient({'get_caller_identity': {'Account': '123456789012'}}),
+        's3': StubClient(),
+        'ssm': StubClient()
+    }
+    for name, stub in stubs.items():
+        bootstrap.set_client(name, stub)
+    return stubs
+
+
+def configure_environment():
+    """Point the processor at stubbed topics and keep all state in memory"""
+    os.environ.setdefault('AWS_REGION', 'us-east-1')
+    os.environ.setdefault('ENVIRONMENT', 'loadtest')
+    os.environ['EVENT_BUS_NAME'] = 'loadtest-bus'
+    for severity in SEVERITIES:
+        os.environ[f"TOPIC_ARN_{severity.upper()}"] = f"arn:aws:sns:us-east-1:123456789012:loadtest-{severity}"
+    for name in ('DEDUP_TABLE_NAME', 'DEDUP_SQLITE_PATH', 'SEVERITY_RULES_FILE', 'SEVERITY_RULES_PARAMETER'):
+        os.environ.pop(name, None)
+
+
+def load_archive(path: str):
+    """Read EventBridge events from a JSON array or JSON-lines export"""
+    with open(path) as f:
+        content = f.read().strip()
+    if content.startswith('['):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def synthetic_storm(alarms: int, resources: int, flap_rate: float, severity_mix, seed: int = 42):
+    """Generate alarm state changes across a pool of resources
+
+    With probability flap_rate a resource flaps: an OK transition is emitted
+    before it goes back into ALARM.
+    """
+    rng = random.Random(seed)
+    severities, weights = zip(*severity_mix.items())
+    names = [
+        f"loadtest-{index:05d}-{SEVERITY_KEYWORDS[rng.choices(severities, weights)[0]]}"
+        for index in range(resources)
+    ]
+    start = datetime.now(timezone.utc) - timedelta(seconds=alarms)
+
+    events = []
+    while len(events) < alarms:
+        index = rng.randrange(resources)
+        states = ['OK', 'ALARM'] if rng.random() < flap_rate else ['ALARM']
+        for state in states:
+            changed_at = start + timedelta(seconds=len(events))
+            events.append({
+                'id': str(uuid.uuid4()),
+                'source': 'aws.cloudwatch',
+                'detail-type': 'CloudWatch Alarm State Change',
+                'time': changed_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'detail': {
+                    'alarmName': names[index],
+                    'state': {
+                        'value': state,
+                        'reason': 'Threshold Crossed: 1 datapoint was greater than the threshold',
+                        'timestamp': changed_at.strftime('%Y-%m-%dT%H:%M:%S.000+0000')
+                    },
+                    'configuration': {'metrics': [{'metricStat': {'metric': {
+                        'namespace': 'AWS/EC2',
+                        'name': 'CPUUtilization',
+                        'dimensions': {'InstanceId': f"i-{index:017x}"}
+                    }}}]}
+                }
+            })
+    return events[:alarms]
+
+
+def invocations(events, batch_size: int):
+    """Shape events as single EventBridge invocations or SQS batches"""
+    if batch_size <= 1:
+        return [(event, 1) for event in events]
+
+    batches = []
+    for start in range(0, len(events), batch_size):
+        chunk = events[start:start + batch_size]
+        records = [{'eventSource': 'aws:sqs', 'messageId': event.get('id', str(position)), 'body': json.dumps(event)}
+                   for position, event in enumerate(chunk)]
+        batches.append(({'Records': records}, len(chunk)))
+    return batches
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def run(events, batch_size: int, sns_latency_ms: float, events_latency_ms: float):
+    """Replay events through handler() and return the report"""
+    configure_environment()
+    bootstrap.reset()
+    stubs = install_stubs(sns_latency_ms, events_latency_ms)
+
+    from alert_processor import handler as alert_handler
+
+    latencies = []
+    failures = 0
+    alerts = 0
+    # EMF lines and handler logs would dominate the runtime when printed
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for payload, count in invocations(events, batch_size):
+            start = time.perf_counter()
+            response = alert_handler.handler(payload, None)
+            latencies.append((time.perf_counter() - start) * 1000)
+            alerts += count
+            if 'batchItemFailures' in response:
+                failures += len(response['batchItemFailures'])
+            elif response.get('statusCode') != 200:
+                failures += 1
+        elapsed = time.perf_counter() - started
+
+    sns_calls = sum(stubs['sns'].calls.values())
+    eventbridge_calls = sum(stubs['events'].calls.values())
+    return {
+        'invocations': len(latencies),
+        'alerts': alerts,
+        'failures': failures,
+        'duration_s': round(elapsed, 3),
+        'invocations_per_s': round(len(latencies) / elapsed, 1),
+        'alerts_per_s': round(alerts / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'sns_calls': sns_calls,
+        'eventbridge_calls': eventbridge_calls,
+        'sns_calls_per_alert': round(sns_calls / alerts, 4),
+        'eventbridge_calls_per_alert': round(eventbridge_calls / alerts, 4)
+    }
+
+
+def print_report(report, baseline=None):
+    """Print the report, with the change against a baseline when given"""
+    for field, value in report.items():
+        line = f"{field:>28}: {value}"
+        if baseline and field in REPORT_FIELDS and baseline.get(field):
+            change = (value - baseline[field]) / baseline[field] * 100
+            line += f"  (baseline {baseline[field]}, {change:+.1f}%)"
+        print(line)
+
+
+def _severity_mix(value: str):
+    """Parse 'critical=1,high=2,medium=3,low=4' into weights"""
+    mix = {}
+    for part in value.split(','):
+        severity, weight = part.split('=')
+        if severity not in SEVERITY_KEYWORDS:
+            raise argparse.ArgumentTypeError(f"Unknown severity: {severity}")
+        mix[severity] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--archive', help='EventBridge events exported from ObservabilityEventArchive')
+    parser.add_argument('--alarms', type=int, default=2000, help='synthetic alarm state changes to generate')
+    parser.add_argument('--resources', type=int, default=100, help='distinct alarms in the synthetic storm')
+    parser.add_argument('--flap-rate', type=float, default=0.2, help='probability of an OK/ALARM flap')
+    parser.add_argument('--severity-mix', type=_severity_mix, default='critical=1,high=2,medium=3,low=4')
+    parser.add_argument('--batch-size', type=int, default=1, help='records per SQS batch; 1 sends single events')
+    parser.add_argument('--sns-latency-ms', type=float, default=0.0, help='simulated latency per SNS call')
+    parser.add_argument('--events-latency-ms', type=float, default=0.0, help='simulated latency per put_events call')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON, e.g. to save a baseline')
+    parser.add_argument('--baseline', help='JSON report of an earlier run to compare against')
+    args = parser.parse_args()
+
+    if args.archive:
+        events = load_archive(args.archive)
+    else:
+        events = synthetic_storm(args.alarms, args.resources, args.flap_rate, args.severity_mix, args.seed)
+
+    report = run(events, args.batch_size, args.sns_latency_ms, args.events_latency_ms)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark alert serialization time and bytes per alert, before and after AlertPayloadBuilder
+
+Usage: python benchmarks/bench_alert_payload.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+from alert_processor.services.alert_payload import AlertPayloadBuilder
+from alert_processor.services.notification_service import NotificationService
+
+ITERATIONS = 5000
+
+
+def _alarm_alert(metric_count: int):
+    """Enriched CloudWatch alarm alert with a realistic source_detail"""
+    metrics = [{
+        'id': f"m{index}",
+        'metricStat': {
+            'metric': {
+                'namespace': 'AWS/EC2',
+                'name': 'CPUUtilization',
+                'dimensions': {'InstanceId': f"i-{index:017x}"}
+            },
+            'period': 300,
+            'stat': 'Average'
+        },
+        'returnData': index == 0
+    } for index in range(metric_count)]
+
+    return {
+        'timestamp': '2024-01-01T00:00:00+00:00',
+        'alert_type': 'cloudwatch_alarm',
+        'alarm_name': 'payments-api-cpu-high',
+        'state': 'ALARM',
+        'reason': 'Threshold Crossed: 2 out of the last 3 datapoints were greater than the threshold (80.0).',
+        'severity': 'high',
+        'environment': 'prod',
+        'runbook_url': 'https://runbooks.example.com/payments-api-cpu-high',
+        'dashboard_url': 'https://console.aws.amazon.com/cloudwatch/home?region=us-east-1#dashboards:',
+        'source_detail': {
+            'alarmName': 'payments-api-cpu-high',
+            'state': {'value': 'ALARM', 'reason': 'Threshold Crossed', 'timestamp': '2024-01-01T00:00:00.000+0000'},
+            'previousState': {'value': 'OK', 'reason': 'Threshold Crossed', 'timestamp': '2023-12-31T23:00:00.000+0000'},
+            'configuration': {'description': 'CPU above 80% for 10 minutes', 'metrics': metrics}
+        }
+    }
+
+
+def _before(alert, formatter):
+    """Previous path: indented SNS body, separate EventBridge dump, unused text rendering"""
+    formatter(alert)
+    sns_message = json.dumps(alert, indent=2)
+    detail = json.dumps(alert)
+    return len(sns_message.encode('utf-8')) + len(detail.encode('utf-8'))
+
+
+def _after(alert, formatter):
+    """New path: one compact dump shared by SNS and EventBridge"""
+    builder = AlertPayloadBuilder(bucket='')
+    sns_message = builder.sns_message(alert, formatter(alert))
+    detail = builder.eventbridge_detail(alert)
+    return len(sns_message.encode('utf-8')) + len(detail.encode('utf-8'))
+
+
+def main():
+    # Formatting never calls AWS, so the clients are placeholders
+    for name in ('sns', 'events'):
+        bootstrap.set_client(name, object())
+    formatter = NotificationService()._format_alert_message
+
+    print(f"{'metrics':>8} {'before us':>10} {'after us':>9} {'before bytes':>13} {'after bytes':>12}")
+    for metric_count in (1, 10, 100):
+        alert = _alarm_alert(metric_count)
+        before_seconds = timeit.timeit(lambda: _before(alert, formatter), number=ITERATIONS)
+        after_seconds = timeit.timeit(lambda: _after(alert, formatter), number=ITERATIONS)
+
+        print(f"{metric_count:>8} {before_seconds / ITERATIONS * 1e6:>10.1f} {after_seconds / ITERATIONS * 1e6:>9.1f} "
+              f"{_before(alert, formatter):>13} {_after(alert, formatter):>12}")
+
+
+if __name__ == '__main__':
+    main()
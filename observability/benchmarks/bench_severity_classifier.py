@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for severity classification cost as the rule set grows
+
+Usage: python benchmarks/bench_severity_classifier.py
+"""
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from alert_processor.services.severity_classifier import SEVERITIES, SeverityClassifier
+
+RULE_COUNTS = [4, 100, 1000, 10000]
+NAMESPACES = ['AWS/EC2', 'AWS/Lambda', 'AWS/RDS', 'AWS/ECS']
+ALARM_NAMES = [
+    'payments-api-error-rate-high',
+    'orders-db-connections-warning',
+    'checkout-latency-slow-p99',
+    'search-cluster-down',
+    'nightly-batch-duration'
+]
+
+
+def _random_rules(count: int, seed: int = 42):
+    """Generate scoped keyword rules with random team and namespace"""
+    rng = random.Random(seed)
+    rules = []
+    for index in range(count):
+        keyword = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+        rules.append({
+            'severity': rng.choice(SEVERITIES),
+            'keywords': [keyword],
+            'team': f"team-{index % 50}",
+            'namespace': rng.choice(NAMESPACES)
+        })
+    return rules
+
+
+def _linear_scan(rules, alarm_name: str) -> str:
+    """Baseline: the previous any(keyword in name) scan, one pass per rule"""
+    name = alarm_name.lower()
+    best = len(SEVERITIES)
+    for rule in rules:
+        if any(keyword in name for keyword in rule['keywords']):
+            best = min(best, SEVERITIES.index(rule['severity']))
+    return SEVERITIES[best] if best < len(SEVERITIES) else 'low'
+
+
+def main():
+    print(f"{'rules':>8} {'compile ms':>11} {'compiled us/op':>15} {'cached us/op':>13} {'linear us/op':>13}")
+    for count in RULE_COUNTS:
+        rules = _random_rules(count)
+
+        compile_seconds = timeit.timeit(lambda: SeverityClassifier(rules, cache_size=0), number=1)
+        uncached = SeverityClassifier(rules, cache_size=0)
+        cached = SeverityClassifier(rules)
+
+        iterations = 2000
+        compiled = timeit.timeit(
+            lambda: [uncached.classify(name, 'AWS/Lambda', ['FunctionName'], 'team-1') for name in ALARM_NAMES],
+            number=iterations
+        )
+        memoized = timeit.timeit(
+            lambda: [cached.classify(name, 'AWS/Lambda', ['FunctionName'], 'team-1') for name in ALARM_NAMES],
+            number=iterations
+        )
+        linear = timeit.timeit(
+            lambda: [_linear_scan(rules, name) for name in ALARM_NAMES],
+            number=max(1, iterations // count)
+        ) * (iterations / max(1, iterations // count))
+
+        per_op = 1e6 / (iterations * len(ALARM_NAMES))
+        print(f"{count:>8} {compile_seconds * 1000:>11.1f} {compiled * per_op:>15.2f} "
+              f"{memoized * per_op:>13.2f} {linear * per_op:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
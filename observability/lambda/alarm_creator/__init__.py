@@ -0,0 +1 @@
+# Alarm creator Lambda package
\ No newline at end of file
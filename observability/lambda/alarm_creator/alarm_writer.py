@@ -0,0 +1,171 @@
+"""
+Rate-limited alarm writer
+Puts alarms concurrently under a token bucket that backs off when CloudWatch throttles
+"""
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+from botocore.exceptions import BotoCoreError, ClientError
+from shared import bootstrap
+
+logger = logging.getLogger(__name__)
+
+# Error codes worth another attempt; anything else fails the alarm straight away. LimitExceededException
+# is the alarm count quota, which no retry will fix
+THROTTLING_CODES = {'Throttling', 'ThrottlingException', 'TooManyRequestsException'}
+TRANSIENT_CODES = THROTTLING_CODES | {'ServiceUnavailable', 'InternalFailure', 'InternalServiceError'}
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate halves on throttling and creeps back on success"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, min_rate: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # Tolerance so float rounding after a sleep cannot leave us just short of a token
+                if self._tokens >= 1 - 1e-9:
+                    self._tokens = max(0.0, self._tokens - 1)
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self.sleep(wait)
+
+    def throttled(self):
+        """Multiplicative decrease after a throttling error"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def succeeded(self):
+        """Additive increase back towards the configured rate"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class AlarmWriter:
+    """Writes alarms on a bounded pool, never faster than ALARM_PUT_TPS
+
+    ALARM_PUT_TPS should match the account's PutMetricAlarm quota, and the
+    cloudwatch client should make a single attempt so botocore does not retry
+    underneath the bucket. Throttled and transiently failed writes go to a
+    retry queue that is drained after the first pass with jittered exponential
+    backoff, up to ALARM_PUT_ATTEMPTS attempts per alarm. Writes not started by
+    the deadline are deferred and left for the next reconciliation instead of
+    running into the Lambda timeout.
+    """
+
+    def __init__(self, cloudwatch, rate: Optional[float] = None, workers: Optional[int] = None,
+                 attempts: Optional[int] = None, bucket: Optional[TokenBucket] = None,
+                 deadline: Optional[float] = None, sleep: Callable[[float], None] = time.sleep):
+        if rate is None:
+            rate = float(os.environ.get('ALARM_PUT_TPS', '3'))
+        if workers is None:
+            workers = int(os.environ.get('ALARM_WRITER_WORKERS', '4'))
+        if attempts is None:
+            attempts = int(os.environ.get('ALARM_PUT_ATTEMPTS', '5'))
+
+        self.cloudwatch = cloudwatch
+        self.bucket = bucket or TokenBucket(rate)
+        self.workers = workers
+        self.attempts = attempts
+        # time.monotonic() value after which no new write starts
+        self.deadline = deadline
+        self.sleep = sleep
+        self.stats = {'written': 0, 'failed': 0, 'deferred': 0, 'retries': 0, 'throttled': 0, 'seconds': 0.0}
+        self._lock = threading.Lock()
+
+    def put_all(self, definitions: List[Dict[str, Any]]) -> Set[str]:
+        """Put every alarm and return the names of those that failed or were deferred"""
+        start = time.perf_counter()
+        pool = bootstrap.get_service(
+            'alarm_writer_pool',
+            lambda: ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='alarm-writer')
+        )
+
+        pending = definitions
+        failed: Set[str] = set()
+        deferred: Set[str] = set()
+        for attempt in range(1, self.attempts + 1):
+            if not pending or self._past_deadline():
+                break
+            if attempt > 1:
+                delay = random.uniform(0, min(10.0, 0.5 * 2 ** (attempt - 2)))
+                logger.info(f"Retrying {len(pending)} alarms in {delay:.2f} s (attempt {attempt})")
+                self.sleep(delay)
+                with self._lock:
+                    self.stats['retries'] += len(pending)
+
+            outcomes = list(pool.map(self._put, pending))
+            retry = [d for d, outcome in zip(pending, outcomes) if outcome == 'retry']
+            failed.update(d['AlarmName'] for d, outcome in zip(pending, outcomes) if outcome == 'failed')
+            deferred.update(d['AlarmName'] for d, outcome in zip(pending, outcomes) if outcome == 'deferred')
+            pending = retry
+
+        # Whatever is still queued either ran out of time or out of attempts
+        (deferred if self._past_deadline() else failed).update(d['AlarmName'] for d in pending)
+        with self._lock:
+            self.stats['failed'] += len(failed)
+            self.stats['deferred'] += len(deferred)
+            self.stats['seconds'] += time.perf_counter() - start
+        return failed | deferred
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals for the run, including throughput in alarms per second"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['seconds'] = round(stats['seconds'], 3)
+        stats['per_second'] = round(stats['written'] / stats['seconds'], 2) if stats['seconds'] else 0.0
+        stats['final_rate'] = round(self.bucket.rate, 2)
+        return stats
+
+    def _put(self, definition: Dict[str, Any]) -> str:
+        """One rate-limited write; returns 'written', 'retry', 'failed' or 'deferred'"""
+        if self._past_deadline():
+            return 'deferred'
+        self.bucket.acquire()
+        try:
+            self.cloudwatch.put_metric_alarm(**definition)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code in THROTTLING_CODES:
+                self.bucket.throttled()
+                with self._lock:
+                    self.stats['throttled'] += 1
+            if code in TRANSIENT_CODES:
+                return 'retry'
+            logger.warning(f"Failed to put alarm {definition['AlarmName']}: {e}")
+            return 'failed'
+        except BotoCoreError as e:
+            # Timeouts and dropped connections
+            logger.info(f"Retrying alarm {definition['AlarmName']} after {e}")
+            return 'retry'
+        except Exception as e:
+            logger.warning(f"Failed to put alarm {definition['AlarmName']}: {e}")
+            return 'failed'
+
+        self.bucket.succeeded()
+        with self._lock:
+            self.stats['written'] += 1
+        return 'written'
+
+    def _past_deadline(self) -> bool:
+        """True once no new write should start"""
+        return self.deadline is not None and time.monotonic() > self.deadline
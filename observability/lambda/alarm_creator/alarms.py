@@ -0,0 +1,124 @@
+"""
+Auto-discovered alarm definitions
+Maps inventory resources to the CloudWatch alarms that watch them
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+ALARM_PREFIX = 'AutoDiscovered-'
+
+# Fleet mode: one Metrics Insights alarm per group, evaluated per contributor of the GROUP BY
+FLEET_ALARMS = {
+    'ec2_instances': {
+        'label': 'EC2-CPU', 'namespace': 'AWS/EC2', 'dimension': 'InstanceId', 'metric': 'CPUUtilization',
+        'function': 'MAX', 'threshold': 80.0, 'description': 'high CPU',
+        'default_group_tag': 'aws:autoscaling:groupName'
+    },
+    'lambda_functions': {
+        'label': 'Lambda-Errors', 'namespace': 'AWS/Lambda', 'dimension': 'FunctionName', 'metric': 'Errors',
+        'function': 'SUM', 'threshold': 5.0, 'description': 'errors', 'default_group_tag': ''
+    }
+}
+
+
+def home_inventory(inventory: Dict[str, List[Dict[str, Any]]], account_id: str,
+                   region: str) -> Dict[str, List[Dict[str, Any]]]:
+    """The resources in the account and region the alarms are written to
+
+    Alarm names and dimensions carry only the resource id, and a metric alarm
+    only sees metrics of its own account and region, so resources elsewhere
+    get no alarms rather than colliding with, or deleting, local ones.
+    """
+    return {
+        resource_type: [r for r in resources if is_home(r, account_id, region)]
+        for resource_type, resources in inventory.items()
+    }
+
+
+def is_home(resource: Dict[str, Any], account_id: str, region: str) -> bool:
+    """True for resources in the given account and region"""
+    return resource.get('account_id') == account_id and resource.get('region') == region
+
+
+def alarm_definitions(resource_type: str, resource: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """put_metric_alarm arguments for every alarm a resource should have"""
+    if resource_type == 'ec2_instances':
+        return [{
+            'AlarmName': f"{ALARM_PREFIX}EC2-CPU-{resource['id']}",
+            'ComparisonOperator': 'GreaterThanThreshold',
+            'EvaluationPeriods': 2,
+            'MetricName': 'CPUUtilization',
+            'Namespace': 'AWS/EC2',
+            'Period': 300,
+            'Statistic': 'Average',
+            'Threshold': 80.0,
+            'ActionsEnabled': True,
+            'AlarmDescription': f"Auto-discovered high CPU alarm for {resource['id']}",
+            'Dimensions': [{'Name': 'InstanceId', 'Value': resource['id']}]
+        }]
+    if resource_type == 'lambda_functions':
+        return [{
+            'AlarmName': f"{ALARM_PREFIX}Lambda-Errors-{resource['id']}",
+            'ComparisonOperator': 'GreaterThanThreshold',
+            'EvaluationPeriods': 2,
+            'MetricName': 'Errors',
+            'Namespace': 'AWS/Lambda',
+            'Period': 300,
+            'Statistic': 'Sum',
+            'Threshold': 5.0,
+            'ActionsEnabled': True,
+            'AlarmDescription': f"Auto-discovered error alarm for {resource['id']}",
+            'Dimensions': [{'Name': 'FunctionName', 'Value': resource['id']}]
+        }]
+    return []
+
+
+def fleet_alarm_definitions(inventory: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """put_metric_alarm arguments for the fleet-level alarms covering an inventory
+
+    Resources are grouped by ALARM_FLEET_GROUP_TAG_<TYPE> (EC2 defaults to the
+    Auto Scaling group tag) and each group gets one query alarm. Without a
+    group tag the whole fleet shares one alarm; resources missing a configured
+    tag cannot be selected by a tag query and keep their per-resource alarms.
+    """
+    definitions = []
+    for resource_type, spec in FLEET_ALARMS.items():
+        resources = inventory.get(resource_type, [])
+        if not resources:
+            continue
+        tag = os.environ.get(f"ALARM_FLEET_GROUP_TAG_{resource_type.split('_')[0].upper()}", spec['default_group_tag'])
+        if not tag:
+            definitions.append(_fleet_alarm(spec, None, None))
+            continue
+
+        groups = sorted({resource.get('tags', {}).get(tag) for resource in resources} - {None})
+        definitions.extend(_fleet_alarm(spec, tag, group) for group in groups)
+        for resource in resources:
+            if tag not in resource.get('tags', {}):
+                definitions.extend(alarm_definitions(resource_type, resource))
+    return definitions
+
+
+def _fleet_alarm(spec: Dict[str, Any], tag: Optional[str], group: Optional[str]) -> Dict[str, Any]:
+    """One Metrics Insights alarm over a tag group, or over the whole fleet when group is None"""
+    where = ''
+    if group is not None:
+        escaped = group.replace("'", "\\'")
+        where = f" WHERE tag.\"{tag}\" = '{escaped}'"
+    query = (f"SELECT {spec['function']}({spec['metric']}) FROM SCHEMA(\"{spec['namespace']}\", {spec['dimension']})"
+             f"{where} GROUP BY {spec['dimension']} ORDER BY {spec['function']}() DESC LIMIT 500")
+    scope = f"{tag}={group}" if group is not None else 'the whole fleet'
+    return {
+        'AlarmName': f"{ALARM_PREFIX}Fleet-{spec['label']}" + (f"-{group}" if group is not None else ''),
+        'ComparisonOperator': 'GreaterThanThreshold',
+        'EvaluationPeriods': 2,
+        'Threshold': spec['threshold'],
+        'ActionsEnabled': True,
+        'AlarmDescription': f"Auto-discovered fleet {spec['description']} alarm for {scope}, per {spec['dimension']}",
+        'Metrics': [{'Id': 'q1', 'Expression': query, 'Period': 300, 'ReturnData': True}]
+    }
+
+
+def alarm_names(resource_type: str, resource: Dict[str, Any]) -> List[str]:
+    """Names of the alarms a resource has, e.g. to delete them once it is gone"""
+    return [definition['AlarmName'] for definition in alarm_definitions(resource_type, resource)]
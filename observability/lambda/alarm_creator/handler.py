@@ -0,0 +1,91 @@
+"""
+Alarm creator Lambda function
+Reconciles auto-discovered alarms with the discovery delta, or with the whole inventory hourly
+"""
+import os
+import time
+import logging
+from shared import bootstrap
+from shared import inventory
+from .alarms import alarm_definitions, alarm_names, fleet_alarm_definitions, home_inventory, is_home
+from .alarm_writer import AlarmWriter
+from .reconciler import AlarmReconciler
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+@bootstrap.timed_handler
+def handler(event, context):
+    """Write only the alarms that differ from the desired state"""
+    try:
+        # Invoked through the discoverer's EventBridge destination, or directly with its response
+        payload = event.get('detail', {}).get('responsePayload', event)
+        location = payload.get('delta_location')
+        cloudwatch = bootstrap.get_client('cloudwatch')
+        account_id, region = _home()
+        # The writer paces and retries puts itself, so its client makes one attempt per call
+        writer = AlarmWriter(bootstrap.get_client('cloudwatch', max_attempts=1), deadline=_deadline(context))
+        reconciler = AlarmReconciler(cloudwatch, writer=writer)
+
+        if os.environ.get('ALARM_MODE', 'per_resource') == 'fleet':
+            # A handful of group alarms: cheap to reconcile in full, which also retires per-resource alarms
+            resources = _latest_inventory()
+            if resources is not None:
+                reconciler.sync_all(fleet_alarm_definitions(home_inventory(resources, account_id, region)))
+        elif payload.get('mode') == 'reconciliation':
+            # The hourly scan checks every alarm, including orphans the deltas never mentioned
+            resources = _latest_inventory()
+            if resources is not None:
+                resources = home_inventory(resources, account_id, region)
+                reconciler.sync_all(
+                    definition
+                    for resource_type, members in resources.items()
+                    for resource in members
+                    for definition in alarm_definitions(resource_type, resource)
+                )
+        elif location:
+            chunk_size = int(os.environ.get('ALARM_CHUNK_SIZE', str(inventory.DEFAULT_CHUNK_SIZE)))
+            for chunk in inventory.read_delta(location['bucket'], location['key'], chunk_size):
+                chunk = [r for r in chunk if is_home(r, account_id, region)]
+                reconciler.sync_changes(
+                    [d for r in chunk if r['change'] != 'removed' for d in alarm_definitions(r['type'], r)],
+                    [name for r in chunk if r['change'] == 'removed' for name in alarm_names(r['type'], r)]
+                )
+        else:
+            logger.info(f"No delta to act on: {payload.get('delta')}")
+
+        writes = reconciler.writer.summary()
+        logger.info(f"Alarms {reconciler.results} using {reconciler.calls} API calls; writes: {writes}")
+        return {'statusCode': 200, 'alarms': reconciler.results, 'api_calls': reconciler.calls, 'writes': writes}
+
+    except Exception as e:
+        # Raise so the async invocation is retried and then lands in the failure queue
+        logger.error(f"Alarm creation error: {str(e)}", exc_info=True)
+        raise
+
+
+def _latest_inventory():
+    """The latest inventory snapshot, or None when there is none to reconcile against"""
+    store = bootstrap.get_service('inventory', lambda: inventory.InventoryStore('resource_discoverer'))
+    resources = store.latest()
+    if resources is None:
+        # Reconciling against nothing would delete every auto-discovered alarm
+        logger.warning("No inventory snapshot yet, skipping the full alarm reconciliation")
+    return resources
+
+
+def _home():
+    """Account and region the alarms are written to"""
+    account_id = bootstrap.get_service(
+        'home_account', lambda: bootstrap.get_client('sts').get_caller_identity()['Account']
+    )
+    return account_id, os.environ.get('AWS_REGION', 'us-east-1')
+
+
+def _deadline(context):
+    """Stop starting writes with ALARM_WRITE_MARGIN_SECONDS of the invocation left"""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    margin = float(os.environ.get('ALARM_WRITE_MARGIN_SECONDS', '30'))
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000 - margin
@@ -0,0 +1,112 @@
+"""
+Alarm reconciler
+Diffs desired auto-discovered alarms against CloudWatch and writes only what differs
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+from .alarms import ALARM_PREFIX
+from .alarm_writer import AlarmWriter
+
+logger = logging.getLogger(__name__)
+
+# DescribeAlarms and DeleteAlarms both take up to 100 alarm names per call
+MAX_ALARMS_PER_CALL = 100
+
+# Settings put_metric_alarm writes and describe_alarms returns under the same names
+COMPARED_FIELDS = (
+    'ComparisonOperator', 'EvaluationPeriods', 'MetricName', 'Namespace', 'Period', 'Statistic',
+    'Threshold', 'ActionsEnabled', 'AlarmDescription', 'Dimensions', 'Metrics'
+)
+
+
+def comparable(alarm: Dict[str, Any]) -> Dict[str, Any]:
+    """The settings that decide whether an alarm needs to be put again"""
+    settings = {field: alarm.get(field) for field in COMPARED_FIELDS}
+    settings['Dimensions'] = sorted((d['Name'], d['Value']) for d in alarm.get('Dimensions') or [])
+    # Metrics Insights alarms are defined by their query rather than a single metric
+    settings['Metrics'] = sorted((m['Id'], m.get('Expression'), m.get('Period')) for m in alarm.get('Metrics') or [])
+    if settings['Threshold'] is not None:
+        settings['Threshold'] = float(settings['Threshold'])
+    return settings
+
+
+class AlarmReconciler:
+    """Brings AutoDiscovered-* alarms to a desired state with as few calls as possible
+
+    sync_changes looks up only the alarms of changed resources, so its calls
+    scale with the change rate; sync_all lists every alarm under the prefix
+    and also deletes the ones nothing wants any more.
+    """
+
+    def __init__(self, cloudwatch, prefix: str = ALARM_PREFIX, writer: Optional[AlarmWriter] = None):
+        self.cloudwatch = cloudwatch
+        self.prefix = prefix
+        self.writer = writer or AlarmWriter(cloudwatch)
+        self.calls = {'describe_alarms': 0, 'put_metric_alarm': 0, 'delete_alarms': 0}
+        self.results = {'created': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'failed': 0}
+
+    def sync_changes(self, desired: List[Dict[str, Any]], removed: List[str]):
+        """Put the given alarms where they differ and delete the removed ones"""
+        existing = self._existing_by_name([definition['AlarmName'] for definition in desired] + removed)
+        self._put(desired, existing)
+        self._delete([name for name in removed if name in existing])
+
+    def sync_all(self, desired: Iterable[Dict[str, Any]]):
+        """Make the alarms under the prefix exactly the desired set"""
+        wanted = {definition['AlarmName']: definition for definition in desired}
+        existing = self._existing_by_prefix()
+        self._put(list(wanted.values()), existing)
+        self._delete(sorted(name for name in existing if name not in wanted))
+
+    def _existing_by_name(self, names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Comparable settings of the named alarms that exist"""
+        existing = {}
+        for start in range(0, len(names), MAX_ALARMS_PER_CALL):
+            existing.update(self._describe(AlarmNames=names[start:start + MAX_ALARMS_PER_CALL]))
+        return existing
+
+    def _existing_by_prefix(self) -> Dict[str, Dict[str, Any]]:
+        """Comparable settings of every alarm under the prefix"""
+        return self._describe(AlarmNamePrefix=self.prefix)
+
+    def _describe(self, **kwargs) -> Dict[str, Dict[str, Any]]:
+        """Run a paginated describe_alarms for metric alarms"""
+        existing = {}
+        paginator = self.cloudwatch.get_paginator('describe_alarms')
+        for page in paginator.paginate(AlarmTypes=['MetricAlarm'], **kwargs):
+            self.calls['describe_alarms'] += 1
+            for alarm in page['MetricAlarms']:
+                existing[alarm['AlarmName']] = comparable(alarm)
+        return existing
+
+    def _put(self, desired: List[Dict[str, Any]], existing: Dict[str, Dict[str, Any]]):
+        """Put only alarms that are missing or whose settings drifted"""
+        changed = []
+        for definition in desired:
+            if existing.get(definition['AlarmName']) == comparable(definition):
+                self.results['unchanged'] += 1
+            else:
+                changed.append(definition)
+        if not changed:
+            return
+
+        retries = self.writer.stats['retries']
+        failed = self.writer.put_all(changed)
+        self.calls['put_metric_alarm'] += len(changed) + self.writer.stats['retries'] - retries
+        for definition in changed:
+            if definition['AlarmName'] in failed:
+                self.results['failed'] += 1
+            else:
+                self.results['created' if definition['AlarmName'] not in existing else 'updated'] += 1
+
+    def _delete(self, names: List[str]):
+        """Delete alarms in batches of 100"""
+        for start in range(0, len(names), MAX_ALARMS_PER_CALL):
+            batch = names[start:start + MAX_ALARMS_PER_CALL]
+            try:
+                self.calls['delete_alarms'] += 1
+                self.cloudwatch.delete_alarms(AlarmNames=batch)
+                self.results['deleted'] += len(batch)
+            except Exception as e:
+                logger.warning(f"Failed to delete {len(batch)} alarms: {e}")
+                self.results['failed'] += len(batch)
@@ -2,34 +2,99 @@
 Alert processor Lambda function
 Processes and enriches CloudWatch alarms and custom alerts
 """
+import os
+import time
+import base64
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from shared import bootstrap
+from shared.metrics import MetricsLogger
 from .services.alert_enrichment_service import AlertEnrichmentService
 from .services.notification_service import NotificationService
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+@bootstrap.timed_handler
 def handler(event, context):
     """Main Lambda handler for alert processing"""
+    metrics = MetricsLogger()
     try:
-        # Initialize services
-        enrichment_service = AlertEnrichmentService()
-        notification_service = NotificationService()
-        
-        # Process different types of events
-        if _is_cloudwatch_alarm(event):
-            return _process_cloudwatch_alarm(event, enrichment_service, notification_service)
-        elif _is_custom_alert(event):
-            return _process_custom_alert(event, enrichment_service, notification_service)
-        else:
-            logger.warning(f"Unknown event type: {event}")
-            return {'statusCode': 400, 'body': 'Unknown event type'}
-        
+        # Services and their clients are built once per container
+        enrichment_service = bootstrap.get_service('alert_enrichment', AlertEnrichmentService)
+        notification_service = bootstrap.get_service('notification', NotificationService)
+
+        try:
+            return _dispatch(event, enrichment_service, notification_service, metrics)
+        finally:
+            # Send summaries for deduplication windows that closed meanwhile,
+            # without letting a failure there replace the result of the event
+            try:
+                notification_service.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush pending notifications: {e}", exc_info=True)
+            _record_stage_latency(enrichment_service, notification_service, metrics)
+
     except Exception as e:
         logger.error(f"Error processing alert: {str(e)}", exc_info=True)
+        if _is_batch(event):
+            # SQS and Kinesis take any returned dict as success; an error retries the whole batch
+            raise
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
 
+    finally:
+        metrics.flush()
+
+def _dispatch(event, enrichment_service, notification_service, metrics):
+    """Route a single event or a batch of records to the matching processor"""
+    # Batched payloads (SQS, Kinesis, EventBridge Pipes) report per-record failures
+    if _is_batch(event):
+        return _process_batch(event, enrichment_service, notification_service, metrics)
+
+    # The schedule sends repeat summaries for windows that closed without another alert
+    if _is_dedup_sweep(event):
+        sent = notification_service.sweep()
+        return {'statusCode': 200, 'body': json.dumps({'message': 'Deduplication windows swept', 'summaries': sent})}
+
+    # Process different types of events
+    if _is_cloudwatch_alarm(event):
+        alerts, failures = _process_cloudwatch_alarm([event], enrichment_service, notification_service, metrics)
+        if failures:
+            return {'statusCode': 500, 'body': json.dumps({'error': failures[0]})}
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'CloudWatch alarm processed',
+                'alarm_name': alerts[0]['alarm_name'],
+                'severity': alerts[0]['severity']
+            })
+        }
+    elif _is_custom_alert(event):
+        alerts, failures = _process_custom_alert([event], enrichment_service, notification_service, metrics)
+        if failures:
+            return {'statusCode': 500, 'body': json.dumps({'error': failures[0]})}
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Custom alert processed',
+                'severity': alerts[0]['severity']
+            })
+        }
+    else:
+        logger.warning(f"Unknown event type: {event}")
+        return {'statusCode': 400, 'body': 'Unknown event type'}
+
+def _is_batch(event) -> bool:
+    """Check if event is a batch of records rather than a single EventBridge event"""
+    return isinstance(event, list) or 'Records' in event
+
+def _is_dedup_sweep(event) -> bool:
+    """Check if event is the scheduled deduplication sweep"""
+    return event.get('source') == 'aws.events' and event.get('detail-type') == 'Scheduled Event'
+
 def _is_cloudwatch_alarm(event) -> bool:
     """Check if event is a CloudWatch alarm"""
     return event.get('source') == 'aws.cloudwatch'
@@ -38,42 +103,224 @@ def _is_custom_alert(event) -> bool:
     """Check if event is a custom alert"""
     return 'Custom' in event.get('detail-type', '')
 
-def _process_cloudwatch_alarm(event, enrichment_service, notification_service):
-    """Process CloudWatch alarm state change"""
-    detail = event['detail']
-    
-    # Enrich the alert
-    enriched_alert = enrichment_service.enrich_cloudwatch_alarm(detail)
-    
-    # Send notifications
-    notification_service.send_alert_notification(enriched_alert)
-    
-    # Forward to EventBridge for automation
-    notification_service.send_to_eventbridge(enriched_alert)
-    
+def _record_id(record: Dict[str, Any]) -> str:
+    """Return the identifier the event source expects back for a record it should retry"""
+    source = record.get('eventSource')
+
+    if source == 'aws:sqs':
+        return record.get('messageId', '')
+
+    if source == 'aws:kinesis':
+        # Lambda nests Kinesis fields under 'kinesis', EventBridge Pipes flattens them
+        return record.get('kinesis', record).get('sequenceNumber', '')
+
+    # EventBridge Pipes delivering plain events
+    return record.get('id', '')
+
+def _unwrap_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the EventBridge event carried by a batch record"""
+    source = record.get('eventSource')
+
+    if source == 'aws:sqs':
+        return json.loads(record['body'])
+
+    if source == 'aws:kinesis':
+        return json.loads(base64.b64decode(record.get('kinesis', record)['data']))
+
+    return record
+
+def _process_batch(event, enrichment_service, notification_service, metrics):
+    """Process a batch of records in one pass and report the ones to retry"""
+    records = event if isinstance(event, list) else event['Records']
+
+    failed_ids = []
+    alarm_events, alarm_items = [], []
+    custom_events, custom_items = [], []
+
+    for record in records:
+        item_id = _record_id(record)
+        try:
+            with metrics.timer('ParseMs'):
+                inner_event = _unwrap_record(record)
+        except Exception as e:
+            logger.error(f"Unreadable batch record {item_id}: {e}")
+            failed_ids.append(item_id)
+            continue
+
+        if _is_cloudwatch_alarm(inner_event):
+            alarm_events.append(inner_event)
+            alarm_items.append(item_id)
+        elif _is_custom_alert(inner_event):
+            custom_events.append(inner_event)
+            custom_items.append(item_id)
+        else:
+            # Retrying cannot make an unknown event processable, so drop it
+            logger.warning(f"Skipping unknown event type in record {item_id}")
+
+    if alarm_events:
+        _, failures = _process_cloudwatch_alarm(alarm_events, enrichment_service, notification_service, metrics)
+        failed_ids.extend(alarm_items[position] for position in failures)
+
+    if custom_events:
+        _, failures = _process_custom_alert(custom_events, enrichment_service, notification_service, metrics)
+        failed_ids.extend(custom_items[position] for position in failures)
+
+    logger.info(f"Processed batch of {len(records)} records, {len(failed_ids)} failed")
+
     return {
-        'statusCode': 200,
-        'body': json.dumps({
-            'message': 'CloudWatch alarm processed',
-            'alarm_name': detail['alarmName'],
-            'severity': enriched_alert['severity']
-        })
+        'batchItemFailures': [{'itemIdentifier': item_id} for item_id in failed_ids]
     }
 
-def _process_custom_alert(event, enrichment_service, notification_service):
-    """Process custom application alert"""
-    detail = event['detail']
-    
-    # Enrich the alert
-    enriched_alert = enrichment_service.enrich_custom_alert(detail)
-    
-    # Send notifications
-    notification_service.send_alert_notification(enriched_alert)
-    
-    return {
-        'statusCode': 200,
-        'body': json.dumps({
-            'message': 'Custom alert processed',
-            'severity': enriched_alert['severity']
-        })
-    }
\ No newline at end of file
+def _delivery_pool() -> ThreadPoolExecutor:
+    """Thread pool for delivery calls, shared for the life of the container"""
+    workers = int(os.environ.get('DELIVERY_WORKERS', '8'))
+    return bootstrap.get_service(
+        'delivery_pool',
+        lambda: ThreadPoolExecutor(max_workers=workers, thread_name_prefix='delivery')
+    )
+
+def _succeeded(future, destination: str) -> bool:
+    """Resolve a delivery future, isolating unexpected errors to that delivery"""
+    try:
+        return bool(future.result())
+    except Exception as e:
+        logger.error(f"Unexpected {destination} delivery error: {e}", exc_info=True)
+        return False
+
+def _record_stage_latency(enrichment_service, notification_service, metrics):
+    """Move the step timings collected by the services into the invocation metrics"""
+    stage_names = {
+        'classify': 'ClassifyMs',
+        'resource_context': 'ResourceContextMs',
+        'sns': 'SnsPublishMs',
+        'eventbridge': 'EventBridgeForwardMs'
+    }
+    latencies = {**enrichment_service.take_latencies(), **notification_service.take_latencies()}
+    for stage, timings in latencies.items():
+        metrics.put_all(stage_names.get(stage, stage), timings)
+
+def _event_age_ms(event: Dict[str, Any]) -> Optional[float]:
+    """Milliseconds since the alarm changed state, or since the event was emitted"""
+    timestamp = event.get('detail', {}).get('state', {}).get('timestamp') or event.get('time')
+    if not timestamp:
+        return None
+    # CloudWatch uses '2024-01-01T00:00:00.000+0000', EventBridge '2024-01-01T00:00:00Z'
+    for timestamp_format in ('%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%dT%H:%M:%S%z'):
+        try:
+            changed_at = datetime.strptime(timestamp, timestamp_format)
+        except (TypeError, ValueError):
+            continue
+        return (time.time() - changed_at.timestamp()) * 1000
+    return None
+
+def _record_event_age(events: List[Dict[str, Any]], delivered: List[int], metrics):
+    """Record end-to-end age of the events that were delivered"""
+    for position in delivered:
+        age = _event_age_ms(events[position])
+        if age is not None:
+            metrics.put('EventAgeMs', age)
+
+def _process_cloudwatch_alarm(events: List[Dict[str, Any]], enrichment_service, notification_service, metrics):
+    """Process CloudWatch alarm state changes
+
+    Returns the enriched alerts and a mapping of failed event positions to errors
+    """
+    enriched = []
+    failures = {}
+
+    # Owner, tags and placement for every alarm in the batch, bounded by a timeout
+    enrichment_service.prefetch_resource_context([event.get('detail', {}) for event in events])
+
+    for position, event in enumerate(events):
+        try:
+            # Enrich the alert
+            with metrics.timer('EnrichMs'):
+                alert = enrichment_service.enrich_cloudwatch_alarm(event['detail'])
+        except Exception as e:
+            logger.error(f"Failed to enrich CloudWatch alarm: {e}", exc_info=True)
+            failures[position] = str(e)
+            continue
+
+        # SNS and EventBridge deliveries run side by side, so a record retried for a failed
+        # publish forwards again; the source event id lets automation recognise the repeat
+        if event.get('id'):
+            alert['alert_id'] = event['id']
+
+        # Queue for EventBridge automation
+        if not notification_service.send_to_eventbridge(alert):
+            failures[position] = f"Alarm {alert['alarm_name']} cannot be forwarded to EventBridge"
+            continue
+
+        enriched.append((position, alert))
+
+    # SNS notifications and the packed EventBridge forwarding run side by side
+    pool = _delivery_pool()
+    forwarding = pool.submit(notification_service.flush_events)
+    publishing = [
+        (position, alert, pool.submit(notification_service.send_alert_notification, alert))
+        for position, alert in enriched
+    ]
+
+    for position, alert, future in publishing:
+        if not _succeeded(future, 'SNS'):
+            failures[position] = f"SNS notification failed for alarm {alert['alarm_name']}"
+
+    # Digested alerts count as delivered only once their digest is published
+    undigested = {id(alert) for alert in notification_service.flush_digests()}
+    for position, alert in enriched:
+        if id(alert) in undigested:
+            failures.setdefault(position, f"Digest publish failed for alarm {alert['alarm_name']}")
+
+    try:
+        dropped = {id(alert) for alert in forwarding.result()}
+    except Exception as e:
+        logger.error(f"Unexpected EventBridge delivery error: {e}", exc_info=True)
+        dropped = {id(alert) for _, alert in enriched}
+
+    for position, alert in enriched:
+        if id(alert) in dropped:
+            failures.setdefault(position, f"EventBridge forwarding failed for alarm {alert['alarm_name']}")
+
+    delivered = [position for position, _ in enriched if position not in failures]
+    _record_event_age(events, delivered, metrics)
+    return [alert for position, alert in enriched if position not in failures], failures
+
+def _process_custom_alert(events: List[Dict[str, Any]], enrichment_service, notification_service, metrics):
+    """Process custom application alerts
+
+    Returns the enriched alerts and a mapping of failed event positions to errors
+    """
+    enriched = []
+    failures = {}
+
+    for position, event in enumerate(events):
+        try:
+            # Enrich the alert
+            with metrics.timer('EnrichMs'):
+                alert = enrichment_service.enrich_custom_alert(event['detail'])
+        except Exception as e:
+            logger.error(f"Failed to enrich custom alert: {e}", exc_info=True)
+            failures[position] = str(e)
+            continue
+
+        enriched.append((position, alert))
+
+    # Send notifications concurrently
+    pool = _delivery_pool()
+    publishing = [
+        (position, alert, pool.submit(notification_service.send_alert_notification, alert))
+        for position, alert in enriched
+    ]
+
+    for position, alert, future in publishing:
+        if not _succeeded(future, 'SNS'):
+            failures[position] = f"Delivery failed for custom alert from {alert['source']}"
+
+    undigested = {id(alert) for alert in notification_service.flush_digests()}
+    for position, alert in enriched:
+        if id(alert) in undigested:
+            failures.setdefault(position, f"Digest publish failed for custom alert from {alert['source']}")
+
+    delivered = [position for position, _ in enriched if position not in failures]
+    _record_event_age(events, delivered, metrics)
+    return [alert for position, alert in enriched if position not in failures], failures
@@ -3,9 +3,12 @@ Alert enrichment service
 Adds context and metadata to alerts
 """
 import os
+import time
 import logging
 from datetime import datetime, timezone
-from typing import Dict, Any
+from typing import Dict, Any, List
+from .severity_classifier import SeverityClassifier
+from .resource_context_service import ResourceContextService, alarm_contributor
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +18,27 @@ class AlertEnrichmentService:
     def __init__(self):
         self.environment = os.environ.get('ENVIRONMENT', 'unknown')
         self.runbook_base_url = os.environ.get('RUNBOOK_BASE_URL', 'https://runbooks.example.com')
+        self.severity_classifier = SeverityClassifier.from_config()
+        self.resource_context = ResourceContextService()
+        # Per-step latency, drained by take_latencies()
+        self.latency_ms: Dict[str, List[float]] = {'classify': [], 'resource_context': []}
+    
+    def prefetch_resource_context(self, alarm_details: List[Dict[str, Any]]):
+        """Resolve resource metadata for a batch of alarms before enriching them"""
+        start = time.perf_counter()
+        try:
+            self.resource_context.prefetch(alarm_details)
+        except Exception as e:
+            # Metadata is best effort; alerts go out without it
+            logger.warning(f"Resource context prefetch failed: {e}")
+        finally:
+            self.latency_ms['resource_context'].append((time.perf_counter() - start) * 1000)
+    
+    def take_latencies(self) -> Dict[str, List[float]]:
+        """Return and reset the latencies recorded per step"""
+        latencies = self.latency_ms
+        self.latency_ms = {'classify': [], 'resource_context': []}
+        return latencies
     
     def enrich_cloudwatch_alarm(self, alarm_detail: Dict[str, Any]) -> Dict[str, Any]:
         """Enrich CloudWatch alarm with additional context"""
@@ -35,6 +59,17 @@ class AlertEnrichmentService:
             'source_detail': alarm_detail
         }
         
+        # Fleet alarms fire once per contributor, which identifies the offending resource
+        if alarm_detail.get('alarmContributor'):
+            enriched_alert['contributor'] = {
+                'id': alarm_detail['alarmContributor'].get('id'),
+                'attributes': alarm_contributor(alarm_detail)
+            }
+        
+        resource_context = self.resource_context.lookup(alarm_detail)
+        if resource_context:
+            enriched_alert['resource_context'] = resource_context
+        
         return enriched_alert
     
     def enrich_custom_alert(self, alert_detail: Dict[str, Any]) -> Dict[str, Any]:
@@ -58,22 +93,20 @@ class AlertEnrichmentService:
     
     def _determine_severity(self, alarm_name: str, detail: Dict[str, Any]) -> str:
         """Determine alert severity based on alarm characteristics"""
-        alarm_name_lower = alarm_name.lower()
-        
-        # Critical severity indicators
-        if any(keyword in alarm_name_lower for keyword in ['critical', 'fatal', 'down', 'outage']):
-            return 'critical'
-        
-        # High severity indicators
-        if any(keyword in alarm_name_lower for keyword in ['error', 'high', 'failed', 'timeout']):
-            return 'high'
+        namespace = None
+        dimensions = set()
         
-        # Medium severity indicators
-        if any(keyword in alarm_name_lower for keyword in ['warning', 'medium', 'slow']):
-            return 'medium'
+        for metric in detail.get('configuration', {}).get('metrics', []):
+            metric_info = metric.get('metricStat', {}).get('metric', {})
+            namespace = namespace or metric_info.get('namespace')
+            dimensions.update(metric_info.get('dimensions', {}))
+        dimensions.update(alarm_contributor(detail))
         
-        # Default to low
-        return 'low'
+        # Owning team is only present when an upstream enrichment step adds it
+        start = time.perf_counter()
+        severity = self.severity_classifier.classify(alarm_name, namespace, dimensions, detail.get('team'))
+        self.latency_ms['classify'].append((time.perf_counter() - start) * 1000)
+        return severity
     
     def _generate_runbook_url(self, identifier: str) -> str:
         """Generate runbook URL based on alert identifier"""
@@ -0,0 +1,156 @@
+"""
+Alert payload builder
+Serializes each alert once in a compact format that fits SNS and EventBridge limits
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# SNS messages and EventBridge entries are both capped at 256 KB
+MAX_MESSAGE_BYTES = 256 * 1024
+# Room left for the EventBridge Source/DetailType and the SNS email rendering
+ENVELOPE_BYTES = 8 * 1024
+MAX_TEXT_FIELD_CHARS = 2048
+# Last resort for essential fields when even they do not fit
+MIN_TEXT_FIELD_CHARS = 256
+
+# Kept when everything else has to go
+ESSENTIAL_FIELDS = [
+    'timestamp', 'alert_type', 'alarm_name', 'state', 'severity', 'environment',
+    'source', 'message', 'reason', 'runbook_url', 'dashboard_url'
+]
+
+
+def _dumps(value: Any) -> str:
+    """Compact JSON wire format"""
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+class AlertPayloadBuilder:
+    """Builds the SNS message and EventBridge detail for an alert
+
+    The compact serialization is computed once per alert and shared by both
+    destinations. Alerts over the limit have their source_detail offloaded to
+    OBSERVABILITY_BUCKET when configured, and are truncated otherwise.
+    """
+
+    def __init__(self, bucket: Optional[str] = None, max_bytes: int = MAX_MESSAGE_BYTES, cache_size: int = 256):
+        self.bucket = bucket if bucket is not None else os.environ.get('OBSERVABILITY_BUCKET')
+        self.max_bytes = max_bytes
+        self.cache_size = cache_size
+        self.offloaded = 0
+        self.truncated = 0
+        # Keyed by id() with the alert held alongside, so ids cannot be recycled while cached
+        self._cache: 'OrderedDict[int, tuple]' = OrderedDict()
+        # S3 locations by payload digest, so re-fitting an alert never offloads it twice
+        self._locations: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compact(self, alert: Dict[str, Any]) -> str:
+        """Return the compact, size-bounded serialization of an alert"""
+        with self._lock:
+            cached = self._cache.get(id(alert))
+            if cached and cached[0] is alert:
+                self._cache.move_to_end(id(alert))
+                return cached[1]
+
+        payload = self._fit(alert, self.max_bytes - ENVELOPE_BYTES)
+        with self._lock:
+            self._cache[id(alert)] = (alert, payload)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return payload
+
+    def eventbridge_detail(self, alert: Dict[str, Any]) -> str:
+        """Detail for the automation bus: the full compact alert"""
+        return self.compact(alert)
+
+    def sns_message(self, alert: Dict[str, Any], email_text: str) -> str:
+        """Per-protocol SNS message: readable text for email, compact JSON for everything else"""
+        email_text = email_text[:ENVELOPE_BYTES // 2]
+
+        def envelope(payload: str) -> str:
+            return _dumps({'default': payload, 'email': email_text})
+
+        message = envelope(self.compact(alert))
+        if len(message.encode('utf-8')) > self.max_bytes:
+            # JSON escaping inside the envelope grew the message past the limit, so fit the envelope itself
+            message = envelope(self._fit(alert, self.max_bytes, envelope))
+        return message
+
+    def _fit(self, alert: Dict[str, Any], budget: int, wrap: Optional[Callable[[str], str]] = None) -> str:
+        """Serialize alert so that it, wrapped as sent, stays within budget bytes
+
+        Offloads source_detail first, then truncates long text, then keeps only the essential fields.
+        """
+        def size(payload: str) -> int:
+            return len((wrap(payload) if wrap else payload).encode('utf-8'))
+
+        payload = _dumps(alert)
+        if size(payload) <= budget:
+            return payload
+
+        reduced = {key: value for key, value in alert.items() if key != 'source_detail'}
+        reduced['truncated'] = True
+        location = self._offload(alert, payload)
+        if location:
+            reduced['source_detail_location'] = location
+        payload = _dumps(reduced)
+
+        if size(payload) > budget:
+            for key, value in list(reduced.items()):
+                if isinstance(value, str) and len(value) > MAX_TEXT_FIELD_CHARS:
+                    reduced[key] = value[:MAX_TEXT_FIELD_CHARS] + '...'
+            payload = _dumps(reduced)
+
+        if size(payload) > budget:
+            essential = {key: reduced[key] for key in ESSENTIAL_FIELDS if key in reduced}
+            essential.update({key: reduced[key] for key in ('truncated', 'source_detail_location') if key in reduced})
+            payload = _dumps(essential)
+
+        if size(payload) > budget:
+            essential = {key: value[:MIN_TEXT_FIELD_CHARS] if isinstance(value, str) else value
+                         for key, value in essential.items()}
+            payload = _dumps(essential)
+
+        self.truncated += 1
+        logger.warning(f"Alert payload reduced to {len(payload)} bytes to fit the {budget} byte budget")
+        return payload
+
+    def _offload(self, alert: Dict[str, Any], payload: str) -> Optional[str]:
+        """Store the full alert in the observability bucket and return its location"""
+        if not self.bucket:
+            return None
+
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        with self._lock:
+            if digest in self._locations:
+                return self._locations[digest]
+
+        key = f"alerts/{datetime.now(timezone.utc):%Y/%m/%d}/{digest}.json"
+        try:
+            from shared import bootstrap
+            bootstrap.get_client('s3').put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=payload.encode('utf-8'),
+                ContentType='application/json'
+            )
+        except Exception as e:
+            logger.error(f"Failed to offload alert payload to S3: {e}")
+            return None
+
+        self.offloaded += 1
+        location = f"s3://{self.bucket}/{key}"
+        with self._lock:
+            self._locations[digest] = location
+            if len(self._locations) > self.cache_size:
+                self._locations.popitem(last=False)
+        return location
@@ -0,0 +1,426 @@
+"""
+Alert deduplication service
+Suppresses repeat notifications for the same alarm fingerprint within a window
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Alert fields kept with a window so any container can send its repeat summary
+SUMMARY_FIELDS = (
+    'timestamp', 'alert_type', 'alarm_name', 'state', 'severity', 'environment', 'reason',
+    'source', 'message', 'runbook_url', 'dashboard_url', 'contributor'
+)
+
+
+def alert_fingerprint(alert: Dict[str, Any]) -> str:
+    """Fingerprint an alert by alarm name, state and metric dimensions, or contributor for fleet alarms"""
+    name = alert.get('alarm_name') or f"custom-{alert.get('source')}-{alert.get('message')}"
+    dimensions = []
+    for metric in alert.get('source_detail', {}).get('configuration', {}).get('metrics', []):
+        metric_dimensions = metric.get('metricStat', {}).get('metric', {}).get('dimensions', {})
+        dimensions.extend(f"{key}={value}" for key, value in metric_dimensions.items())
+    # One fleet alarm fires separately for every offending resource
+    dimensions.extend(f"{key}={value}" for key, value in alert.get('contributor', {}).get('attributes', {}).items())
+
+    key = json.dumps([name, alert.get('state'), sorted(dimensions)])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def summary_fields(alert: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of an alert stored with its window"""
+    return {field: alert[field] for field in SUMMARY_FIELDS if field in alert}
+
+
+class MemoryDedupStore:
+    """Deduplication windows held in this container only"""
+
+    def __init__(self):
+        self._windows: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def open_window(self, fingerprint: str, now: float, window_seconds: int, owner: str = '',
+                    alert: Optional[Dict[str, Any]] = None) -> Tuple[bool, int, float]:
+        """Open a window unless one is active
+
+        Returns (opened, suppressed count of the previous window, expiry of the current window)
+        """
+        with self._lock:
+            window = self._windows.get(fingerprint)
+            if window and window['expires_at'] > now:
+                return False, 0, window['expires_at']
+            previous = int(window['suppressed']) if window else 0
+            self._windows[fingerprint] = {'expires_at': now + window_seconds, 'suppressed': 0,
+                                          'owner': owner, 'alert': alert}
+            return True, previous, now + window_seconds
+
+    def add_suppressed(self, fingerprint: str, count: int):
+        """Add suppressed occurrences to the current window"""
+        with self._lock:
+            if fingerprint in self._windows:
+                self._windows[fingerprint]['suppressed'] += count
+
+    def close_window(self, fingerprint: str, now: float) -> int:
+        """Close an expired window once and return its suppressed count"""
+        with self._lock:
+            window = self._windows.get(fingerprint)
+            if not window or window['expires_at'] > now or not window['suppressed']:
+                return 0
+            suppressed = int(window['suppressed'])
+            window['suppressed'] = 0
+            return suppressed
+
+    def expired(self, now: float) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Closed windows with repeats still to summarize, with the alert that opened them"""
+        with self._lock:
+            return [(fingerprint, window['alert']) for fingerprint, window in self._windows.items()
+                    if window['expires_at'] <= now and window['suppressed']]
+
+    def delete_window(self, fingerprint: str, owner: str):
+        """Forget a window opened by owner, e.g. when the alert that opened it was not delivered"""
+        with self._lock:
+            if self._windows.get(fingerprint, {}).get('owner') == owner:
+                self._windows.pop(fingerprint, None)
+
+
+class SQLiteDedupStore:
+    """Deduplication windows shared through a SQLite file, e.g. for local runs"""
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS dedup_windows "
+            "(fingerprint TEXT PRIMARY KEY, expires_at REAL NOT NULL, suppressed INTEGER NOT NULL, "
+            "owner TEXT NOT NULL DEFAULT '', alert TEXT)"
+        )
+
+    def open_window(self, fingerprint: str, now: float, window_seconds: int, owner: str = '',
+                    alert: Optional[Dict[str, Any]] = None) -> Tuple[bool, int, float]:
+        """Open a window unless one is active"""
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                row = cursor.execute(
+                    "SELECT expires_at, suppressed FROM dedup_windows WHERE fingerprint = ?", (fingerprint,)
+                ).fetchone()
+                if row and row[0] > now:
+                    return False, 0, row[0]
+                cursor.execute(
+                    "INSERT OR REPLACE INTO dedup_windows VALUES (?, ?, 0, ?, ?)",
+                    (fingerprint, now + window_seconds, owner, json.dumps(alert) if alert is not None else None)
+                )
+                return True, row[1] if row else 0, now + window_seconds
+            finally:
+                cursor.execute("COMMIT")
+
+    def add_suppressed(self, fingerprint: str, count: int):
+        """Add suppressed occurrences to the current window"""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE dedup_windows SET suppressed = suppressed + ? WHERE fingerprint = ?", (count, fingerprint)
+            )
+
+    def close_window(self, fingerprint: str, now: float) -> int:
+        """Close an expired window once and return its suppressed count"""
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                row = cursor.execute(
+                    "SELECT suppressed FROM dedup_windows WHERE fingerprint = ? AND expires_at <= ?",
+                    (fingerprint, now)
+                ).fetchone()
+                if not row or not row[0]:
+                    return 0
+                cursor.execute("UPDATE dedup_windows SET suppressed = 0 WHERE fingerprint = ?", (fingerprint,))
+                return row[0]
+            finally:
+                cursor.execute("COMMIT")
+
+    def expired(self, now: float) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Closed windows with repeats still to summarize, with the alert that opened them"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT fingerprint, alert FROM dedup_windows WHERE expires_at <= ? AND suppressed > 0", (now,)
+            ).fetchall()
+        return [(fingerprint, json.loads(alert) if alert else None) for fingerprint, alert in rows]
+
+    def delete_window(self, fingerprint: str, owner: str):
+        """Forget a window opened by owner, e.g. when the alert that opened it was not delivered"""
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM dedup_windows WHERE fingerprint = ? AND owner = ?", (fingerprint, owner)
+            )
+
+
+class DynamoDBDedupStore:
+    """Deduplication windows shared by all containers through DynamoDB
+
+    Point AWS_ENDPOINT_URL_DYNAMODB at DynamoDB Local to run without AWS.
+    """
+
+    def __init__(self, table_name: str):
+        from shared import bootstrap
+        self.dynamodb = bootstrap.get_client('dynamodb')
+        self.table_name = table_name
+
+    def open_window(self, fingerprint: str, now: float, window_seconds: int, owner: str = '',
+                    alert: Optional[Dict[str, Any]] = None) -> Tuple[bool, int, float]:
+        """Open a window unless one is active"""
+        expires_at = now + window_seconds
+        try:
+            response = self.dynamodb.update_item(
+                TableName=self.table_name,
+                Key={'fingerprint': {'S': fingerprint}},
+                UpdateExpression='SET expires_at = :expires, suppressed = :zero, #ttl = :ttl, '
+                                 '#owner = :owner, #alert = :alert',
+                ConditionExpression='attribute_not_exists(fingerprint) OR expires_at <= :now',
+                ExpressionAttributeNames={'#ttl': 'ttl', '#owner': 'owner', '#alert': 'alert'},
+                ExpressionAttributeValues={
+                    ':expires': {'N': str(expires_at)},
+                    ':zero': {'N': '0'},
+                    ':now': {'N': str(now)},
+                    # Keep closed windows around long enough for the sweep to report their repeats
+                    ':ttl': {'N': str(int(expires_at + window_seconds))},
+                    ':owner': {'S': owner},
+                    ':alert': {'S': json.dumps(alert or {}, default=str)}
+                },
+                ReturnValues='ALL_OLD',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+        except self.dynamodb.exceptions.ConditionalCheckFailedException as e:
+            item = e.response.get('Item', {})
+            return False, 0, float(item.get('expires_at', {}).get('N', expires_at))
+
+        previous = response.get('Attributes', {}).get('suppressed', {}).get('N', '0')
+        return True, int(previous), expires_at
+
+    def add_suppressed(self, fingerprint: str, count: int):
+        """Add suppressed occurrences to the current window"""
+        self.dynamodb.update_item(
+            TableName=self.table_name,
+            Key={'fingerprint': {'S': fingerprint}},
+            UpdateExpression='ADD suppressed :count',
+            ConditionExpression='attribute_exists(fingerprint)',
+            ExpressionAttributeValues={':count': {'N': str(count)}}
+        )
+
+    def close_window(self, fingerprint: str, now: float) -> int:
+        """Close an expired window once and return its suppressed count"""
+        try:
+            response = self.dynamodb.update_item(
+                TableName=self.table_name,
+                Key={'fingerprint': {'S': fingerprint}},
+                UpdateExpression='SET suppressed = :zero',
+                ConditionExpression='expires_at <= :now AND suppressed > :zero',
+                ExpressionAttributeValues={':zero': {'N': '0'}, ':now': {'N': str(now)}},
+                ReturnValues='UPDATED_OLD'
+            )
+        except self.dynamodb.exceptions.ConditionalCheckFailedException:
+            return 0
+        return int(response['Attributes']['suppressed']['N'])
+
+    def expired(self, now: float) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Closed windows with repeats still to summarize, with the alert that opened them
+
+        A scan is fine here: TTL keeps the table to the windows of the last few minutes.
+        """
+        windows = []
+        paginator = self.dynamodb.get_paginator('scan')
+        for page in paginator.paginate(
+            TableName=self.table_name,
+            FilterExpression='expires_at <= :now AND suppressed > :zero',
+            ProjectionExpression='fingerprint, #alert',
+            ExpressionAttributeNames={'#alert': 'alert'},
+            ExpressionAttributeValues={':now': {'N': str(now)}, ':zero': {'N': '0'}}
+        ):
+            for item in page['Items']:
+                alert = item.get('alert', {}).get('S')
+                windows.append((item['fingerprint']['S'], json.loads(alert) if alert else None))
+        return windows
+
+    def delete_window(self, fingerprint: str, owner: str):
+        """Forget a window opened by owner, e.g. when the alert that opened it was not delivered"""
+        try:
+            self.dynamodb.delete_item(
+                TableName=self.table_name,
+                Key={'fingerprint': {'S': fingerprint}},
+                ConditionExpression='#owner = :owner',
+                ExpressionAttributeNames={'#owner': 'owner'},
+                ExpressionAttributeValues={':owner': {'S': owner}}
+            )
+        except self.dynamodb.exceptions.ConditionalCheckFailedException:
+            logger.info(f"Dedup window {fingerprint} was reopened by another invocation, leaving it")
+
+
+class DeduplicationService:
+    """Decides which alerts to publish and which repeats to summarize
+
+    Windows seen by this container are tracked in memory so repeats inside an
+    open window are suppressed without a store round trip; their counts are
+    pushed to the shared store on flush(). Each window keeps the alert that
+    opened it, so sweep() can summarize every closed window from a schedule,
+    whichever container counted its repeats.
+    """
+
+    def __init__(self, store=None, window_seconds: Optional[int] = None, clock=time.time):
+        if window_seconds is None:
+            window_seconds = int(os.environ.get('DEDUP_WINDOW_SECONDS', '300'))
+        self.window_seconds = window_seconds
+        self.store = store or self._create_store()
+        self.clock = clock
+        self.suppressed_total = 0
+        self._local: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Deduplication is off when the window is zero"""
+        return self.window_seconds > 0
+
+    def check(self, alert: Dict[str, Any]) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Return whether to publish the alert, and a repeat summary for a closed window if any"""
+        if not self.enabled:
+            return True, None
+
+        fingerprint = alert_fingerprint(alert)
+        now = self.clock()
+
+        with self._lock:
+            window = self._local.get(fingerprint)
+            if window and window['expires_at'] > now:
+                window['pending'] += 1
+                window['alert'] = alert
+                self.suppressed_total += 1
+                return False, None
+            pending = window['pending'] if window else 0
+
+        try:
+            # Counts from the expired window must land before it is reopened
+            if pending:
+                self.store.add_suppressed(fingerprint, pending)
+            owner = uuid.uuid4().hex
+            opened, repeated, expires_at = self.store.open_window(
+                fingerprint, now, self.window_seconds, owner, summary_fields(alert)
+            )
+        except Exception as e:
+            # Never drop an alert because the dedup store is unavailable
+            logger.error(f"Dedup store unavailable, publishing alert: {e}")
+            return True, None
+
+        with self._lock:
+            self._local[fingerprint] = {'expires_at': expires_at, 'pending': 0 if opened else 1, 'alert': alert,
+                                        'owner': owner if opened else None}
+            if not opened:
+                self.suppressed_total += 1
+
+        summary = self._summary(alert, repeated) if repeated else None
+        return opened, summary
+
+    def forget(self, alert: Dict[str, Any]):
+        """Drop the window opened for an alert that could not be delivered"""
+        if not self.enabled:
+            return
+
+        fingerprint = alert_fingerprint(alert)
+        with self._lock:
+            window = self._local.pop(fingerprint, None)
+        # Only the invocation that opened a window may drop it
+        if not window or not window['owner']:
+            return
+        try:
+            self.store.delete_window(fingerprint, window['owner'])
+        except Exception as e:
+            logger.error(f"Failed to release dedup window {fingerprint}: {e}")
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Push suppressed counts to the store and summarize windows that have closed"""
+        if not self.enabled:
+            return []
+
+        now = self.clock()
+        summaries = []
+
+        with self._lock:
+            windows = list(self._local.items())
+
+        for fingerprint, window in windows:
+            try:
+                if window['pending']:
+                    self.store.add_suppressed(fingerprint, window['pending'])
+                    window['pending'] = 0
+                if window['expires_at'] <= now:
+                    with self._lock:
+                        self._local.pop(fingerprint, None)
+                    repeated = self.store.close_window(fingerprint, now)
+                    if repeated:
+                        summaries.append(self._summary(window['alert'], repeated))
+            except Exception as e:
+                logger.error(f"Failed to flush dedup window {fingerprint}: {e}")
+
+        if self.suppressed_total:
+            logger.info(f"Suppressed {self.suppressed_total} duplicate alerts, {len(summaries)} windows closed")
+        return summaries
+
+    def sweep(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Close every expired window in the shared store and return (fingerprint, summary) pairs"""
+        if not self.enabled:
+            return []
+
+        now = self.clock()
+        try:
+            expired = self.store.expired(now)
+        except Exception as e:
+            logger.error(f"Failed to list closed dedup windows: {e}")
+            return []
+
+        summaries = []
+        for fingerprint, alert in expired:
+            try:
+                repeated = self.store.close_window(fingerprint, now)
+            except Exception as e:
+                logger.error(f"Failed to close dedup window {fingerprint}: {e}")
+                continue
+            if repeated and alert:
+                summaries.append((fingerprint, self._summary(alert, repeated)))
+        logger.info(f"Swept {len(expired)} closed dedup windows, {len(summaries)} with repeats")
+        return summaries
+
+    def restore(self, fingerprint: str, repeated: int):
+        """Put back the repeats of a summary that could not be sent, for the next sweep"""
+        try:
+            self.store.add_suppressed(fingerprint, repeated)
+        except Exception as e:
+            logger.error(f"Failed to restore {repeated} repeats of dedup window {fingerprint}: {e}")
+
+    def _summary(self, alert: Dict[str, Any], repeated: int) -> Dict[str, Any]:
+        """Build the repeat summary sent when a suppression window closes"""
+        summary = dict(alert)
+        summary['repeat_count'] = repeated
+        summary['repeat_window_seconds'] = self.window_seconds
+        summary['message'] = (
+            f"{alert.get('alarm_name') or alert.get('message')} repeated {repeated} times "
+            f"within {self.window_seconds}s"
+        )
+        return summary
+
+    def _create_store(self):
+        """Select the shared store from the environment"""
+        table_name = os.environ.get('DEDUP_TABLE_NAME')
+        sqlite_path = os.environ.get('DEDUP_SQLITE_PATH')
+
+        if table_name:
+            return DynamoDBDedupStore(table_name)
+        if sqlite_path:
+            return SQLiteDedupStore(sqlite_path)
+        return MemoryDedupStore()
@@ -0,0 +1,130 @@
+"""
+Alert digest service
+Aggregates non-critical alerts into one message per topic per interval
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DigestService:
+    """Buffers alerts of digest severities and emits grouped digests
+
+    Buffers live in the container. The alert processor publishes them before
+    each batch reports its result, so a digest covers the alerts of one batch
+    and nothing is acknowledged while only held in memory; interval_seconds
+    only applies to flushes that are not forced.
+    """
+
+    def __init__(self, severities: Optional[List[str]] = None, interval_seconds: Optional[int] = None,
+                 max_alerts: int = 1000, clock=time.time):
+        if severities is None:
+            severities = [s.strip() for s in os.environ.get('DIGEST_SEVERITIES', 'low,medium').split(',') if s.strip()]
+        if interval_seconds is None:
+            interval_seconds = int(os.environ.get('DIGEST_INTERVAL_SECONDS', '0'))
+
+        self.severities = set(severities)
+        self.interval_seconds = interval_seconds
+        self.max_alerts = max_alerts
+        self.clock = clock
+        self._buffers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def accepts(self, alert: Dict[str, Any]) -> bool:
+        """Check if an alert should be digested instead of published immediately"""
+        return alert['severity'] in self.severities
+
+    def add(self, topic_arn: str, alert: Dict[str, Any]):
+        """Buffer an alert for the digest of its topic"""
+        now = self.clock()
+        with self._lock:
+            buffer = self._buffers.setdefault(topic_arn, {
+                'opened_at': now,
+                'severity': alert['severity'],
+                'environment': alert['environment'],
+                'groups': {}
+            })
+            self._add_to_groups(buffer['groups'], alert)
+
+    def flush(self, force: bool = False) -> List[Tuple[str, Dict[str, Any]]]:
+        """Return (topic ARN, digest) pairs for every buffer that is due"""
+        now = self.clock()
+        digests = []
+
+        with self._lock:
+            for topic_arn, buffer in list(self._buffers.items()):
+                alert_count = sum(group['count'] for group in buffer['groups'].values())
+                due = now - buffer['opened_at'] >= self.interval_seconds or alert_count >= self.max_alerts
+                if force or due:
+                    digests.append((topic_arn, self._build_digest(buffer, alert_count, now)))
+                    del self._buffers[topic_arn]
+
+        return digests
+
+    def requeue(self, topic_arn: str, digest: Dict[str, Any]):
+        """Put back a digest that could not be published so the next flush retries it"""
+        with self._lock:
+            buffer = self._buffers.setdefault(topic_arn, {
+                'opened_at': digest['window_start_epoch'],
+                'severity': digest['severity'],
+                'environment': digest['environment'],
+                'groups': {}
+            })
+            for group in digest['groups']:
+                key = (group['source'], group['alarm_name'])
+                existing = buffer['groups'].get(key)
+                if existing:
+                    existing['count'] += group['count']
+                    existing['first_seen'] = min(existing['first_seen'], group['first_seen'])
+                else:
+                    buffer['groups'][key] = dict(group)
+
+    def _add_to_groups(self, groups: Dict[Tuple[str, str], Dict[str, Any]], alert: Dict[str, Any]):
+        """Count an alert in its (source, alarm) group"""
+        source = alert.get('source') or self._alarm_namespace(alert) or alert['alert_type']
+        alarm_name = alert.get('alarm_name') or alert.get('message', '')
+        timestamp = alert.get('timestamp') or datetime.now(timezone.utc).isoformat()
+
+        group = groups.get((source, alarm_name))
+        if group is None:
+            group = groups[(source, alarm_name)] = {
+                'source': source,
+                'alarm_name': alarm_name,
+                'count': 0,
+                'first_seen': timestamp
+            }
+
+        group['count'] += alert.get('repeat_count', 1)
+        group['last_seen'] = timestamp
+        group['state'] = alert.get('state')
+        group['reason'] = alert.get('reason') or alert.get('message')
+        group['runbook_url'] = alert.get('runbook_url')
+
+    def _build_digest(self, buffer: Dict[str, Any], alert_count: int, now: float) -> Dict[str, Any]:
+        """Build the digest message for one topic"""
+        groups = sorted(buffer['groups'].values(), key=lambda group: group['count'], reverse=True)
+        return {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'alert_type': 'digest',
+            'severity': buffer['severity'],
+            'environment': buffer['environment'],
+            'alert_count': alert_count,
+            'group_count': len(groups),
+            'window_start_epoch': buffer['opened_at'],
+            'window_seconds': round(now - buffer['opened_at'], 3),
+            'groups': groups
+        }
+
+    @staticmethod
+    def _alarm_namespace(alert: Dict[str, Any]) -> Optional[str]:
+        """Return the metric namespace of a CloudWatch alarm alert"""
+        for metric in alert.get('source_detail', {}).get('configuration', {}).get('metrics', []):
+            namespace = metric.get('metricStat', {}).get('metric', {}).get('namespace')
+            if namespace:
+                return namespace
+        return None
@@ -0,0 +1,118 @@
+"""
+Buffered EventBridge forwarder
+Packs alerts into as few put_events calls as possible and retries failed entries
+"""
+import time
+import random
+import logging
+from typing import Any, Dict, List
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger(__name__)
+
+# PutEvents limits
+MAX_ENTRIES_PER_CALL = 10
+MAX_REQUEST_BYTES = 256 * 1024
+
+
+def entry_size(entry: Dict[str, Any]) -> int:
+    """Size of a PutEvents entry as EventBridge counts it towards the 256 KB limit"""
+    size = 14 if entry.get('Time') else 0
+    for field in ('Source', 'DetailType', 'Detail'):
+        if entry.get(field):
+            size += len(entry[field].encode('utf-8'))
+    for resource in entry.get('Resources', []):
+        size += len(resource.encode('utf-8'))
+    return size
+
+
+class EventBridgeForwarder:
+    """Buffers PutEvents entries and sends them in packed, retried batches"""
+
+    def __init__(self, events_client, max_attempts: int = 3, base_delay: float = 0.1,
+                 max_delay: float = 2.0, sleep=time.sleep):
+        self.events = events_client
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.calls = 0
+        self._pending: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        """Number of entries waiting for the next flush"""
+        return len(self._pending)
+
+    def add(self, entry: Dict[str, Any], key: Any = None) -> bool:
+        """Queue an entry; key is returned by flush() if the entry is never accepted"""
+        size = entry_size(entry)
+        if size > MAX_REQUEST_BYTES:
+            logger.error(f"EventBridge entry of {size} bytes exceeds the {MAX_REQUEST_BYTES} byte limit")
+            return False
+
+        self._pending.append({'entry': entry, 'key': key, 'size': size})
+        return True
+
+    def flush(self) -> List[Any]:
+        """Send all queued entries and return the keys of those that failed after retries"""
+        pending, self._pending = self._pending, []
+        failed = []
+
+        for attempt in range(1, self.max_attempts + 1):
+            if not pending:
+                break
+            if attempt > 1:
+                self.sleep(self._backoff(attempt))
+
+            retry = []
+            for chunk in self._pack(pending):
+                retry.extend(self._send(chunk))
+            pending = retry
+
+        for item in pending:
+            logger.error(f"Dropped EventBridge entry after {self.max_attempts} attempts: {item.get('error')}")
+            failed.append(item['key'])
+
+        return failed
+
+    def _pack(self, items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split items into chunks within the entry count and request size limits"""
+        chunks = []
+        chunk, chunk_size = [], 0
+        for item in items:
+            if chunk and (len(chunk) == MAX_ENTRIES_PER_CALL or chunk_size + item['size'] > MAX_REQUEST_BYTES):
+                chunks.append(chunk)
+                chunk, chunk_size = [], 0
+            chunk.append(item)
+            chunk_size += item['size']
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _send(self, chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Send one chunk and return the items that should be retried"""
+        self.calls += 1
+        try:
+            response = self.events.put_events(Entries=[item['entry'] for item in chunk])
+        except (ClientError, BotoCoreError) as e:
+            # Connection and read timeouts fail the chunk like an error response would
+            logger.warning(f"put_events failed for {len(chunk)} entries: {e}")
+            for item in chunk:
+                item['error'] = str(e)
+            return chunk
+
+        if not response.get('FailedEntryCount'):
+            return []
+
+        # Result entries line up with request entries; failed ones carry an ErrorCode
+        retry = []
+        for item, result in zip(chunk, response['Entries']):
+            if result.get('ErrorCode'):
+                item['error'] = f"{result['ErrorCode']}: {result.get('ErrorMessage', '')}"
+                retry.append(item)
+        logger.warning(f"{len(retry)} of {len(chunk)} EventBridge entries failed")
+        return retry
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
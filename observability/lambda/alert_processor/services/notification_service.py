@@ -2,11 +2,16 @@
 Notification service for sending alerts
 """
 import os
-import json
-import boto3
+import time
 import logging
-from typing import Dict, Any
-from botocore.exceptions import ClientError
+import threading
+from typing import Dict, Any, List, Set, Tuple
+from botocore.exceptions import BotoCoreError, ClientError
+from shared import bootstrap
+from .deduplication_service import DeduplicationService
+from .digest_service import DigestService
+from .event_forwarder import EventBridgeForwarder
+from .alert_payload import AlertPayloadBuilder
 
 logger = logging.getLogger(__name__)
 
@@ -14,73 +19,202 @@ class NotificationService:
     """Service for sending alert notifications"""
     
     def __init__(self):
-        self.sns = boto3.client('sns')
-        self.events = boto3.client('events')
+        self.sns = bootstrap.get_client('sns')
+        self.events = bootstrap.get_client('events')
         self.topic_arns = self._get_topic_arns()
         self.event_bus_name = os.environ.get('EVENT_BUS_NAME')
+        self.deduplication = DeduplicationService()
+        self.digest = DigestService()
+        self.payloads = AlertPayloadBuilder()
+        # Alerts waiting in a digest, so a failed digest publish can fail their records
+        self._digested: List[Tuple[str, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+        # Per-destination call latency, drained by take_latencies()
+        self.latency_ms: Dict[str, List[float]] = {'sns': [], 'eventbridge': []}
+        self.forwarder = EventBridgeForwarder(
+            self.events,
+            max_attempts=int(os.environ.get('EVENTBRIDGE_MAX_ATTEMPTS', '3'))
+        )
     
-    def send_alert_notification(self, alert: Dict[str, Any]):
-        """Send alert notification to appropriate SNS topic"""
+    def send_alert_notification(self, alert: Dict[str, Any]) -> bool:
+        """Send alert notification to appropriate SNS topic
+
+        Returns False only when publishing failed and a retry could succeed. Digested
+        alerts are only delivered once flush_digests() has published their digest.
+        """
         severity = alert['severity']
         topic_arn = self.topic_arns.get(severity)
         
         if not topic_arn:
             logger.warning(f"No topic ARN found for severity: {severity}")
-            return
+            return True
         
         # Only send notifications for ALARM or INSUFFICIENT_DATA states
         if alert.get('state') in ['ALARM', 'INSUFFICIENT_DATA'] or alert.get('alert_type') == 'custom':
+            publish, summary = self.deduplication.check(alert)
+            if summary:
+                self._deliver(topic_arn, summary)
+            
+            if not publish:
+                logger.info(f"Suppressed duplicate {severity} alert notification")
+                return True
+            
             try:
-                message = self._format_alert_message(alert)
-                subject = self._format_alert_subject(alert)
-                
-                self.sns.publish(
-                    TopicArn=topic_arn,
-                    Message=json.dumps(alert, indent=2),
-                    Subject=subject,
-                    MessageAttributes={
-                        'severity': {
-                            'DataType': 'String',
-                            'StringValue': severity
-                        },
-                        'environment': {
-                            'DataType': 'String',
-                            'StringValue': alert['environment']
-                        },
-                        'alert_type': {
-                            'DataType': 'String',
-                            'StringValue': alert['alert_type']
-                        }
-                    }
-                )
+                if self.digest.accepts(alert):
+                    self.digest.add(topic_arn, alert)
+                    with self._lock:
+                        self._digested.append((topic_arn, alert))
+                    return True
                 
-                logger.info(f"Sent {severity} alert notification")
-                
-            except ClientError as e:
-                logger.error(f"Failed to send SNS notification: {e}")
+                delivered = self._publish(topic_arn, alert)
+            except Exception:
+                # Let the retry publish instead of being suppressed by this window
+                self.deduplication.forget(alert)
+                raise
+            if not delivered:
+                self.deduplication.forget(alert)
+                return False
+        
+        return True
     
-    def send_to_eventbridge(self, alert: Dict[str, Any]):
-        """Send alert to EventBridge for automation"""
-        if not self.event_bus_name:
-            logger.warning("No EventBridge bus configured")
-            return
+    def flush_digests(self) -> List[Dict[str, Any]]:
+        """Publish the digests buffered so far and return the alerts whose digest failed
+
+        Called before a batch reports its result, so no record is acknowledged
+        while its alert only sits in this container's memory.
+        """
+        with self._lock:
+            digested, self._digested = self._digested, []
+        try:
+            failed_topics = self._publish_digests()
+        except Exception:
+            # The batch is retried as a whole, so none of its windows may stay open
+            for _, alert in digested:
+                self.deduplication.forget(alert)
+            raise
+        
+        failed = [alert for topic_arn, alert in digested if topic_arn in failed_topics]
+        for alert in failed:
+            self.deduplication.forget(alert)
+        return failed
+    
+    def flush(self, force: bool = False):
+        """Send repeat summaries, due digests and any EventBridge entries still queued"""
+        self.flush_events()
         
+        for summary in self.deduplication.flush():
+            topic_arn = self.topic_arns.get(summary['severity'])
+            if topic_arn:
+                self._deliver(topic_arn, summary)
+        
+        for topic_arn, digest in self.digest.flush(force):
+            if not self._publish(topic_arn, digest):
+                self.digest.requeue(topic_arn, digest)
+    
+    def _publish_digests(self) -> Set[str]:
+        """Publish every buffered digest now and return the topics whose publish failed"""
+        return {topic_arn for topic_arn, digest in self.digest.flush(force=True)
+                if not self._publish(topic_arn, digest)}
+    
+    def sweep(self) -> int:
+        """Send the repeat summaries of every closed deduplication window and return how many went out"""
+        sent = []
+        for fingerprint, summary in self.deduplication.sweep():
+            topic_arn = self.topic_arns.get(summary['severity'])
+            if not topic_arn:
+                continue
+            if self._deliver(topic_arn, summary):
+                sent.append((topic_arn, fingerprint, summary))
+            else:
+                self.deduplication.restore(fingerprint, summary['repeat_count'])
+        
+        failed_topics = self._publish_digests()
+        for topic_arn, fingerprint, summary in sent:
+            if topic_arn in failed_topics:
+                self.deduplication.restore(fingerprint, summary['repeat_count'])
+        return len([topic_arn for topic_arn, _, _ in sent if topic_arn not in failed_topics])
+    
+    def _deliver(self, topic_arn: str, alert: Dict[str, Any]) -> bool:
+        """Publish critical and high alerts now, buffer the rest for the digest"""
+        if self.digest.accepts(alert):
+            self.digest.add(topic_arn, alert)
+            return True
+        return self._publish(topic_arn, alert)
+    
+    def _publish(self, topic_arn: str, alert: Dict[str, Any]) -> bool:
+        """Publish one alert or repeat summary to an SNS topic"""
+        severity = alert['severity']
+        start = time.perf_counter()
         try:
-            self.events.put_events(
-                Entries=[
-                    {
-                        'Source': 'observability.alerts',
-                        'DetailType': 'Alert Processed',
-                        'Detail': json.dumps(alert),
-                        'EventBusName': self.event_bus_name
+            self.sns.publish(
+                TopicArn=topic_arn,
+                Message=self.payloads.sns_message(alert, self._format_alert_message(alert)),
+                MessageStructure='json',
+                Subject=self._format_alert_subject(alert),
+                MessageAttributes={
+                    'severity': {
+                        'DataType': 'String',
+                        'StringValue': severity
+                    },
+                    'environment': {
+                        'DataType': 'String',
+                        'StringValue': alert['environment']
+                    },
+                    'alert_type': {
+                        'DataType': 'String',
+                        'StringValue': alert['alert_type']
                     }
-                ]
+                }
             )
             
-            logger.info("Sent alert to EventBridge for automation")
+            logger.info(f"Sent {severity} {alert['alert_type']} notification")
+            return True
             
-        except ClientError as e:
-            logger.error(f"Failed to send to EventBridge: {e}")
+        except (ClientError, BotoCoreError) as e:
+            logger.error(f"Failed to send SNS notification: {e}")
+            return False
+        
+        finally:
+            self.latency_ms['sns'].append((time.perf_counter() - start) * 1000)
+    
+    def send_to_eventbridge(self, alert: Dict[str, Any]) -> bool:
+        """Queue alert for EventBridge automation; flush_events() sends the batch
+
+        Returns False only when the alert can never be forwarded
+        """
+        if not self.event_bus_name:
+            logger.warning("No EventBridge bus configured")
+            return True
+        
+        return self.forwarder.add(
+            {
+                'Source': 'observability.alerts',
+                'DetailType': 'Alert Processed',
+                'Detail': self.payloads.eventbridge_detail(alert),
+                'EventBusName': self.event_bus_name
+            },
+            key=alert
+        )
+    
+    def flush_events(self) -> List[Dict[str, Any]]:
+        """Forward queued alerts in packed put_events calls and return those that failed"""
+        queued = len(self.forwarder)
+        if not queued:
+            return []
+        
+        calls_before = self.forwarder.calls
+        start = time.perf_counter()
+        failed = self.forwarder.flush()
+        self.latency_ms['eventbridge'].append((time.perf_counter() - start) * 1000)
+        logger.info(f"Forwarded {queued - len(failed)} of {queued} alerts to EventBridge "
+                    f"in {self.forwarder.calls - calls_before} put_events calls")
+        return failed
+    
+    def take_latencies(self) -> Dict[str, List[float]]:
+        """Return and reset the latencies recorded per destination"""
+        latencies = self.latency_ms
+        self.latency_ms = {'sns': [], 'eventbridge': []}
+        return latencies
     
     def _get_topic_arns(self) -> Dict[str, str]:
         """Get SNS topic ARNs from environment variables"""
@@ -93,7 +227,18 @@ class NotificationService:
     
     def _format_alert_message(self, alert: Dict[str, Any]) -> str:
         """Format alert message for human readability"""
-        if alert['alert_type'] == 'cloudwatch_alarm':
+        if alert['alert_type'] == 'digest':
+            lines = [
+                f"{group['count']}x {group['alarm_name']} ({group['source']}) - {group.get('reason') or 'No reason provided'}"
+                for group in alert['groups']
+            ]
+            return f"""
+Digest: {alert['alert_count']} {alert['severity'].upper()} alerts
+Time: {alert['timestamp']}
+Environment: {alert['environment']}
+
+""" + "\n".join(lines) + "\n"
+        elif alert['alert_type'] == 'cloudwatch_alarm':
             return f"""
 Alert: {alert.get('alarm_name', 'Unknown')}
 Severity: {alert['severity'].upper()}
@@ -102,7 +247,7 @@ Time: {alert['timestamp']}
 Environment: {alert['environment']}
 
 Reason: {alert.get('reason', 'No reason provided')}
-
+{self._format_contributor(alert)}{self._format_resource_context(alert)}
 Runbook: {alert.get('runbook_url', 'N/A')}
 Dashboard: {alert.get('dashboard_url', 'N/A')}
 """
@@ -117,14 +262,43 @@ Environment: {alert['environment']}
 Runbook: {alert.get('runbook_url', 'N/A')}
 """
     
+    @staticmethod
+    def _format_resource_context(alert: Dict[str, Any]) -> str:
+        """Format one line per resource behind the alarm"""
+        lines = []
+        for resource, context in alert.get('resource_context', {}).items():
+            details = [f"{key}={context[key]}" for key in ('owner', 'availability_zone', 'instance_type', 'state')
+                       if context.get(key)]
+            lines.append(f"Resource: {resource} ({context['resource_type']}) {' '.join(details)}".rstrip())
+        return "\n" + "\n".join(lines) + "\n" if lines else ""
+    
+    @staticmethod
+    def _format_contributor(alert: Dict[str, Any]) -> str:
+        """Format the time series that fired a fleet alarm"""
+        attributes = alert.get('contributor', {}).get('attributes', {})
+        if not attributes:
+            return ""
+        return "Contributor: " + " ".join(f"{key}={value}" for key, value in sorted(attributes.items())) + "\n"
+    
     def _format_alert_subject(self, alert: Dict[str, Any]) -> str:
-        """Format alert subject line"""
+        """Format alert subject line (SNS allows 100 characters on one line)"""
+        return self._alert_subject(alert).replace('\n', ' ')[:100]
+    
+    def _alert_subject(self, alert: Dict[str, Any]) -> str:
+        """Build the untrimmed alert subject line"""
         severity = alert['severity'].upper()
         environment = alert['environment'].upper()
+        repeated = f" (repeated {alert['repeat_count']} times)" if alert.get('repeat_count') else ''
         
-        if alert['alert_type'] == 'cloudwatch_alarm':
+        if alert['alert_type'] == 'digest':
+            return f"[{severity}] [{environment}] Digest: {alert['alert_count']} alerts in {alert['group_count']} groups"
+        elif alert['alert_type'] == 'cloudwatch_alarm':
             alarm_name = alert.get('alarm_name', 'Unknown Alarm')
-            return f"[{severity}] [{environment}] {alarm_name}"
+            attributes = alert.get('contributor', {}).get('attributes', {})
+            contributor = ' '.join(str(attributes[key]) for key in sorted(attributes))
+            if contributor:
+                alarm_name = f"{alarm_name} ({contributor})"
+            return f"[{severity}] [{environment}] {alarm_name}{repeated}"
         else:
             source = alert.get('source', 'Unknown')
-            return f"[{severity}] [{environment}] Custom Alert from {source}"
\ No newline at end of file
+            return f"[{severity}] [{environment}] Custom Alert from {source}{repeated}"
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""
+Resource context service
+Resolves alarm dimensions to resource metadata with batched lookups and a TTL cache
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional
+from shared import bootstrap
+
+logger = logging.getLogger(__name__)
+
+# Dimensions we know how to resolve, and the lookup that handles them
+SUPPORTED_DIMENSIONS = {
+    'InstanceId': 'ec2',
+    'FunctionName': 'lambda',
+    'DBInstanceIdentifier': 'rds'
+}
+OWNER_TAGS = ['Owner', 'owner', 'Team', 'team']
+
+# Per-call batch limits; EC2 takes at most 200 values per filter
+EC2_BATCH_SIZE = 200
+RDS_BATCH_SIZE = 100
+TAGGING_BATCH_SIZE = 100
+
+
+def alarm_contributor(alarm_detail: Dict[str, Any]) -> Dict[str, str]:
+    """Dimensions of the time series that changed a Metrics Insights GROUP BY alarm, if any"""
+    return (alarm_detail.get('alarmContributor') or {}).get('attributes') or {}
+
+
+def alarm_dimensions(alarm_detail: Dict[str, Any]) -> List[str]:
+    """Return the cache keys ("Name=value") of the resolvable dimensions of an alarm
+
+    Query alarms have no metric dimensions; their contributor names the resource instead.
+    """
+    keys = []
+    for metric in alarm_detail.get('configuration', {}).get('metrics', []):
+        dimensions = metric.get('metricStat', {}).get('metric', {}).get('dimensions', {})
+        keys.extend(f"{name}={value}" for name, value in dimensions.items() if name in SUPPORTED_DIMENSIONS)
+    keys.extend(f"{name}={value}" for name, value in alarm_contributor(alarm_detail).items()
+                if name in SUPPORTED_DIMENSIONS)
+    return keys
+
+
+class ResourceContextService:
+    """Adds owner, tags and placement of the resources behind an alarm
+
+    Lookups for a whole batch of alarms are resolved together and bounded by
+    RESOURCE_CONTEXT_TIMEOUT_MS; lookups still running after the timeout keep
+    filling the cache for later alarms but never delay the current one.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, timeout_ms: Optional[int] = None,
+                 max_entries: int = 10000, clock=time.monotonic):
+        if ttl_seconds is None:
+            ttl_seconds = int(os.environ.get('RESOURCE_CONTEXT_TTL_SECONDS', '300'))
+        if timeout_ms is None:
+            timeout_ms = int(os.environ.get('RESOURCE_CONTEXT_TIMEOUT_MS', '500'))
+
+        self.ttl_seconds = ttl_seconds
+        self.timeout_seconds = timeout_ms / 1000
+        self.max_entries = max_entries
+        self.clock = clock
+        self.region = os.environ.get('AWS_REGION', 'us-east-1')
+        self.api_calls = 0
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._account_id = None
+
+    @property
+    def enabled(self) -> bool:
+        """Resource context is off when the timeout is zero"""
+        return self.timeout_seconds > 0
+
+    def prefetch(self, alarm_details: Iterable[Dict[str, Any]]):
+        """Resolve every uncached dimension of a batch of alarms within the timeout"""
+        if not self.enabled:
+            return
+
+        misses = {}
+        now = self.clock()
+        with self._lock:
+            for detail in alarm_details:
+                for key in alarm_dimensions(detail):
+                    cached = self._cache.get(key)
+                    if (cached and cached[0] > now) or key in self._in_flight:
+                        continue
+                    name, value = key.split('=', 1)
+                    misses.setdefault(SUPPORTED_DIMENSIONS[name], {})[value] = key
+                    self._in_flight.add(key)
+
+        if not misses:
+            return
+
+        pool = bootstrap.get_service('resource_context_pool', lambda: ThreadPoolExecutor(
+            max_workers=len(SUPPORTED_DIMENSIONS), thread_name_prefix='resource-context'
+        ))
+        lookups = {'ec2': self._lookup_ec2, 'lambda': self._lookup_lambda, 'rds': self._lookup_rds}
+        futures = [pool.submit(self._resolve, lookups[kind], keys) for kind, keys in misses.items()]
+
+        _, pending = wait(futures, timeout=self.timeout_seconds)
+        if pending:
+            logger.warning(f"Resource context lookup exceeded {self.timeout_seconds * 1000:.0f} ms, "
+                           f"continuing without it for {len(pending)} resource types")
+
+    def lookup(self, alarm_detail: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Return cached metadata for the resources behind an alarm"""
+        context = {}
+        now = self.clock()
+        with self._lock:
+            for key in alarm_dimensions(alarm_detail):
+                cached = self._cache.get(key)
+                if cached and cached[0] > now and cached[1]:
+                    context[key] = cached[1]
+        return context
+
+    def _resolve(self, lookup, keys: Dict[str, str]):
+        """Run one batched lookup and cache every requested key, found or not"""
+        try:
+            found = lookup(sorted(keys))
+        except Exception as e:
+            # Nothing is cached, so a throttle or timeout does not hide these resources for a whole TTL
+            logger.warning(f"Resource context lookup failed: {e}")
+            with self._lock:
+                self._in_flight.difference_update(keys.values())
+            return
+
+        expires_at = self.clock() + self.ttl_seconds
+        with self._lock:
+            for key in keys.values():
+                # Misses are cached too so a deleted resource does not cost a call per alarm
+                self._cache[key] = (expires_at, found.get(key, {}))
+                self._cache.move_to_end(key)
+                self._in_flight.discard(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _lookup_ec2(self, instance_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Describe instances in batches"""
+        ec2 = bootstrap.get_client('ec2')
+        found = {}
+        for start in range(0, len(instance_ids), EC2_BATCH_SIZE):
+            request = {'Filters': [{'Name': 'instance-id', 'Values': instance_ids[start:start + EC2_BATCH_SIZE]}]}
+            while True:
+                self.api_calls += 1
+                response = ec2.describe_instances(**request)
+                for reservation in response['Reservations']:
+                    for instance in reservation['Instances']:
+                        tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+                        found[instance['InstanceId']] = self._context('ec2', tags, {
+                            'instance_type': instance.get('InstanceType'),
+                            'availability_zone': instance.get('Placement', {}).get('AvailabilityZone'),
+                            'state': instance.get('State', {}).get('Name'),
+                            'auto_scaling_group': tags.get('aws:autoscaling:groupName')
+                        })
+                if not response.get('NextToken'):
+                    break
+                request['NextToken'] = response['NextToken']
+        return {f"InstanceId={key}": value for key, value in found.items()}
+
+    def _lookup_rds(self, identifiers: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Describe DB instances in batches; tags come back in the same response"""
+        rds = bootstrap.get_client('rds')
+        found = {}
+        for start in range(0, len(identifiers), RDS_BATCH_SIZE):
+            self.api_calls += 1
+            response = rds.describe_db_instances(
+                Filters=[{'Name': 'db-instance-id', 'Values': identifiers[start:start + RDS_BATCH_SIZE]}]
+            )
+            for db in response['DBInstances']:
+                tags = {tag['Key']: tag['Value'] for tag in db.get('TagList', [])}
+                found[db['DBInstanceIdentifier']] = self._context('rds', tags, {
+                    'instance_class': db.get('DBInstanceClass'),
+                    'engine': db.get('Engine'),
+                    'availability_zone': db.get('AvailabilityZone'),
+                    'multi_az': db.get('MultiAZ'),
+                    'state': db.get('DBInstanceStatus')
+                })
+        return {f"DBInstanceIdentifier={key}": value for key, value in found.items()}
+
+    def _lookup_lambda(self, function_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch function tags in batches through the tagging API"""
+        tagging = bootstrap.get_client('resourcegroupstaggingapi')
+        arns = {
+            f"arn:aws:lambda:{self.region}:{self._get_account_id()}:function:{name}": name
+            for name in function_names
+        }
+        found = {}
+        arn_list = list(arns)
+        for start in range(0, len(arn_list), TAGGING_BATCH_SIZE):
+            self.api_calls += 1
+            response = tagging.get_resources(ResourceARNList=arn_list[start:start + TAGGING_BATCH_SIZE])
+            for mapping in response['ResourceTagMappingList']:
+                tags = {tag['Key']: tag['Value'] for tag in mapping.get('Tags', [])}
+                found[arns[mapping['ResourceARN']]] = self._context('lambda', tags, {'arn': mapping['ResourceARN']})
+        return {f"FunctionName={key}": value for key, value in found.items()}
+
+    def _get_account_id(self) -> str:
+        """Account of this function, looked up once per container"""
+        if self._account_id is None:
+            self.api_calls += 1
+            self._account_id = bootstrap.get_client('sts').get_caller_identity()['Account']
+        return self._account_id
+
+    @staticmethod
+    def _context(resource_type: str, tags: Dict[str, str], details: Dict[str, Any]) -> Dict[str, Any]:
+        """Common shape of a resource context entry"""
+        owner = next((tags[key] for key in OWNER_TAGS if tags.get(key)), None)
+        context = {'resource_type': resource_type, 'owner': owner, 'tags': tags}
+        context.update({key: value for key, value in details.items() if value is not None})
+        return context
@@ -0,0 +1,171 @@
+"""
+Severity classification engine
+Compiles keyword rules into a single Aho-Corasick automaton and memoizes results
+"""
+import os
+import json
+import logging
+from collections import deque
+from functools import lru_cache
+from itertools import product
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Highest severity first; a lower rank wins when several rules match
+SEVERITIES = ['critical', 'high', 'medium', 'low']
+
+DEFAULT_RULES = [
+    {'severity': 'critical', 'keywords': ['critical', 'fatal', 'down', 'outage']},
+    {'severity': 'high', 'keywords': ['error', 'high', 'failed', 'timeout']},
+    {'severity': 'medium', 'keywords': ['warning', 'medium', 'slow']}
+]
+
+# (team, namespace, dimension name); None matches anything
+Scope = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting every keyword contained in a text"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+    def add(self, keyword: str, keyword_id: int):
+        """Add a keyword; build() must be called before searching"""
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(keyword_id)
+
+    def build(self):
+        """Compute failure links breadth-first and merge their outputs"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def search(self, text: str) -> Iterable[int]:
+        """Yield the id of every keyword occurrence in text"""
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            yield from self._output[node]
+
+
+class SeverityClassifier:
+    """Classifies alarms by matching their names against compiled severity rules
+
+    A rule looks like {"severity": "high", "keywords": ["error"], "team": "payments",
+    "namespace": "AWS/Lambda", "dimension": "FunctionName"}; team, namespace and
+    dimension are optional and narrow the alarms the rule applies to.
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None,
+                 default_severity: str = 'low', cache_size: int = 4096):
+        if default_severity not in SEVERITIES:
+            raise ValueError(f"Unknown default severity: {default_severity}")
+        self.default_severity = default_severity
+        self.rule_count = 0
+        self._automaton = KeywordAutomaton()
+        self._keyword_scopes: List[Dict[Scope, int]] = []
+        self._compile(DEFAULT_RULES if rules is None else rules)
+        self._classify_cached = lru_cache(maxsize=cache_size)(self._classify)
+
+    @classmethod
+    def from_config(cls) -> 'SeverityClassifier':
+        """Build a classifier from SEVERITY_RULES_FILE or SEVERITY_RULES_PARAMETER"""
+        cache_size = int(os.environ.get('SEVERITY_CACHE_SIZE', '4096'))
+        rules_file = os.environ.get('SEVERITY_RULES_FILE')
+        rules_parameter = os.environ.get('SEVERITY_RULES_PARAMETER')
+
+        try:
+            if rules_file:
+                with open(rules_file) as config_file:
+                    config = json.load(config_file)
+            elif rules_parameter:
+                from shared import bootstrap
+                response = bootstrap.get_client('ssm').get_parameter(Name=rules_parameter, WithDecryption=True)
+                config = json.loads(response['Parameter']['Value'])
+            else:
+                return cls(cache_size=cache_size)
+
+            # Compiling validates the rules, so one bad rule falls back instead of failing every alert
+            if isinstance(config, list):
+                return cls(config, cache_size=cache_size)
+            return cls(config.get('rules'), config.get('default_severity', 'low'), cache_size)
+        except Exception as e:
+            logger.error(f"Failed to load severity rules, using defaults: {e}")
+            return cls(cache_size=cache_size)
+
+    def classify(self, alarm_name: str, namespace: Optional[str] = None,
+                 dimensions: Iterable[str] = (), team: Optional[str] = None) -> str:
+        """Return the severity for an alarm name in the given context"""
+        return self._classify_cached(alarm_name, namespace, tuple(sorted(dimensions)), team)
+
+    def cache_info(self):
+        """Return hit/miss statistics for the memoized classifications"""
+        return self._classify_cached.cache_info()
+
+    def _compile(self, rules: List[Dict[str, Any]]):
+        """Compile all rule keywords into one automaton"""
+        keyword_ids: Dict[str, int] = {}
+
+        for rule in rules:
+            severity = rule['severity']
+            if severity not in SEVERITIES:
+                raise ValueError(f"Unknown severity in rule: {severity}")
+            rank = SEVERITIES.index(severity)
+            scope = (rule.get('team'), rule.get('namespace'), rule.get('dimension'))
+
+            keywords = rule['keywords']
+            if isinstance(keywords, str) or not keywords:
+                raise ValueError(f"Rule for {severity} needs a non-empty list of keywords")
+
+            for keyword in keywords:
+                keyword = keyword.lower()
+                keyword_id = keyword_ids.get(keyword)
+                if keyword_id is None:
+                    keyword_id = keyword_ids[keyword] = len(self._keyword_scopes)
+                    self._keyword_scopes.append({})
+                    self._automaton.add(keyword, keyword_id)
+
+                scopes = self._keyword_scopes[keyword_id]
+                scopes[scope] = min(rank, scopes.get(scope, rank))
+            self.rule_count += 1
+
+        self._automaton.build()
+
+    def _classify(self, alarm_name: str, namespace: Optional[str],
+                  dimensions: Tuple[str, ...], team: Optional[str]) -> str:
+        """Find the highest severity among rules whose keywords and scope match"""
+        candidate_scopes = list(product((None, team), (None, namespace), (None,) + dimensions))
+        best_rank = len(SEVERITIES)
+
+        for keyword_id in set(self._automaton.search(alarm_name.lower())):
+            scopes = self._keyword_scopes[keyword_id]
+            for scope in candidate_scopes:
+                rank = scopes.get(scope)
+                if rank is not None and rank < best_rank:
+                    best_rank = rank
+            if best_rank == 0:
+                break
+
+        return SEVERITIES[best_rank] if best_rank < len(SEVERITIES) else self.default_severity
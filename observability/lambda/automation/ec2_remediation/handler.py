@@ -1,16 +1,17 @@
 """
 EC2 remediation Lambda function
 """
-import boto3
 import json
 import logging
+from shared import bootstrap
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-ec2 = boto3.client('ec2')
-cloudwatch = boto3.client('cloudwatch')
+ec2 = bootstrap.get_client('ec2')
+cloudwatch = bootstrap.get_client('cloudwatch')
 
+@bootstrap.timed_handler
 def handler(event, context):
     """Handle EC2 remediation actions"""
     try:
@@ -1,25 +1,25 @@
 """
 Incident response Lambda function
 """
-import boto3
 import json
 import logging
 import os
+from shared import bootstrap
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-stepfunctions = boto3.client('stepfunctions')
-sns = boto3.client('sns')
+stepfunctions = bootstrap.get_client('stepfunctions')
+sns = bootstrap.get_client('sns')
 
+@bootstrap.timed_handler
 def handler(event, context):
     """Handle incident response"""
     try:
         alert_detail = event.get('detail', {})
         severity = alert_detail.get('severity', 'medium')
         
-        if severity in ['critical', 'high']:
-            start_remediation_workflow(alert_detail)
+        if severity in ['critical', 'high'] and start_remediation_workflow(alert_detail):
             send_incident_notification(alert_detail)
         
         return {'statusCode': 200}
@@ -29,17 +29,22 @@ def handler(event, context):
         return {'statusCode': 500}
 
 def start_remediation_workflow(alert_detail):
-    """Start automated remediation workflow"""
+    """Start automated remediation workflow; False when the alert was already handled"""
     workflow_arn = os.environ.get('REMEDIATION_WORKFLOW_ARN')
     if workflow_arn:
+        execution = {'stateMachineArn': workflow_arn, 'input': json.dumps(alert_detail)}
+        if alert_detail.get('alert_id'):
+            # Redelivered alerts keep their id, and an execution name can only be used once
+            execution['name'] = alert_detail['alert_id']
         try:
-            stepfunctions.start_execution(
-                stateMachineArn=workflow_arn,
-                input=json.dumps(alert_detail)
-            )
+            stepfunctions.start_execution(**execution)
             logger.info("Started remediation workflow")
+        except stepfunctions.exceptions.ExecutionAlreadyExists:
+            logger.info(f"Alert {alert_detail['alert_id']} already started a workflow, skipping")
+            return False
         except Exception as e:
             logger.error(f"Failed to start workflow: {e}")
+    return True
 
 def send_incident_notification(alert_detail):
     """Send incident notification"""
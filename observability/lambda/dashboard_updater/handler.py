@@ -5,32 +5,48 @@ Discovers AWS resources and updates CloudWatch dashboards
 import json
 import logging
 from typing import Dict, List
+from shared import bootstrap
+from shared import inventory
 from .services.resource_discovery import ResourceDiscoveryService
 from .services.dashboard_service import DashboardService
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+@bootstrap.timed_handler
 def handler(event, context):
     """Main Lambda handler for dashboard updates"""
     try:
-        # Initialize services
-        discovery_service = ResourceDiscoveryService()
-        dashboard_service = DashboardService()
+        # Services and their clients are built once per container
+        discovery_service = bootstrap.get_service('resource_discovery', ResourceDiscoveryService)
+        dashboard_service = bootstrap.get_service('dashboard', DashboardService)
+        store = bootstrap.get_service('inventory', lambda: inventory.InventoryStore('dashboard_updater'))
         
-        # Discover resources
-        resources = discovery_service.discover_all_resources()
-        logger.info(f"Discovered {sum(len(v) for v in resources.values())} resources")
+        # Discover resources and compare them with the previous snapshot; scopes that
+        # failed to scan keep their previous resources rather than losing their widgets
+        resources, failed = discovery_service.discover_all_resources()
+        previous = store.latest()
+        resources = inventory.carry_forward(previous, resources, failed)
+        delta = inventory.diff(previous, resources)
+        changed_types = {
+            resource_type for by_type in delta.values() for resource_type, changed in by_type.items() if changed
+        }
+        logger.info(f"Discovered {sum(len(v) for v in resources.values())} resources, "
+                    f"delta: {inventory.summary(delta)}")
         
-        # Update dashboards
-        updated_dashboards = dashboard_service.update_dashboards(resources)
+        # Update dashboards whose content changed
+        results = dashboard_service.update_dashboards(resources, changed_types)
+        store.save(resources)
         
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'Dashboards updated successfully',
                 'resources_discovered': resources,
-                'dashboards_updated': updated_dashboards
+                'inventory_delta': inventory.summary(delta),
+                'dashboards_updated': results['updated'],
+                'dashboards_skipped': results['skipped'],
+                'dashboards_failed': results['failed']
             })
         }
         
@@ -0,0 +1,121 @@
+"""
+Dashboard layout engine
+Packs per-resource metric widgets within CloudWatch limits and spills into numbered dashboards
+"""
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# CloudWatch dashboard quotas
+MAX_METRICS_PER_WIDGET = 500
+MAX_WIDGETS_PER_DASHBOARD = 500
+MAX_METRICS_PER_DASHBOARD = 2500
+GRID_COLUMNS = 24
+
+MetricRow = Callable[[List[str], Dict[str, Any]], List[Any]]
+
+
+class WidgetSpec:
+    """A graph repeated for every chunk of resources, with one row per metric per resource"""
+
+    def __init__(self, title: str, metrics: List[List[str]], stat: str = 'Average', period: int = 300):
+        self.title = title
+        self.metrics = metrics
+        self.stat = stat
+        self.period = period
+
+
+class DashboardLayout:
+    """Lays out resources as rows of widgets across as many dashboards as needed
+
+    Resources are cut into chunks of DASHBOARD_METRICS_PER_WIDGET metric rows;
+    each chunk becomes one widget per spec, side by side. Dashboards hold up to
+    DASHBOARD_WIDGETS_PER_DASHBOARD widgets and 2,500 metrics in total, and
+    further chunks go to '<name>-2', '<name>-3' and so on. DASHBOARD_GROUP_BY
+    ('region', 'account_id' or 'tag:<key>', e.g. 'tag:aws:autoscaling:groupName')
+    starts a new chunk at every group boundary and titles the widgets after the
+    group. Highlighted resources, such as the current hotspots, get their own
+    row at the top of the first dashboard.
+    """
+
+    def __init__(self, region: str, metrics_per_widget: Optional[int] = None,
+                 widgets_per_dashboard: Optional[int] = None, group_by: Optional[str] = None,
+                 widget_width: int = 12, widget_height: int = 6):
+        if metrics_per_widget is None:
+            metrics_per_widget = int(os.environ.get('DASHBOARD_METRICS_PER_WIDGET', '20'))
+        if widgets_per_dashboard is None:
+            widgets_per_dashboard = int(os.environ.get('DASHBOARD_WIDGETS_PER_DASHBOARD', '50'))
+        if group_by is None:
+            group_by = os.environ.get('DASHBOARD_GROUP_BY', '')
+
+        self.region = region
+        self.metrics_per_widget = max(1, min(metrics_per_widget, MAX_METRICS_PER_WIDGET))
+        self.widgets_per_dashboard = max(1, min(widgets_per_dashboard, MAX_WIDGETS_PER_DASHBOARD))
+        self.group_by = group_by
+        self.widget_width = widget_width
+        self.widget_height = widget_height
+
+    def dashboards(self, base_name: str, resources: List[Dict[str, Any]], specs: List[WidgetSpec],
+                   metric_row: MetricRow, highlights: Optional[List[Dict[str, Any]]] = None,
+                   highlight_title: str = 'top') -> List[Tuple[str, Dict[str, Any]]]:
+        """Return (dashboard name, body) for every dashboard needed to show all resources"""
+        per_widget = self.resources_per_widget(specs)
+        chunks = []
+        if highlights:
+            chunks.append((f" - {highlight_title}", highlights[:per_widget]))
+        for label, members in self._groups(resources):
+            parts = [members[start:start + per_widget] for start in range(0, len(members), per_widget)]
+            for number, part in enumerate(parts, 1):
+                suffix = f" ({number}/{len(parts)})" if len(parts) > 1 else ''
+                chunks.append((f" - {label}{suffix}" if label else suffix, part))
+
+        # Every chunk puts per_widget resources into each spec, so it costs this many metric rows
+        rows_per_chunk = per_widget * sum(len(spec.metrics) for spec in specs)
+        per_dashboard = max(1, min(self.widgets_per_dashboard // len(specs),
+                                   MAX_METRICS_PER_DASHBOARD // rows_per_chunk))
+        dashboards = []
+        for start in range(0, len(chunks), per_dashboard):
+            number = start // per_dashboard + 1
+            name = base_name if number == 1 else f"{base_name}-{number}"
+            widgets = []
+            for title_suffix, part in chunks[start:start + per_dashboard]:
+                for spec in specs:
+                    widgets.append(self._widget(spec, title_suffix, part, metric_row, len(widgets)))
+            dashboards.append((name, {"widgets": widgets}))
+        return dashboards
+
+    def resources_per_widget(self, specs: List[WidgetSpec]) -> int:
+        """How many resources fit in one widget of every spec, with one widget per spec on a dashboard"""
+        return max(1, min(self.metrics_per_widget // max(len(spec.metrics) for spec in specs),
+                          MAX_METRICS_PER_DASHBOARD // sum(len(spec.metrics) for spec in specs)))
+
+    def _groups(self, resources: List[Dict[str, Any]]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """Split resources by the group key, keeping their order within each group"""
+        if not self.group_by:
+            return [('', resources)]
+
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for resource in resources:
+            if self.group_by.startswith('tag:'):
+                label = resource.get('tags', {}).get(self.group_by[len('tag:'):])
+            else:
+                label = resource.get(self.group_by)
+            groups.setdefault(label or 'ungrouped', []).append(resource)
+        return sorted(groups.items())
+
+    def _widget(self, spec: WidgetSpec, title_suffix: str, resources: List[Dict[str, Any]],
+                metric_row: MetricRow, index: int) -> Dict[str, Any]:
+        """Graph widget for one spec and one chunk, placed on the grid by its index"""
+        per_row = GRID_COLUMNS // self.widget_width
+        return {
+            "type": "metric",
+            "x": (index % per_row) * self.widget_width,
+            "y": (index // per_row) * self.widget_height,
+            "width": self.widget_width, "height": self.widget_height,
+            "properties": {
+                "metrics": [metric_row(prefix, resource) for resource in resources for prefix in spec.metrics],
+                "period": spec.period,
+                "stat": spec.stat,
+                "region": self.region,
+                "title": f"{spec.title}{title_suffix}"
+            }
+        }
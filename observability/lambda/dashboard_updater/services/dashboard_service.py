@@ -1,162 +1,313 @@
 """
 Dashboard management service
 """
-import boto3
+import os
 import json
+import time
+import random
+import hashlib
 import logging
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from botocore.exceptions import ClientError
+from shared import bootstrap
+from .dashboard_layout import DashboardLayout, WidgetSpec
+from .hotspot_ranker import HotspotRanker
 
 logger = logging.getLogger(__name__)
 
+EC2_WIDGETS = [
+    WidgetSpec("EC2 CPU Utilization", [["AWS/EC2", "CPUUtilization", "InstanceId"]]),
+    WidgetSpec("EC2 Network I/O", [["AWS/EC2", "NetworkIn", "InstanceId"], ["AWS/EC2", "NetworkOut", "InstanceId"]])
+]
+LAMBDA_WIDGETS = [
+    WidgetSpec("Lambda Duration", [["AWS/Lambda", "Duration", "FunctionName"]]),
+    WidgetSpec("Lambda Errors", [["AWS/Lambda", "Errors", "FunctionName"]], stat="Sum")
+]
+ECS_CLUSTER_WIDGETS = [
+    WidgetSpec("ECS Cluster CPU Utilization", [["AWS/ECS", "CPUUtilization", "ClusterName"]]),
+    WidgetSpec("ECS Cluster Memory Utilization", [["AWS/ECS", "MemoryUtilization", "ClusterName"]])
+]
+# Service rows also carry the ClusterName dimension; running task counts need Container Insights
+ECS_SERVICE_WIDGETS = [
+    WidgetSpec("ECS Service CPU Utilization", [["AWS/ECS", "CPUUtilization", "ServiceName"]]),
+    WidgetSpec("ECS Service Memory Utilization", [["AWS/ECS", "MemoryUtilization", "ServiceName"]]),
+    WidgetSpec("ECS Running Tasks", [["ECS/ContainerInsights", "RunningTaskCount", "ServiceName"]])
+]
+RDS_WIDGETS = [
+    WidgetSpec("RDS CPU Utilization", [["AWS/RDS", "CPUUtilization", "DBInstanceIdentifier"]]),
+    WidgetSpec("RDS Connections", [["AWS/RDS", "DatabaseConnections", "DBInstanceIdentifier"]]),
+    WidgetSpec("RDS Read/Write Latency", [["AWS/RDS", "ReadLatency", "DBInstanceIdentifier"],
+                                          ["AWS/RDS", "WriteLatency", "DBInstanceIdentifier"]]),
+    WidgetSpec("RDS Free Storage", [["AWS/RDS", "FreeStorageSpace", "DBInstanceIdentifier"]], stat="Minimum")
+]
+
+# Error codes CloudWatch uses when put_dashboard is throttled
+THROTTLING_CODES = {'Throttling', 'ThrottlingException', 'TooManyRequestsException', 'LimitExceededException'}
+
+# Base name and (name, body, description) of every dashboard of one type
+Rendered = Tuple[str, List[Tuple[str, Dict[str, Any], str]]]
+
+# Metric and statistic that decide the hotspots, overridable as DASHBOARD_RANK_<TYPE>="Metric/Stat"
+RANK_METRICS = {
+    'EC2': ("AWS/EC2", "CPUUtilization", "InstanceId", "Average"),
+    'LAMBDA': ("AWS/Lambda", "Errors", "FunctionName", "Sum"),
+    'ECS_SERVICE': ("AWS/ECS", "CPUUtilization", "ServiceName", "Average"),
+    'RDS': ("AWS/RDS", "CPUUtilization", "DBInstanceIdentifier", "Average")
+}
+
 class DashboardService:
     """Service for managing CloudWatch dashboards"""
     
     def __init__(self):
-        self.cloudwatch = boto3.client('cloudwatch')
+        self.cloudwatch = bootstrap.get_client('cloudwatch')
+        self.region = os.environ.get('AWS_REGION', 'us-east-1')
+        # Digest of the body last seen live per dashboard, kept for the life of the container
+        self._published_digests: Dict[str, Optional[str]] = {}
+        # Number of numbered shards last published per dashboard family
+        self._shard_counts: Dict[str, int] = {}
+        # Dashboard families that showed a hotspot row last run, which can change with an unchanged inventory
+        self._ranked: Dict[str, bool] = {}
+        # Dashboard types fully published last run
+        self._settled: set = set()
+        self.layout = DashboardLayout(self.region)
+        self.ranker = HotspotRanker()
+        self.top_n = int(os.environ.get('DASHBOARD_TOP_N', '10'))
+        self.workers = int(os.environ.get('DASHBOARD_WORKERS', '4'))
+        self.put_attempts = int(os.environ.get('DASHBOARD_PUT_ATTEMPTS', '4'))
+        self.sleep = time.sleep
     
-    def update_dashboards(self, resources: Dict[str, List[str]]) -> List[str]:
-        """Update dashboards based on discovered resources"""
-        updated_dashboards = []
+    def update_dashboards(self, resources: Dict[str, List[Dict[str, Any]]],
+                          changed_types: Optional[set] = None) -> Dict[str, List[str]]:
+        """Update dashboards based on discovered resources
+
+        Every dashboard type is rendered, then every dashboard published, on a
+        bounded worker pool. With changed_types from the inventory delta, types
+        whose resources did not change are not rendered at all, as long as they
+        were fully published last run and show no hotspot row. Returns the
+        dashboard types that were updated, skipped as unchanged, or failed.
+        """
+        results = {'updated': [], 'skipped': [], 'failed': []}
+        renderers = [
+            ('EC2', 'ec2_instances', self._update_ec2_dashboard),
+            ('Lambda', 'lambda_functions', self._update_lambda_dashboard),
+            ('ECS', 'ecs_clusters', self._update_ecs_dashboard),
+            ('ECS-Services', 'ecs_services', self._update_ecs_services_dashboard),
+            ('RDS', 'rds_instances', self._update_rds_dashboard)
+        ]
+        pool = bootstrap.get_service(
+            'dashboard_pool',
+            lambda: ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dashboard')
+        )
         
-        if resources['ec2_instances']:
-            self._update_ec2_dashboard(resources['ec2_instances'])
-            updated_dashboards.append('EC2')
+        rendering = {}
+        for label, key, render in renderers:
+            if changed_types is not None and key not in changed_types and label in self._settled:
+                results['skipped'].append(label)
+                continue
+            if resources.get(key):
+                # Stable order so an unchanged inventory renders an identical body
+                ordered = sorted(resources[key], key=self._sort_key)
+                rendering[label] = pool.submit(render, ordered)
         
-        if resources['lambda_functions']:
-            self._update_lambda_dashboard(resources['lambda_functions'])
-            updated_dashboards.append('Lambda')
+        rendered = {}
+        for label, future in rendering.items():
+            try:
+                family = future.result()
+            except Exception as e:
+                logger.error(f"Failed to render {label} dashboards: {e}", exc_info=True)
+                results['failed'].append(label)
+                self._settled.discard(label)
+                continue
+            if family:
+                rendered[label] = family
         
-        if resources['ecs_clusters']:
-            self._update_ecs_dashboard(resources['ecs_clusters'])
-            updated_dashboards.append('ECS')
+        # Rendering is finished before publishing starts, so the pool never waits on itself
+        publishing = {
+            label: [pool.submit(self._publish, name, body, description) for name, body, description in dashboards]
+            for label, (_, dashboards) in rendered.items()
+        }
         
-        if resources['rds_instances']:
-            self._update_rds_dashboard(resources['rds_instances'])
-            updated_dashboards.append('RDS')
+        for label, futures in publishing.items():
+            statuses = [self._status(future, label) for future in futures]
+            base_name, dashboards = rendered[label]
+            self._remove_stale_shards(base_name, len(dashboards))
+            
+            if 'failed' in statuses:
+                results['failed'].append(label)
+                self._settled.discard(label)
+            else:
+                results['updated' if 'updated' in statuses else 'skipped'].append(label)
+                if self._ranked.get(base_name):
+                    self._settled.discard(label)
+                else:
+                    self._settled.add(label)
         
-        return updated_dashboards
+        logger.info(f"Dashboards updated: {results['updated']}, unchanged: {results['skipped']}, "
+                    f"failed: {results['failed']}")
+        return results
     
-    def _update_ec2_dashboard(self, instances: List[str]):
-        """Update EC2 dashboard with current instances"""
-        widgets = self._create_ec2_widgets(instances)
-        dashboard_body = {
-            "widgets": widgets
-        }
-        
+    def _update_ec2_dashboard(self, instances: List[Dict[str, Any]]) -> Rendered:
+        """Render EC2 dashboards for current instances"""
+        return self._render('Observability-EC2-Auto', instances, EC2_WIDGETS, 'instances', 'EC2')
+    
+    def _update_lambda_dashboard(self, functions: List[Dict[str, Any]]) -> Rendered:
+        """Render Lambda dashboards for current functions"""
+        return self._render('Observability-Lambda-Auto', functions, LAMBDA_WIDGETS, 'functions', 'LAMBDA')
+    
+    def _render(self, base_name: str, resources: List[Dict[str, Any]], specs: List[WidgetSpec],
+                noun: str, resource_type: Optional[str] = None) -> Rendered:
+        """Lay out every dashboard of one type as (name, body, description)"""
+        hotspots, title = self._hotspots(resources, specs, resource_type)
+        self._ranked[base_name] = bool(hotspots)
+        dashboards = self.layout.dashboards(base_name, resources, specs, self._metric, hotspots, title)
+        return base_name, [
+            (name, body, f"{len(resources)} {noun} (shard {number} of {len(dashboards)})")
+            for number, (name, body) in enumerate(dashboards, 1)
+        ]
+    
+    @staticmethod
+    def _sort_key(resource: Dict[str, Any]) -> Tuple:
+        """Order resources by where they live, then by id and any extra dimensions"""
+        return (resource.get('account_id', ''), resource.get('region', ''), resource['id'],
+                sorted(resource.get('dimensions', {}).items()))
+    
+    @staticmethod
+    def _status(future, label: str) -> str:
+        """Resolve a publish future, treating unexpected errors as a failed dashboard"""
         try:
-            self.cloudwatch.put_dashboard(
-                DashboardName='Observability-EC2-Auto',
-                DashboardBody=json.dumps(dashboard_body)
-            )
-            logger.info(f"Updated EC2 dashboard with {len(instances)} instances")
+            return future.result()
         except Exception as e:
-            logger.error(f"Failed to update EC2 dashboard: {e}")
+            logger.error(f"Unexpected error publishing {label} dashboard: {e}", exc_info=True)
+            return 'failed'
     
-    def _create_ec2_widgets(self, instances: List[str]) -> List[Dict]:
-        """Create EC2 dashboard widgets"""
-        widgets = []
-        
-        # CPU utilization widget
-        widgets.append({
-            "type": "metric",
-            "x": 0, "y": 0,
-            "width": 12, "height": 6,
-            "properties": {
-                "metrics": [
-                    ["AWS/EC2", "CPUUtilization", "InstanceId", instance_id]
-                    for instance_id in instances[:10]  # Limit to 10 instances
-                ],
-                "period": 300,
-                "stat": "Average",
-                "region": "us-east-1",
-                "title": "EC2 CPU Utilization"
-            }
-        })
+    def _hotspots(self, resources: List[Dict[str, Any]], specs: List[WidgetSpec],
+                  resource_type: Optional[str]) -> Tuple[List[Dict[str, Any]], str]:
+        """Return the hottest resources and the title suffix for their widgets"""
+        count = min(self.top_n, self.layout.resources_per_widget(specs))
+        if resource_type not in RANK_METRICS or len(resources) <= count:
+            # Everything already fits in the first widget
+            return [], ''
         
-        # Network I/O widget
-        widgets.append({
-            "type": "metric",
-            "x": 12, "y": 0,
-            "width": 12, "height": 6,
-            "properties": {
-                "metrics": [
-                    ["AWS/EC2", "NetworkIn", "InstanceId", instance_id]
-                    for instance_id in instances[:5]
-                ] + [
-                    [".", "NetworkOut", ".", instance_id]
-                    for instance_id in instances[:5]
-                ],
-                "period": 300,
-                "stat": "Average",
-                "region": "us-east-1",
-                "title": "EC2 Network I/O"
-            }
-        })
+        namespace, metric_name, dimension, stat = RANK_METRICS[resource_type]
+        override = os.environ.get(f"DASHBOARD_RANK_{resource_type}")
+        if override:
+            metric_name, _, stat = override.partition('/')
+            stat = stat or 'Average'
         
-        return widgets
+        try:
+            hottest = self.ranker.top(resources, namespace, metric_name, dimension, stat, count)
+        except Exception as e:
+            logger.warning(f"Could not rank {resource_type} resources by {metric_name}: {e}")
+            return [], ''
+        if not hottest:
+            return [], ''
+        # Keep the body stable while the set of hotspots is unchanged
+        hottest.sort(key=self._sort_key)
+        return hottest, f"top {len(hottest)} by {metric_name}"
     
-    def _update_lambda_dashboard(self, functions: List[str]):
-        """Update Lambda dashboard with current functions"""
-        widgets = self._create_lambda_widgets(functions)
-        dashboard_body = {
-            "widgets": widgets
-        }
+    def _remove_stale_shards(self, base_name: str, shard_count: int):
+        """Delete numbered dashboards left over from a larger fleet"""
+        known = self._shard_counts.get(base_name)
+        self._shard_counts[base_name] = shard_count
+        if known is not None and known <= shard_count:
+            return
         
+        stale = []
         try:
-            self.cloudwatch.put_dashboard(
-                DashboardName='Observability-Lambda-Auto',
-                DashboardBody=json.dumps(dashboard_body)
-            )
-            logger.info(f"Updated Lambda dashboard with {len(functions)} functions")
+            paginator = self.cloudwatch.get_paginator('list_dashboards')
+            for page in paginator.paginate(DashboardNamePrefix=f"{base_name}-"):
+                for entry in page['DashboardEntries']:
+                    suffix = entry['DashboardName'][len(base_name) + 1:]
+                    if suffix.isdigit() and int(suffix) > shard_count:
+                        stale.append(entry['DashboardName'])
+            if stale:
+                self.cloudwatch.delete_dashboards(DashboardNames=stale)
+                logger.info(f"Removed {len(stale)} stale dashboards: {stale}")
         except Exception as e:
-            logger.error(f"Failed to update Lambda dashboard: {e}")
+            logger.warning(f"Could not remove stale {base_name} dashboards: {e}")
+            # Look again next run
+            self._shard_counts.pop(base_name, None)
+        
+        for name in stale:
+            self._published_digests.pop(name, None)
     
-    def _create_lambda_widgets(self, functions: List[str]) -> List[Dict]:
-        """Create Lambda dashboard widgets"""
-        widgets = []
+    def _publish(self, dashboard_name: str, dashboard_body: Dict[str, Any], description: str) -> str:
+        """Put a dashboard only when its canonical body differs from the live one
+
+        Returns 'updated', 'skipped' or 'failed'
+        """
+        body = self._canonical(dashboard_body)
+        digest = hashlib.sha256(body.encode('utf-8')).hexdigest()
         
-        # Duration widget
-        widgets.append({
-            "type": "metric",
-            "x": 0, "y": 0,
-            "width": 12, "height": 6,
-            "properties": {
-                "metrics": [
-                    ["AWS/Lambda", "Duration", "FunctionName", function_name]
-                    for function_name in functions[:10]
-                ],
-                "period": 300,
-                "stat": "Average",
-                "region": "us-east-1",
-                "title": "Lambda Duration"
-            }
-        })
+        if digest == self._live_digest(dashboard_name):
+            logger.info(f"{dashboard_name} unchanged with {description}, skipping put_dashboard")
+            return 'skipped'
         
-        # Error rate widget
-        widgets.append({
-            "type": "metric",
-            "x": 12, "y": 0,
-            "width": 12, "height": 6,
-            "properties": {
-                "metrics": [
-                    ["AWS/Lambda", "Errors", "FunctionName", function_name]
-                    for function_name in functions[:10]
-                ],
-                "period": 300,
-                "stat": "Sum",
-                "region": "us-east-1",
-                "title": "Lambda Errors"
-            }
-        })
+        try:
+            self._put_dashboard(dashboard_name, body)
+            logger.info(f"Updated {dashboard_name} with {description}")
+        except Exception as e:
+            logger.error(f"Failed to update {dashboard_name}: {e}")
+            self._published_digests.pop(dashboard_name, None)
+            return 'failed'
         
-        return widgets
+        self._published_digests[dashboard_name] = digest
+        return 'updated'
+    
+    def _put_dashboard(self, dashboard_name: str, body: str):
+        """Put a dashboard, backing off with jitter while CloudWatch throttles"""
+        for attempt in range(1, self.put_attempts + 1):
+            try:
+                self.cloudwatch.put_dashboard(DashboardName=dashboard_name, DashboardBody=body)
+                return
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code not in THROTTLING_CODES or attempt == self.put_attempts:
+                    raise
+                delay = random.uniform(0, min(8.0, 0.5 * 2 ** (attempt - 1)))
+                logger.warning(f"put_dashboard for {dashboard_name} throttled, retrying in {delay:.2f} s")
+                self.sleep(delay)
+    
+    def _live_digest(self, dashboard_name: str) -> Optional[str]:
+        """Digest of the live dashboard body, read with get_dashboard on first use"""
+        if dashboard_name not in self._published_digests:
+            try:
+                response = self.cloudwatch.get_dashboard(DashboardName=dashboard_name)
+                live_body = self._canonical(json.loads(response['DashboardBody']))
+                self._published_digests[dashboard_name] = hashlib.sha256(live_body.encode('utf-8')).hexdigest()
+            except ClientError as e:
+                # ResourceNotFound on first run; anything else just means we publish
+                if e.response.get('Error', {}).get('Code') != 'ResourceNotFound':
+                    logger.warning(f"Could not read {dashboard_name}: {e}")
+                self._published_digests[dashboard_name] = None
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Unreadable body for {dashboard_name}: {e}")
+                self._published_digests[dashboard_name] = None
+        return self._published_digests[dashboard_name]
+    
+    @staticmethod
+    def _canonical(dashboard_body: Dict[str, Any]) -> str:
+        """Serialize a dashboard body the same way regardless of key order or whitespace"""
+        return json.dumps(dashboard_body, sort_keys=True, separators=(',', ':'))
+    
+    def _metric(self, prefix: List[str], resource: Dict[str, Any]) -> List[Any]:
+        """Metric line for one resource, pointed at the account and region it lives in"""
+        options = {"region": resource.get('region', self.region)}
+        if resource.get('account_id'):
+            options["accountId"] = resource['account_id']
+        extra = [item for name, value in sorted(resource.get('dimensions', {}).items()) for item in (name, value)]
+        return prefix + [resource['id']] + extra + [options]
+    
+    def _update_ecs_dashboard(self, clusters: List[Dict[str, Any]]) -> Rendered:
+        """Render ECS dashboards for current clusters"""
+        return self._render('Observability-ECS-Auto', clusters, ECS_CLUSTER_WIDGETS, 'clusters')
     
-    def _update_ecs_dashboard(self, clusters: List[str]):
-        """Update ECS dashboard with current clusters"""
-        logger.info(f"Would update ECS dashboard with {len(clusters)} clusters")
-        # Implementation for ECS dashboard
+    def _update_ecs_services_dashboard(self, services: List[Dict[str, Any]]) -> Rendered:
+        """Render ECS dashboards for current services"""
+        return self._render('Observability-ECS-Services-Auto', services, ECS_SERVICE_WIDGETS, 'services',
+                            'ECS_SERVICE')
     
-    def _update_rds_dashboard(self, instances: List[str]):
-        """Update RDS dashboard with current instances"""
-        logger.info(f"Would update RDS dashboard with {len(instances)} instances")
-        # Implementation for RDS dashboard
\ No newline at end of file
+    def _update_rds_dashboard(self, instances: List[Dict[str, Any]]) -> Rendered:
+        """Render RDS dashboards for current instances"""
+        return self._render('Observability-RDS-Auto', instances, RDS_WIDGETS, 'instances', 'RDS')
\ No newline at end of file
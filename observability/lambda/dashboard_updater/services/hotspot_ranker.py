@@ -0,0 +1,137 @@
+"""
+Hotspot ranker
+Ranks resources by a recent metric using batched GetMetricData calls
+"""
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from shared import bootstrap
+
+logger = logging.getLogger(__name__)
+
+# GetMetricData accepts up to 500 queries per request
+MAX_QUERIES_PER_REQUEST = 500
+
+
+class HotspotRanker:
+    """Picks the resources with the highest recent value of a metric
+
+    The lookback window is requested as a single period, so every query returns
+    one aggregated datapoint. Requests are split by region, batched at 500
+    queries and sent concurrently; the whole ranking is bounded by
+    DASHBOARD_RANK_TIMEOUT_SECONDS, after which no ranking is returned.
+    """
+
+    def __init__(self, lookback_minutes: Optional[int] = None, timeout_seconds: Optional[float] = None,
+                 workers: Optional[int] = None):
+        if lookback_minutes is None:
+            lookback_minutes = int(os.environ.get('DASHBOARD_RANK_LOOKBACK_MINUTES', '60'))
+        if timeout_seconds is None:
+            timeout_seconds = float(os.environ.get('DASHBOARD_RANK_TIMEOUT_SECONDS', '5'))
+        if workers is None:
+            workers = int(os.environ.get('DASHBOARD_RANK_WORKERS', '8'))
+
+        self.lookback_minutes = lookback_minutes
+        self.timeout_seconds = timeout_seconds
+        self.workers = workers
+        self.calls = 0
+        self._home_account = None
+
+    def top(self, resources: List[Dict[str, Any]], namespace: str, metric_name: str, dimension: str,
+            stat: str, count: int) -> List[Dict[str, Any]]:
+        """Return up to count resources with the highest stat, hottest first
+
+        Resources without datapoints rank below every resource with data.
+        Returns an empty list when the ranking cannot finish in time.
+        """
+        if not resources or count <= 0:
+            return []
+
+        start = time.perf_counter()
+        end_time = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        start_time = end_time - timedelta(minutes=self.lookback_minutes)
+
+        by_region: Dict[str, List[int]] = {}
+        for index, resource in enumerate(resources):
+            by_region.setdefault(resource.get('region', ''), []).append(index)
+
+        pool = bootstrap.get_service(
+            'ranking_pool',
+            lambda: ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ranking')
+        )
+        futures = []
+        for region, indexes in by_region.items():
+            for offset in range(0, len(indexes), MAX_QUERIES_PER_REQUEST):
+                batch = indexes[offset:offset + MAX_QUERIES_PER_REQUEST]
+                queries = [self._query(index, resources[index], namespace, metric_name, dimension, stat)
+                           for index in batch]
+                futures.append(pool.submit(self._fetch, region or None, queries, start_time, end_time))
+
+        done, pending = wait(futures, timeout=self.timeout_seconds)
+        if pending:
+            logger.warning(f"Ranking {len(resources)} resources by {metric_name} exceeded "
+                           f"{self.timeout_seconds} s, showing them unranked")
+            return []
+
+        scores: Dict[int, float] = {}
+        for future in done:
+            try:
+                scores.update(future.result())
+            except Exception as e:
+                logger.warning(f"GetMetricData failed while ranking by {metric_name}: {e}")
+                return []
+
+        ranked = sorted(range(len(resources)), key=lambda index: scores.get(index, float('-inf')), reverse=True)
+        logger.info(f"Ranked {len(resources)} resources by {metric_name} in "
+                    f"{(time.perf_counter() - start) * 1000:.0f} ms")
+        return [resources[index] for index in ranked[:count]]
+
+    def _query(self, index: int, resource: Dict[str, Any], namespace: str, metric_name: str,
+               dimension: str, stat: str) -> Dict[str, Any]:
+        """One GetMetricData query; the Id carries the resource position"""
+        query = {
+            'Id': f"r{index}",
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': namespace,
+                    'MetricName': metric_name,
+                    'Dimensions': [{'Name': dimension, 'Value': resource['id']}] + [
+                        {'Name': name, 'Value': value}
+                        for name, value in sorted(resource.get('dimensions', {}).items())
+                    ]
+                },
+                'Period': self.lookback_minutes * 60,
+                'Stat': stat
+            },
+            'ReturnData': True
+        }
+        # Other accounts are read through CloudWatch cross-account observability
+        account_id = resource.get('account_id')
+        if account_id and account_id != self._get_home_account():
+            query['AccountId'] = account_id
+        return query
+
+    def _fetch(self, region: Optional[str], queries: List[Dict[str, Any]], start_time: datetime,
+               end_time: datetime) -> Dict[int, float]:
+        """Run one batch of queries, following NextToken, and return the score per resource position"""
+        cloudwatch = bootstrap.get_client('cloudwatch', region_name=region)
+        scores = {}
+        kwargs = {'MetricDataQueries': queries, 'StartTime': start_time, 'EndTime': end_time}
+        while True:
+            self.calls += 1
+            response = cloudwatch.get_metric_data(**kwargs)
+            for result in response['MetricDataResults']:
+                if result.get('Values'):
+                    scores[int(result['Id'][1:])] = max(result['Values'])
+            if not response.get('NextToken'):
+                return scores
+            kwargs['NextToken'] = response['NextToken']
+
+    def _get_home_account(self) -> str:
+        """Account of this function, looked up once per container"""
+        if self._home_account is None:
+            self._home_account = bootstrap.get_client('sts').get_caller_identity()['Account']
+        return self._home_account
@@ -0,0 +1,230 @@
+"""
+Resource discovery service
+Finds the resources that should appear on the auto-generated dashboards
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from shared import bootstrap
+
+logger = logging.getLogger(__name__)
+
+# Role the organization creates in member accounts
+DEFAULT_ROLE_NAME = 'OrganizationAccountAccessRole'
+
+# DescribeServices accepts up to 10 services per call
+ECS_DESCRIBE_BATCH_SIZE = 10
+
+
+def _split(value: Optional[str]) -> List[str]:
+    """Parse a comma-separated environment setting"""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def _operation(name: str) -> str:
+    """API name of a boto3 method, e.g. describe_db_instances -> DescribeDBInstances"""
+    return ''.join('DB' if part == 'db' else part.capitalize() for part in name.split('_'))
+
+
+def _tags(tag_list: List[Dict[str, str]]) -> Dict[str, str]:
+    """Turn an AWS Key/Value tag list into a dict"""
+    return {tag['Key']: tag['Value'] for tag in tag_list}
+
+
+class ResourceDiscoveryService:
+    """Service for discovering AWS resources to monitor
+
+    Scans every account in DISCOVERY_ACCOUNTS (by assuming DISCOVERY_ROLE_NAME)
+    and every region in DISCOVERY_REGIONS, defaulting to this function's own
+    account and region. Each (account, region, resource type) is discovered on
+    a bounded thread pool and fully paginated, so a pass takes about as long as
+    the slowest single scan rather than the sum of all of them. Discoverers
+    stream one page at a time, keeping only the compact resource records, and
+    every API call is counted and timed per operation.
+    """
+
+    def __init__(self):
+        self.home_region = os.environ.get('AWS_REGION', 'us-east-1')
+        self.regions = _split(os.environ.get('DISCOVERY_REGIONS')) or [self.home_region]
+        self.accounts = _split(os.environ.get('DISCOVERY_ACCOUNTS'))
+        self.role_name = os.environ.get('DISCOVERY_ROLE_NAME', DEFAULT_ROLE_NAME)
+        self.workers = int(os.environ.get('DISCOVERY_WORKERS', '8'))
+        self._home_account = None
+        # Calls and milliseconds per API operation since the last take_api_stats()
+        self._api_calls: Dict[str, int] = {}
+        self._api_ms: Dict[str, float] = {}
+        self._stats_lock = threading.Lock()
+
+    def discover_all_resources(self) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, str]]]:
+        """Discover every supported resource type in every account and region
+
+        Returns the resources and the scopes ({'type', 'account_id', 'region'})
+        whose scan failed. Each resource is returned as {'id', 'account_id',
+        'region'}, plus 'tags' where the discovery call returns them at no extra cost
+        """
+        discoverers: Dict[str, Tuple[str, Callable[[Any], Iterator[Dict[str, Any]]]]] = {
+            'ec2_instances': ('ec2', self.discover_ec2_instances),
+            'lambda_functions': ('lambda', self.discover_lambda_functions),
+            'ecs_clusters': ('ecs', self.discover_ecs_clusters),
+            'ecs_services': ('ecs', self.discover_ecs_services),
+            'rds_instances': ('rds', self.discover_rds_instances)
+        }
+
+        pool = bootstrap.get_service(
+            'discovery_pool',
+            lambda: ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='discovery')
+        )
+        futures = [
+            (key, account_id, region, pool.submit(self._discover, key, service, discover, account_id, region, role_arn))
+            for account_id, role_arn in self._accounts()
+            for region in self.regions
+            for key, (service, discover) in discoverers.items()
+        ]
+
+        resources = {key: [] for key in discoverers}
+        failed = []
+        for key, account_id, region, future in futures:
+            try:
+                resources[key].extend(future.result())
+            except Exception as e:
+                # One failing account, region or service should not blank the dashboards of the others,
+                # and callers must not mistake its empty result for resources that are gone
+                logger.warning(f"Discovery of {key} in {account_id}/{region} failed: {e}")
+                failed.append({'type': key, 'account_id': account_id, 'region': region})
+
+        with self._stats_lock:
+            logger.info(f"Discovery API calls: {self._api_calls}")
+        return resources, failed
+
+    def take_api_stats(self) -> Tuple[Dict[str, int], Dict[str, float]]:
+        """Return and reset (calls, milliseconds) per API operation"""
+        with self._stats_lock:
+            stats = (self._api_calls, self._api_ms)
+            self._api_calls, self._api_ms = {}, {}
+        return stats
+
+    def describe_ec2_instances(self, instance_ids: List[str], account_id: str, region: str) -> List[Dict[str, Any]]:
+        """Return the given instances, if running, shaped like a full scan would return them"""
+        return self._discover(
+            'ec2_instances', 'ec2', lambda ec2: self.discover_ec2_instances(ec2, instance_ids),
+            account_id, region, self._role_arn(account_id)
+        )
+
+    def discover_ec2_instances(self, ec2, instance_ids: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield running EC2 instances with their tags, optionally only the given ones"""
+        filters = [{'Name': 'instance-state-name', 'Values': ['running']}]
+        if instance_ids:
+            filters.append({'Name': 'instance-id', 'Values': instance_ids})
+        for page in self._pages(ec2, 'describe_instances', Filters=filters):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    yield {'id': instance['InstanceId'], 'instance_type': instance.get('InstanceType'),
+                           'tags': _tags(instance.get('Tags', []))}
+
+    def discover_lambda_functions(self, lambda_client) -> Iterator[Dict[str, Any]]:
+        """Yield Lambda functions by name"""
+        for page in self._pages(lambda_client, 'list_functions'):
+            for function in page['Functions']:
+                yield {'id': function['FunctionName']}
+
+    def discover_ecs_clusters(self, ecs) -> Iterator[Dict[str, Any]]:
+        """Yield ECS clusters by name"""
+        for page in self._pages(ecs, 'list_clusters'):
+            # Metrics are dimensioned by cluster name, not ARN
+            for arn in page['clusterArns']:
+                yield {'id': arn.split('/')[-1]}
+
+    def discover_ecs_services(self, ecs) -> Iterator[Dict[str, Any]]:
+        """Yield active ECS services of every cluster, described 10 at a time"""
+        for page in self._pages(ecs, 'list_clusters'):
+            for cluster_arn in page['clusterArns']:
+                cluster_name = cluster_arn.split('/')[-1]
+                for services_page in self._pages(ecs, 'list_services', cluster=cluster_arn):
+                    # list_services pages hold 10 ARNs by default, so each page is described as it arrives
+                    service_arns = services_page['serviceArns']
+                    for start in range(0, len(service_arns), ECS_DESCRIBE_BATCH_SIZE):
+                        response = self._call(
+                            ecs, 'describe_services',
+                            cluster=cluster_arn,
+                            services=service_arns[start:start + ECS_DESCRIBE_BATCH_SIZE],
+                            include=['TAGS']
+                        )
+                        for service in response['services']:
+                            if service.get('status') == 'ACTIVE':
+                                yield {
+                                    'id': service['serviceName'],
+                                    'dimensions': {'ClusterName': cluster_name},
+                                    'launch_type': service.get('launchType'),
+                                    'desired_count': service.get('desiredCount'),
+                                    'running_count': service.get('runningCount'),
+                                    'tags': {tag['key']: tag['value'] for tag in service.get('tags', [])}
+                                }
+
+    def discover_rds_instances(self, rds) -> Iterator[Dict[str, Any]]:
+        """Yield available RDS instances with their tags"""
+        for page in self._pages(rds, 'describe_db_instances'):
+            for db in page['DBInstances']:
+                if db['DBInstanceStatus'] == 'available':
+                    yield {
+                        'id': db['DBInstanceIdentifier'],
+                        'engine': db.get('Engine'),
+                        'instance_class': db.get('DBInstanceClass'),
+                        'tags': _tags(db.get('TagList', []))
+                    }
+
+    def _pages(self, client, operation: str, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Yield the pages of a paginated call one at a time, counting and timing each request"""
+        pages = iter(client.get_paginator(operation).paginate(**kwargs))
+        while True:
+            start = time.perf_counter()
+            page = next(pages, None)
+            if page is None:
+                return
+            self._record(operation, time.perf_counter() - start)
+            yield page
+
+    def _call(self, client, operation: str, **kwargs) -> Dict[str, Any]:
+        """Make one API call, counting and timing it"""
+        start = time.perf_counter()
+        try:
+            return getattr(client, operation)(**kwargs)
+        finally:
+            self._record(operation, time.perf_counter() - start)
+
+    def _record(self, operation: str, seconds: float):
+        """Add one call to the per-operation stats"""
+        name = _operation(operation)
+        with self._stats_lock:
+            self._api_calls[name] = self._api_calls.get(name, 0) + 1
+            self._api_ms[name] = self._api_ms.get(name, 0.0) + seconds * 1000
+
+    def _accounts(self) -> List[Tuple[str, Optional[str]]]:
+        """Return (account ID, role ARN to assume) pairs; None means our own credentials"""
+        if not self.accounts:
+            return [(self._get_home_account(), None)]
+        return [(account_id, self._role_arn(account_id)) for account_id in self.accounts]
+
+    def _role_arn(self, account_id: str) -> Optional[str]:
+        """Role to assume for an account; None for our own"""
+        if account_id == self._get_home_account():
+            return None
+        return f"arn:aws:iam::{account_id}:role/{self.role_name}"
+
+    def _get_home_account(self) -> str:
+        """Account of this function, looked up once per container"""
+        if self._home_account is None:
+            self._home_account = bootstrap.get_client('sts').get_caller_identity()['Account']
+        return self._home_account
+
+    def _discover(self, key: str, service: str, discover: Callable[[Any], Iterator[Dict[str, Any]]],
+                  account_id: str, region: str, role_arn: Optional[str]) -> List[Dict[str, Any]]:
+        """Run one discoverer against one account and region and tag what it finds"""
+        start = time.perf_counter()
+        client = bootstrap.get_client(service, region_name=region, role_arn=role_arn)
+        found = [dict(resource, account_id=account_id, region=region) for resource in discover(client)]
+        logger.info(f"Discovered {len(found)} {key} in {account_id}/{region} "
+                    f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return found
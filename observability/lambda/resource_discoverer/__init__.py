@@ -0,0 +1 @@
+# Resource discoverer Lambda package
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Inventory change events
+Turns EC2 state changes and CloudTrail create/delete calls into inventory upserts and removals
+"""
+import logging
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+Changes = Dict[str, List[Dict[str, Any]]]
+
+EC2_STATE_CHANGE = 'EC2 Instance State-change Notification'
+CLOUDTRAIL_CALL = 'AWS API Call via CloudTrail'
+
+# Discovery only tracks running instances
+EC2_GONE_STATES = {'stopping', 'stopped', 'shutting-down', 'terminated'}
+
+# CloudTrail event name -> (resource type, upsert or remove). CreateDBInstance is left out: the
+# instance is still 'creating' and the scan, which only keeps available ones, would remove it again
+CLOUDTRAIL_EVENTS = {
+    'CreateFunction20150331': ('lambda_functions', 'upsert'),
+    'DeleteFunction20150331': ('lambda_functions', 'remove'),
+    'DeleteDBInstance': ('rds_instances', 'remove')
+}
+
+
+def is_change_event(event: Dict[str, Any]) -> bool:
+    """True for the events the incremental path understands, False for scheduled scans"""
+    return event.get('detail-type') in (EC2_STATE_CHANGE, CLOUDTRAIL_CALL)
+
+
+def changes_from_event(event: Dict[str, Any]) -> Tuple[Changes, Changes, List[str]]:
+    """Return (upserts, removals, running EC2 instance ids still to be described) for one event
+
+    Resources carry the account and region the event came from, matching what a full scan returns.
+    """
+    upserts: Changes = {}
+    removals: Changes = {}
+    running: List[str] = []
+    detail = event.get('detail', {})
+    where = {'account_id': event.get('account', ''), 'region': event.get('region', '')}
+
+    if event.get('detail-type') == EC2_STATE_CHANGE:
+        instance_id = detail.get('instance-id')
+        state = detail.get('state')
+        if instance_id and state == 'running':
+            # State changes carry no tags or type, so the instance is described afterwards
+            running.append(instance_id)
+        elif instance_id and state in EC2_GONE_STATES:
+            removals.setdefault('ec2_instances', []).append(dict(where, id=instance_id))
+        return upserts, removals, running
+
+    name = detail.get('eventName')
+    if name not in CLOUDTRAIL_EVENTS or detail.get('errorCode'):
+        logger.info(f"Ignoring {name} event{' that failed' if detail.get('errorCode') else ''}")
+        return upserts, removals, running
+
+    resource_type, action = CLOUDTRAIL_EVENTS[name]
+    # CloudTrail records the calling account and region, which is where the resource lives
+    where = {'account_id': detail.get('recipientAccountId', where['account_id']),
+             'region': detail.get('awsRegion', where['region'])}
+    request = detail.get('requestParameters') or {}
+    response = detail.get('responseElements') or {}
+
+    if resource_type == 'lambda_functions':
+        function_name = response.get('functionName') or request.get('functionName', '')
+        if function_name.startswith('arn:'):
+            # arn:aws:lambda:<region>:<account>:function:<name>[:<qualifier>]
+            function_name = function_name.split(':')[6]
+        resource = dict(where, id=function_name)
+    else:
+        resource = dict(where, id=response.get('dBInstanceIdentifier') or request.get('dBInstanceIdentifier'))
+
+    if not resource['id']:
+        logger.warning(f"{name} event without a resource identifier")
+        return upserts, removals, running
+
+    (upserts if action == 'upsert' else removals).setdefault(resource_type, []).append(resource)
+    return upserts, removals, running
@@ -0,0 +1,86 @@
+"""
+Resource discoverer Lambda function
+Keeps the inventory snapshot current from change events and hands the delta to alarm creation
+"""
+import logging
+from typing import Any, Dict, Optional
+from shared import bootstrap
+from shared import inventory
+from shared.metrics import MetricsLogger
+from dashboard_updater.services.resource_discovery import ResourceDiscoveryService
+from .events import changes_from_event, is_change_event
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+@bootstrap.timed_handler
+def handler(event, context):
+    """Apply one change event to the inventory, or reconcile it with a full scan when scheduled"""
+    metrics = MetricsLogger(namespace='Observability/ResourceDiscovery')
+    discovery_service = None
+    try:
+        discovery_service = bootstrap.get_service('resource_discovery', ResourceDiscoveryService)
+        store = bootstrap.get_service('inventory', lambda: inventory.InventoryStore('resource_discoverer'))
+
+        previous = store.latest()
+        if is_change_event(event) and previous is not None:
+            mode = 'incremental'
+            upserts, removals, running = changes_from_event(event)
+            if running:
+                upserts.setdefault('ec2_instances', []).extend(
+                    discovery_service.describe_ec2_instances(running, event.get('account', ''), event.get('region', ''))
+                )
+            resources = inventory.apply(previous, upserts, removals)
+        else:
+            # Scheduled scans, and the first event before any snapshot exists
+            mode = 'reconciliation'
+            with metrics.timer('ScanMs'):
+                resources, failed = discovery_service.discover_all_resources()
+            metrics.put('ResourcesDiscovered', sum(len(v) for v in resources.values()), 'Count')
+            metrics.put('FailedScopes', len(failed), 'Count')
+            resources = inventory.carry_forward(previous, resources, failed)
+
+        delta = inventory.diff(previous, resources)
+        counts = inventory.summary(delta)
+        if inventory.is_empty(delta):
+            logger.info(f"Inventory unchanged after {mode}")
+            snapshot, location = None, None
+        else:
+            # The delta goes through S3 so it is not bound by the 256 KB event limit
+            location = store.save_delta(delta)
+            snapshot = store.save(resources)
+            if mode == 'reconciliation' and previous is not None:
+                # Anything found here was missed by the change events
+                logger.warning(f"Reconciliation found changes the events missed: {counts}")
+            else:
+                logger.info(f"Inventory {mode} delta: {counts}")
+
+        return _response(mode, snapshot, location, counts)
+
+    except Exception as e:
+        # Raise so the async invocation is retried and then lands in the failure queue
+        logger.error(f"Discovery error: {str(e)}", exc_info=True)
+        raise
+    finally:
+        # Only the instance built above; building one here could raise over the original error
+        if discovery_service is not None:
+            _record_api_stats(metrics, discovery_service)
+        metrics.flush()
+
+
+def _record_api_stats(metrics: MetricsLogger, discovery_service: ResourceDiscoveryService):
+    """Publish the calls and time spent per discovery API, e.g. DescribeInstancesCalls and DescribeInstancesMs"""
+    calls, durations = discovery_service.take_api_stats()
+    for operation, count in calls.items():
+        metrics.put(f"{operation}Calls", count, 'Count')
+        metrics.put(f"{operation}Ms", durations[operation])
+
+
+def _response(mode: str, snapshot: Optional[str], location: Optional[Dict[str, str]],
+              counts: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """Pointer to the delta plus summary counts; alarm creation reads the resources from S3"""
+    response = {'statusCode': 200, 'mode': mode, 'snapshot': snapshot, 'delta': counts}
+    if location:
+        response['delta_location'] = location
+    return response
@@ -0,0 +1 @@
+# Shared Lambda utilities package
\ No newline at end of file
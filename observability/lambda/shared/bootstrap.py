@@ -0,0 +1,157 @@
+"""
+Cold-start bootstrap shared by the observability Lambdas
+Builds boto3 clients and services once per container and reports init vs handler time
+"""
+import os
+import json
+import time
+import logging
+import functools
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
+
+logger = logging.getLogger(__name__)
+
+# Tuned for Lambda: reuse warm connections, keep them alive between invocations
+# and back off adaptively instead of hammering throttled APIs
+CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.environ.get('BOTO_MAX_POOL_CONNECTIONS', '20')),
+    tcp_keepalive=True,
+    connect_timeout=float(os.environ.get('BOTO_CONNECT_TIMEOUT', '2')),
+    read_timeout=float(os.environ.get('BOTO_READ_TIMEOUT', '10')),
+    retries={
+        'max_attempts': int(os.environ.get('BOTO_MAX_ATTEMPTS', '5')),
+        'mode': 'adaptive'
+    }
+)
+
+_lock = threading.RLock()
+_clients: Dict[tuple, Any] = {}
+_sessions: Dict[str, boto3.Session] = {}
+_services: Dict[str, Any] = {}
+_build_seconds = 0.0
+_cold_start = True
+
+
+def get_client(service_name: str, region_name: Optional[str] = None, role_arn: Optional[str] = None,
+               max_attempts: Optional[int] = None):
+    """Return a boto3 client built once per container
+
+    With role_arn the client uses credentials of that assumed role, refreshed
+    before they expire. With max_attempts the client makes at most that many
+    attempts in standard retry mode, for callers that retry on their own.
+    """
+    global _build_seconds
+    key = (service_name, region_name, role_arn, max_attempts)
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        if key not in _clients:
+            # Assuming a role builds the STS client inside this measurement
+            build_before = _build_seconds
+            start = time.perf_counter()
+            factory = _assumed_session(role_arn).client if role_arn else boto3.client
+            config = CLIENT_CONFIG
+            if max_attempts is not None:
+                config = config.merge(Config(retries={'total_max_attempts': max_attempts, 'mode': 'standard'}))
+            _clients[key] = factory(service_name, region_name=region_name, config=config)
+            _build_seconds = build_before + time.perf_counter() - start
+        return _clients[key]
+
+
+def _assumed_session(role_arn: str) -> boto3.Session:
+    """Return a session whose credentials come from assuming role_arn"""
+    session = _sessions.get(role_arn)
+    if session is not None:
+        return session
+
+    def refresh():
+        sts = get_client('sts')
+        credentials = sts.assume_role(
+            RoleArn=role_arn,
+            RoleSessionName=os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'observability')[:64]
+        )['Credentials']
+        return {
+            'access_key': credentials['AccessKeyId'],
+            'secret_key': credentials['SecretAccessKey'],
+            'token': credentials['SessionToken'],
+            'expiry_time': credentials['Expiration'].isoformat()
+        }
+
+    botocore_session = botocore.session.get_session()
+    botocore_session._credentials = RefreshableCredentials.create_from_metadata(
+        metadata=refresh(),
+        refresh_using=refresh,
+        method='sts-assume-role'
+    )
+    _sessions[role_arn] = boto3.Session(botocore_session=botocore_session)
+    return _sessions[role_arn]
+
+
+def get_service(name: str, factory: Callable[[], Any]):
+    """Return the named service, building it with factory on first use"""
+    global _build_seconds
+
+    service = _services.get(name)
+    if service is not None:
+        return service
+
+    with _lock:
+        if name not in _services:
+            # Clients built by the factory are already inside this measurement
+            build_before = _build_seconds
+            start = time.perf_counter()
+            _services[name] = factory()
+            _build_seconds = build_before + time.perf_counter() - start
+        return _services[name]
+
+
+def set_client(service_name: str, client, region_name: Optional[str] = None, role_arn: Optional[str] = None,
+               max_attempts: Optional[int] = None):
+    """Install a pre-built client, e.g. a stub for tests or local replay"""
+    with _lock:
+        _clients[(service_name, region_name, role_arn, max_attempts)] = client
+
+
+def reset():
+    """Drop cached clients and services so the next invocation rebuilds them"""
+    global _build_seconds, _cold_start
+    with _lock:
+        _clients.clear()
+        _sessions.clear()
+        _services.clear()
+        _build_seconds = 0.0
+        _cold_start = True
+
+
+def timed_handler(func: Callable):
+    """Log construction time separately from handler time for each invocation"""
+    @functools.wraps(func)
+    def wrapper(event, context):
+        global _cold_start
+        cold_start = _cold_start
+        _cold_start = False
+
+        build_before = _build_seconds
+        start = time.perf_counter()
+        try:
+            return func(event, context)
+        finally:
+            total = time.perf_counter() - start
+            init = _build_seconds - build_before
+            logger.info(json.dumps({
+                'function': getattr(context, 'function_name', func.__module__),
+                'cold_start': cold_start,
+                'init_ms': round(init * 1000, 2),
+                'handler_ms': round((total - init) * 1000, 2)
+            }))
+
+    return wrapper
@@ -0,0 +1,231 @@
+"""
+Inventory snapshots
+Persists discovered resources to S3 as versioned gzip JSON lines and diffs them against the previous run
+"""
+import os
+import gzip
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+from botocore.exceptions import ClientError
+from shared import bootstrap
+
+logger = logging.getLogger(__name__)
+
+Inventory = Dict[str, List[Dict[str, Any]]]
+
+# Fields that move on every run without the resource itself changing
+VOLATILE_FIELDS = ('running_count',)
+
+# Resources per chunk when streaming a delta back from S3
+DEFAULT_CHUNK_SIZE = 500
+
+
+def resource_key(resource: Dict[str, Any]) -> str:
+    """Identity of a resource across runs: where it lives, its id and any extra dimensions"""
+    dimensions = ','.join(f"{name}={value}" for name, value in sorted(resource.get('dimensions', {}).items()))
+    return '|'.join([resource.get('account_id', ''), resource.get('region', ''), resource['id'], dimensions])
+
+
+def _fingerprint(resource: Dict[str, Any]) -> str:
+    """Canonical form of a resource, ignoring volatile fields"""
+    stable = {key: value for key, value in resource.items() if key not in VOLATILE_FIELDS}
+    return json.dumps(stable, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def diff(previous: Optional[Inventory], current: Inventory) -> Dict[str, Inventory]:
+    """Return the resources added, removed and changed per type since the previous inventory
+
+    Without a previous inventory everything counts as added.
+    """
+    previous = previous or {}
+    delta: Dict[str, Inventory] = {'added': {}, 'removed': {}, 'changed': {}}
+    for resource_type in sorted(set(previous) | set(current)):
+        before = {resource_key(resource): resource for resource in previous.get(resource_type, [])}
+        after = {resource_key(resource): resource for resource in current.get(resource_type, [])}
+
+        delta['added'][resource_type] = [after[key] for key in sorted(after.keys() - before.keys())]
+        delta['removed'][resource_type] = [before[key] for key in sorted(before.keys() - after.keys())]
+        delta['changed'][resource_type] = [
+            after[key] for key in sorted(after.keys() & before.keys())
+            if _fingerprint(after[key]) != _fingerprint(before[key])
+        ]
+    return delta
+
+
+def apply(previous: Optional[Inventory], upserts: Inventory, removals: Inventory) -> Inventory:
+    """Return previous with resources added or replaced by upserts and dropped by removals"""
+    updated: Inventory = {}
+    for resource_type in sorted(set(previous or {}) | set(upserts) | set(removals)):
+        by_key = {resource_key(resource): resource for resource in (previous or {}).get(resource_type, [])}
+        for resource in removals.get(resource_type, []):
+            by_key.pop(resource_key(resource), None)
+        for resource in upserts.get(resource_type, []):
+            by_key[resource_key(resource)] = resource
+        updated[resource_type] = [by_key[key] for key in sorted(by_key)]
+    return updated
+
+
+def carry_forward(previous: Optional[Inventory], current: Inventory,
+                  failed_scopes: List[Dict[str, str]]) -> Inventory:
+    """Return current plus the previous resources of every scope whose scan failed
+
+    A failed scan says nothing about its resources, so they are kept as they
+    were instead of showing up as removed.
+    """
+    if not previous or not failed_scopes:
+        return current
+
+    failed = {(scope['type'], scope['account_id'], scope['region']) for scope in failed_scopes}
+    merged = {resource_type: list(resources) for resource_type, resources in current.items()}
+    for resource_type, resources in previous.items():
+        kept = [resource for resource in resources
+                if (resource_type, resource.get('account_id', ''), resource.get('region', '')) in failed]
+        if kept:
+            merged.setdefault(resource_type, []).extend(kept)
+    return merged
+
+
+def is_empty(delta: Dict[str, Inventory]) -> bool:
+    """True when nothing was added, removed or changed"""
+    return not any(resources for change in delta.values() for resources in change.values())
+
+
+def summary(delta: Dict[str, Inventory]) -> Dict[str, Dict[str, int]]:
+    """Counts per change and resource type, for logs and responses"""
+    return {
+        change: {resource_type: len(resources) for resource_type, resources in by_type.items() if resources}
+        for change, by_type in delta.items()
+    }
+
+
+def read_delta(bucket: str, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """Stream a delta written by InventoryStore.save_delta in chunks of resources
+
+    Each resource carries its 'change' ('added', 'changed' or 'removed') and
+    'type'. The object is decompressed while it downloads, so memory stays
+    bounded by the chunk size however large the delta is.
+    """
+    body = bootstrap.get_client('s3').get_object(Bucket=bucket, Key=key)['Body']
+    chunk = []
+    with gzip.GzipFile(fileobj=body) as lines:
+        for line in lines:
+            if line.strip():
+                chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+class InventoryStore:
+    """Versioned inventory snapshots under INVENTORY_PREFIX in OBSERVABILITY_BUCKET
+
+    Every save writes '<prefix><name>/snapshots/<timestamp>.jsonl.gz', one
+    resource per line, and then points '<prefix><name>/latest.json' at it. The
+    latest snapshot is kept in memory, so a warm container reads only the
+    small pointer to find out whether another writer moved it on.
+    """
+
+    def __init__(self, name: str, bucket: Optional[str] = None, prefix: Optional[str] = None):
+        self.name = name
+        self.bucket = bucket if bucket is not None else os.environ.get('OBSERVABILITY_BUCKET')
+        if prefix is None:
+            prefix = os.environ.get('INVENTORY_PREFIX', 'inventory/')
+        self.prefix = f"{prefix}{name}/"
+        self._cached_key: Optional[str] = None
+        self._cached: Optional[Inventory] = None
+
+    def latest(self) -> Optional[Inventory]:
+        """Return the latest saved inventory, or None when there is none yet
+
+        Other read errors are raised: treating them as no inventory would make
+        every resource look added, or every alarm look orphaned.
+        """
+        if not self.bucket:
+            return self._cached
+
+        s3 = bootstrap.get_client('s3')
+        try:
+            pointer = json.loads(s3.get_object(Bucket=self.bucket, Key=f"{self.prefix}latest.json")['Body'].read())
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+                raise
+            return None
+
+        key = pointer['key']
+        if key != self._cached_key:
+            body = s3.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+            self._cached = self._decode(gzip.decompress(body))
+            self._cached_key = key
+        return self._cached
+
+    def save(self, inventory: Inventory) -> Optional[str]:
+        """Write a new snapshot and make it the latest; returns its key"""
+        self._cached = inventory
+        if not self.bucket:
+            logger.warning(f"No OBSERVABILITY_BUCKET set, the {self.name} inventory is kept in memory only")
+            return None
+
+        now = datetime.now(timezone.utc)
+        key = f"{self.prefix}snapshots/{now:%Y/%m/%d/%Y%m%dT%H%M%S%fZ}.jsonl.gz"
+        body = gzip.compress(self._encode(inventory))
+
+        s3 = bootstrap.get_client('s3')
+        s3.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType='application/x-ndjson',
+                      ContentEncoding='gzip')
+        s3.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}latest.json",
+            Body=json.dumps({
+                'key': key,
+                'created': now.isoformat(),
+                'counts': {resource_type: len(resources) for resource_type, resources in inventory.items()}
+            }).encode('utf-8'),
+            ContentType='application/json'
+        )
+        self._cached_key = key
+        logger.info(f"Saved {sum(len(v) for v in inventory.values())} resources to s3://{self.bucket}/{key} "
+                    f"({len(body)} bytes)")
+        return key
+
+    def save_delta(self, delta: Dict[str, Inventory]) -> Optional[Dict[str, str]]:
+        """Write a delta next to the snapshots and return its location for consumers"""
+        if not self.bucket:
+            return None
+
+        key = f"{self.prefix}deltas/{datetime.now(timezone.utc):%Y/%m/%d/%Y%m%dT%H%M%S%fZ}.jsonl.gz"
+        lines = [
+            json.dumps(dict(resource, change=change, type=resource_type), sort_keys=True,
+                       separators=(',', ':'), default=str)
+            for change in ('added', 'changed', 'removed')
+            for resource_type in sorted(delta.get(change, {}))
+            for resource in delta[change][resource_type]
+        ]
+        body = gzip.compress(('\n'.join(lines) + '\n').encode('utf-8') if lines else b'')
+        bootstrap.get_client('s3').put_object(Bucket=self.bucket, Key=key, Body=body,
+                                              ContentType='application/x-ndjson', ContentEncoding='gzip')
+        logger.info(f"Saved {len(lines)} changes to s3://{self.bucket}/{key} ({len(body)} bytes)")
+        return {'bucket': self.bucket, 'key': key}
+
+    @staticmethod
+    def _encode(inventory: Inventory) -> bytes:
+        """One compact JSON line per resource, tagged with its type and sorted for stable output"""
+        lines = [
+            json.dumps(dict(resource, type=resource_type), sort_keys=True, separators=(',', ':'), default=str)
+            for resource_type in sorted(inventory)
+            for resource in sorted(inventory[resource_type], key=resource_key)
+        ]
+        return ('\n'.join(lines) + '\n').encode('utf-8') if lines else b''
+
+    @staticmethod
+    def _decode(body: bytes) -> Inventory:
+        """Rebuild the inventory from JSON lines"""
+        inventory: Inventory = {}
+        for line in body.decode('utf-8').splitlines():
+            if line:
+                resource = json.loads(line)
+                inventory.setdefault(resource.pop('type'), []).append(resource)
+        return inventory
@@ -0,0 +1,89 @@
+"""
+Embedded Metric Format metrics shared by the observability Lambdas
+Collects values during an invocation and writes them as CloudWatch EMF log lines
+"""
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# EMF limits per log line
+MAX_METRICS_PER_LINE = 100
+MAX_VALUES_PER_METRIC = 100
+
+
+class MetricsLogger:
+    """Buffers metric values for one invocation and flushes them as EMF
+
+    CloudWatch extracts the metrics from the log line itself, so publishing
+    costs no API calls. Lines go to stdout because the Lambda log formatter
+    would prefix logger output and break EMF parsing.
+    """
+
+    def __init__(self, namespace: Optional[str] = None, dimensions: Optional[Dict[str, str]] = None,
+                 emit: Optional[Callable[[str], None]] = None):
+        if dimensions is None:
+            dimensions = {'FunctionName': os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')}
+
+        self.namespace = namespace or os.environ.get('METRICS_NAMESPACE', 'Observability/AlertProcessor')
+        self.dimensions = dimensions
+        self.emit = emit or self._write
+        self._values: Dict[str, List[float]] = {}
+        self._units: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def put(self, name: str, value: float, unit: str = 'Milliseconds'):
+        """Record one value of a metric"""
+        with self._lock:
+            self._values.setdefault(name, []).append(round(value, 3))
+            self._units[name] = unit
+
+    def put_all(self, name: str, values: List[float], unit: str = 'Milliseconds'):
+        """Record several values of a metric"""
+        for value in values:
+            self.put(name, value, unit)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record the wall time of a block in milliseconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.put(name, (time.perf_counter() - start) * 1000)
+
+    def flush(self):
+        """Write buffered values as EMF lines and clear the buffer"""
+        with self._lock:
+            values, self._values = self._values, {}
+            units, self._units = self._units, {}
+
+        # Values beyond the per-metric limit spill into further lines
+        while values:
+            names = list(values)[:MAX_METRICS_PER_LINE]
+            document = {
+                '_aws': {
+                    'Timestamp': int(time.time() * 1000),
+                    'CloudWatchMetrics': [{
+                        'Namespace': self.namespace,
+                        'Dimensions': [list(self.dimensions)],
+                        'Metrics': [{'Name': name, 'Unit': units[name]} for name in names]
+                    }]
+                },
+                **self.dimensions
+            }
+            for name in names:
+                document[name] = values[name][:MAX_VALUES_PER_METRIC]
+                values[name] = values[name][MAX_VALUES_PER_METRIC:]
+                if not values[name]:
+                    del values[name]
+            self.emit(json.dumps(document, separators=(',', ':')))
+
+    @staticmethod
+    def _write(line: str):
+        """Write one line to stdout"""
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
@@ -8,6 +8,10 @@ from aws_cdk import (
     aws_events as events,
     aws_events_targets as targets,
     aws_ssm as ssm,
+    aws_dynamodb as dynamodb,
+    aws_sqs as sqs,
+    aws_iam as iam,
+    RemovalPolicy,
     Duration
 )
 from constructs import Construct
@@ -24,6 +28,7 @@ class AlertingStack(Stack):
         
         # Create alerting infrastructure
         self._create_notification_topics()
+        self._create_dedup_table()
         self._create_alert_processor()
         self._create_default_alarms()
         self._create_composite_alarms()
@@ -56,6 +61,35 @@ class AlertingStack(Stack):
                 string_value=topic.topic_arn
             )
     
+    def _create_dedup_table(self):
+        """Create DynamoDB table holding alert deduplication windows"""
+        self.alerting_resources["dedup_table"] = dynamodb.Table(
+            self, "AlertDedupTable",
+            partition_key=dynamodb.Attribute(name="fingerprint", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            encryption=dynamodb.TableEncryption.CUSTOMER_MANAGED,
+            encryption_key=self.core_resources["kms_key"],
+            time_to_live_attribute="ttl",
+            removal_policy=RemovalPolicy.DESTROY
+        )
+        
+        # Attach from this stack so the core role does not depend on it
+        iam.Policy(
+            self, "AlertDedupTablePolicy",
+            roles=[self.core_resources["lambda_role"]],
+            statements=[
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=[
+                        "dynamodb:UpdateItem",
+                        "dynamodb:DeleteItem",
+                        "dynamodb:Scan"
+                    ],
+                    resources=[self.alerting_resources["dedup_table"].table_arn]
+                )
+            ]
+        )
+    
     def _create_alert_processor(self):
         """Create Lambda function to process and enrich alerts"""
         self.alerting_resources["processor"] = lambda_.Function(
@@ -69,11 +103,63 @@ class AlertingStack(Stack):
             environment={
                 "ENVIRONMENT": self.env_name,
                 "EVENT_BUS_NAME": self.core_resources["event_bus"].event_bus_name,
+                "DEDUP_TABLE_NAME": self.alerting_resources["dedup_table"].table_name,
+                "DEDUP_WINDOW_SECONDS": "300",
+                "DIGEST_SEVERITIES": "low,medium",
+                "OBSERVABILITY_BUCKET": self.core_resources["storage_bucket"].bucket_name,
+                "RESOURCE_CONTEXT_TTL_SECONDS": "300",
+                "RESOURCE_CONTEXT_TIMEOUT_MS": "500",
                 **{f"TOPIC_ARN_{sev.upper()}": topic.topic_arn 
                    for sev, topic in self.alerting_resources["topics"].items()}
             }
         )
         
+        # Alerts arrive through a queue so the processor sees batches: low and medium
+        # alerts of a batch share one digest, and records are retried until delivered
+        self.alerting_resources["alert_dlq"] = sqs.Queue(
+            self, "AlertDeadLetterQueue",
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            retention_period=Duration.days(14)
+        )
+        self.alerting_resources["alert_queue"] = sqs.Queue(
+            self, "AlertQueue",
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            # Six times the processor timeout, as Lambda recommends for SQS sources
+            visibility_timeout=Duration.minutes(12),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=5,
+                queue=self.alerting_resources["alert_dlq"]
+            )
+        )
+        
+        # Attach from this stack so the core role does not depend on it
+        queue_policy = iam.Policy(
+            self, "AlertQueueConsumePolicy",
+            roles=[self.core_resources["lambda_role"]],
+            statements=[
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=[
+                        "sqs:ReceiveMessage",
+                        "sqs:DeleteMessage",
+                        "sqs:ChangeMessageVisibility",
+                        "sqs:GetQueueAttributes"
+                    ],
+                    resources=[self.alerting_resources["alert_queue"].queue_arn]
+                )
+            ]
+        )
+        queue_source = lambda_.EventSourceMapping(
+            self, "AlertQueueSource",
+            target=self.alerting_resources["processor"],
+            event_source_arn=self.alerting_resources["alert_queue"].queue_arn,
+            batch_size=100,
+            # Alarms evaluate over minutes, so a few seconds of batching costs little
+            max_batching_window=Duration.seconds(10),
+            report_batch_item_failures=True
+        )
+        queue_source.node.add_dependency(queue_policy)
+        
         # Subscribe processor to CloudWatch alarm state changes
         events.Rule(
             self, "CloudWatchAlarmRule",
@@ -81,7 +167,7 @@ class AlertingStack(Stack):
                 source=["aws.cloudwatch"],
                 detail_type=["CloudWatch Alarm State Change"]
             ),
-            targets=[targets.LambdaFunction(self.alerting_resources["processor"])]
+            targets=[targets.SqsQueue(self.alerting_resources["alert_queue"])]
         )
         
         # Subscribe to custom EventBridge events
@@ -92,6 +178,13 @@ class AlertingStack(Stack):
                 source=["observability.custom"],
                 detail_type=["Custom Metric Alert"]
             ),
+            targets=[targets.SqsQueue(self.alerting_resources["alert_queue"])]
+        )
+    
+        # Repeat summaries go out when a window closes, not when the alarm next fires
+        events.Rule(
+            self, "AlertDedupSweepSchedule",
+            schedule=events.Schedule.rate(Duration.minutes(1)),
             targets=[targets.LambdaFunction(self.alerting_resources["processor"])]
         )
     
@@ -118,9 +118,11 @@ class CoreObservabilityStack(Stack):
                                 "kms:GenerateDataKey",
                                 "ec2:Describe*",
                                 "ecs:Describe*",
+                                "ecs:List*",
                                 "rds:Describe*",
                                 "lambda:List*",
                                 "lambda:Get*",
+                                "tag:GetResources",
                                 "budgets:ViewBudget",
                                 "ce:GetCostAndUsage",
                                 "ce:GetUsageReport"
@@ -1,13 +1,19 @@
 from aws_cdk import (
     Stack,
     aws_lambda as lambda_,
+    aws_lambda_destinations as destinations,
     aws_events as events,
     aws_events_targets as targets,
     aws_iam as iam,
+    aws_sqs as sqs,
     Duration
 )
 from constructs import Construct
 from typing import Dict, Any
+import os
+
+# Lambda packages share one asset so they can import the shared package
+LAMBDA_ROOT = os.path.join(os.path.dirname(__file__), "..", "..", "lambda")
 
 class ResourceDiscoveryStack(Stack):
     def __init__(self, scope: Construct, construct_id: str, environment: str, core_resources: Dict[str, Any], **kwargs) -> None:
@@ -19,6 +25,7 @@ class ResourceDiscoveryStack(Stack):
         
         # Create resource discovery components
         self._create_discovery_role()
+        self._create_failure_queue()
         self._create_discovery_function()
         self._create_alarm_creator()
         self._create_discovery_scheduler()
@@ -43,6 +50,7 @@ class ResourceDiscoveryStack(Stack):
                                 "rds:DescribeDBInstances",
                                 "ecs:ListClusters",
                                 "ecs:ListServices",
+                                "ecs:DescribeServices",
                                 "cloudwatch:PutMetricAlarm",
                                 "cloudwatch:DescribeAlarms",
                                 "cloudwatch:DeleteAlarms"
@@ -54,184 +62,116 @@ class ResourceDiscoveryStack(Stack):
             }
         )
     
+    def _create_failure_queue(self):
+        """Create the queue that keeps invocations still failing after their async retries"""
+        self.discovery_resources["failure_queue"] = sqs.Queue(
+            self, "DiscoveryFailureQueue",
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            retention_period=Duration.days(14)
+        )
+    
     def _create_discovery_function(self):
         """Create Lambda function for resource discovery"""
         self.discovery_resources["discoverer"] = lambda_.Function(
             self, "ResourceDiscoverer",
             runtime=lambda_.Runtime.PYTHON_3_9,
-            handler="index.handler",
-            code=lambda_.Code.from_inline("""
-import boto3
-import json
-import logging
-
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-def handler(event, context):
-    try:
-        ec2 = boto3.client('ec2')
-        lambda_client = boto3.client('lambda')
-        rds = boto3.client('rds')
-        
-        # Discover resources
-        resources = {
-            'ec2_instances': discover_ec2_instances(ec2),
-            'lambda_functions': discover_lambda_functions(lambda_client),
-            'rds_instances': discover_rds_instances(rds)
-        }
-        
-        logger.info(f"Discovered {sum(len(v) for v in resources.values())} resources")
-        
-        return {
-            'statusCode': 200,
-            'resources': resources
-        }
-        
-    except Exception as e:
-        logger.error(f"Discovery error: {str(e)}")
-        return {'statusCode': 500, 'error': str(e)}
-
-def discover_ec2_instances(ec2):
-    try:
-        response = ec2.describe_instances(
-            Filters=[{'Name': 'instance-state-name', 'Values': ['running']}]
-        )
-        instances = []
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                instances.append({
-                    'id': instance['InstanceId'],
-                    'type': instance['InstanceType']
-                })
-        return instances
-    except Exception as e:
-        logger.warning(f"EC2 discovery failed: {e}")
-        return []
-
-def discover_lambda_functions(lambda_client):
-    try:
-        response = lambda_client.list_functions()
-        return [{'name': f['FunctionName']} for f in response['Functions']]
-    except Exception as e:
-        logger.warning(f"Lambda discovery failed: {e}")
-        return []
-
-def discover_rds_instances(rds):
-    try:
-        response = rds.describe_db_instances()
-        return [{'id': db['DBInstanceIdentifier']} 
-                for db in response['DBInstances'] 
-                if db['DBInstanceStatus'] == 'available']
-    except Exception as e:
-        logger.warning(f"RDS discovery failed: {e}")
-        return []
-            """),
+            handler="resource_discoverer.handler.handler",
+            code=lambda_.Code.from_asset(LAMBDA_ROOT),
             role=self.discovery_resources["role"],
             timeout=Duration.minutes(3),
-            tracing=lambda_.Tracing.ACTIVE
+            tracing=lambda_.Tracing.ACTIVE,
+            # One writer at a time keeps snapshot read-modify-write updates from racing;
+            # bursts of change events wait in the async invocation queue
+            reserved_concurrent_executions=1,
+            # Results, carrying only a pointer to the delta in S3, go to the default event bus
+            on_success=destinations.EventBridgeDestination(),
+            on_failure=destinations.SqsDestination(self.discovery_resources["failure_queue"]),
+            environment={
+                "OBSERVABILITY_BUCKET": self.core_resources["storage_bucket"].bucket_name,
+                "INVENTORY_PREFIX": "inventory/"
+            }
         )
+        
+        # Versioned inventory snapshots live in the observability bucket
+        self.core_resources["storage_bucket"].grant_read_write(self.discovery_resources["role"])
     
     def _create_alarm_creator(self):
         """Create Lambda function for creating alarms based on discovered resources"""
         self.discovery_resources["alarm_creator"] = lambda_.Function(
             self, "AlarmCreator",
             runtime=lambda_.Runtime.PYTHON_3_9,
-            handler="index.handler",
-            code=lambda_.Code.from_inline("""
-import boto3
-import json
-import logging
-
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-def handler(event, context):
-    try:
-        cloudwatch = boto3.client('cloudwatch')
-        
-        # Get resources from discovery event
-        resources = event.get('resources', {})
-        
-        alarms_created = 0
-        alarms_created += create_ec2_alarms(cloudwatch, resources.get('ec2_instances', []))
-        alarms_created += create_lambda_alarms(cloudwatch, resources.get('lambda_functions', []))
-        
-        return {
-            'statusCode': 200,
-            'alarms_created': alarms_created
-        }
-        
-    except Exception as e:
-        logger.error(f"Alarm creation error: {str(e)}")
-        return {'statusCode': 500, 'error': str(e)}
-
-def create_ec2_alarms(cloudwatch, instances):
-    count = 0
-    for instance in instances:
-        try:
-            cloudwatch.put_metric_alarm(
-                AlarmName=f"AutoDiscovered-EC2-CPU-{instance['id']}",
-                ComparisonOperator='GreaterThanThreshold',
-                EvaluationPeriods=2,
-                MetricName='CPUUtilization',
-                Namespace='AWS/EC2',
-                Period=300,
-                Statistic='Average',
-                Threshold=80.0,
-                ActionsEnabled=True,
-                AlarmDescription=f"Auto-discovered high CPU alarm for {instance['id']}",
-                Dimensions=[{'Name': 'InstanceId', 'Value': instance['id']}]
-            )
-            count += 1
-        except Exception as e:
-            logger.warning(f"Failed to create alarm for {instance['id']}: {e}")
-    return count
-
-def create_lambda_alarms(cloudwatch, functions):
-    count = 0
-    for func in functions:
-        try:
-            cloudwatch.put_metric_alarm(
-                AlarmName=f"AutoDiscovered-Lambda-Errors-{func['name']}",
-                ComparisonOperator='GreaterThanThreshold',
-                EvaluationPeriods=2,
-                MetricName='Errors',
-                Namespace='AWS/Lambda',
-                Period=300,
-                Statistic='Sum',
-                Threshold=5.0,
-                ActionsEnabled=True,
-                AlarmDescription=f"Auto-discovered error alarm for {func['name']}",
-                Dimensions=[{'Name': 'FunctionName', 'Value': func['name']}]
-            )
-            count += 1
-        except Exception as e:
-            logger.warning(f"Failed to create alarm for {func['name']}: {e}")
-    return count
-            """),
+            handler="alarm_creator.handler.handler",
+            code=lambda_.Code.from_asset(LAMBDA_ROOT),
             role=self.discovery_resources["role"],
-            timeout=Duration.minutes(5),
-            tracing=lambda_.Tracing.ACTIVE
+            # At the default 3 TPS PutMetricAlarm quota a large first run needs the full Lambda timeout;
+            # whatever does not fit is picked up by the next hourly reconciliation
+            timeout=Duration.minutes(15),
+            tracing=lambda_.Tracing.ACTIVE,
+            # Failed runs are retried twice by Lambda and then kept for inspection
+            on_failure=destinations.SqsDestination(self.discovery_resources["failure_queue"]),
+            environment={
+                "ALARM_CHUNK_SIZE": "500",
+                "ALARM_PUT_TPS": "3",
+                "ALARM_WRITER_WORKERS": "4",
+                "ALARM_PUT_ATTEMPTS": "5",
+                # "fleet" swaps per-resource alarms for one Metrics Insights alarm per group
+                "ALARM_MODE": "per_resource",
+                "ALARM_FLEET_GROUP_TAG_EC2": "aws:autoscaling:groupName",
+                "ALARM_FLEET_GROUP_TAG_LAMBDA": "",
+                # Hourly reconciliation reads the full inventory snapshot
+                "OBSERVABILITY_BUCKET": self.core_resources["storage_bucket"].bucket_name,
+                "INVENTORY_PREFIX": "inventory/"
+            }
         )
     
     def _create_discovery_scheduler(self):
         """Create EventBridge rules to orchestrate discovery workflow"""
         
-        # Schedule resource discovery every hour
+        # Hourly full scan reconciles whatever the change events missed
         discovery_rule = events.Rule(
             self, "ResourceDiscoverySchedule",
             schedule=events.Schedule.rate(Duration.hours(1)),
             targets=[targets.LambdaFunction(self.discovery_resources["discoverer"])]
         )
         
-        # Chain discovery → alarm creation via EventBridge
+        # Instances entering or leaving the running state update the inventory right away
+        events.Rule(
+            self, "Ec2StateChangeDiscovery",
+            event_pattern=events.EventPattern(
+                source=["aws.ec2"],
+                detail_type=["EC2 Instance State-change Notification"],
+                detail={"state": ["running", "stopping", "stopped", "shutting-down", "terminated"]}
+            ),
+            targets=[targets.LambdaFunction(self.discovery_resources["discoverer"])]
+        )
+        
+        # Lambda creates and deletes and RDS deletes, as recorded by CloudTrail; new DB instances
+        # are picked up by the scan once they are available
+        events.Rule(
+            self, "CloudTrailResourceDiscovery",
+            event_pattern=events.EventPattern(
+                source=["aws.lambda", "aws.rds"],
+                detail_type=["AWS API Call via CloudTrail"],
+                detail={
+                    "eventSource": ["lambda.amazonaws.com", "rds.amazonaws.com"],
+                    "eventName": [
+                        "CreateFunction20150331", "DeleteFunction20150331", "DeleteDBInstance"
+                    ]
+                }
+            ),
+            targets=[targets.LambdaFunction(self.discovery_resources["discoverer"])]
+        )
+        
+        # Chain discovery → alarm creation via EventBridge; the event carries a claim check, not the inventory
         events.Rule(
             self, "DiscoveryToAlarmCreation",
             event_pattern=events.EventPattern(
                 source=["lambda"],
                 detail_type=["Lambda Function Invocation Result - Success"],
                 detail={
+                    "requestContext": {
+                        "functionArn": [{"prefix": self.discovery_resources["discoverer"].function_arn}]
+                    },
                     "responsePayload": {
                         "statusCode": [200]
                     }
@@ -0,0 +1,228 @@
+"""
+Unit tests for the alarm creator handler and alarm reconciliation
+"""
+import io
+import os
+import sys
+import unittest
+from unittest import mock
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+from shared import inventory
+from alarm_creator import handler as alarm_handler
+from alarm_creator.alarms import alarm_definitions, fleet_alarm_definitions
+
+
+class FakeS3:
+    """Just enough of S3 to hold objects in memory"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objects[Key])}
+
+
+class FakeCloudWatch:
+    """Metric alarms held in memory, with describe_alarms paged 100 at a time"""
+
+    def __init__(self):
+        self.alarms = {}
+        self.put_metric_alarm = mock.Mock(side_effect=lambda **kwargs: self.alarms.update({kwargs['AlarmName']: kwargs}))
+        self.delete_alarms = mock.Mock(side_effect=lambda AlarmNames: [self.alarms.pop(n, None) for n in AlarmNames])
+
+    def get_paginator(self, name):
+        paginator = mock.Mock()
+        paginator.paginate.side_effect = self._pages
+        return paginator
+
+    def _pages(self, AlarmTypes, AlarmNames=None, AlarmNamePrefix=None):
+        if AlarmNames is not None:
+            matches = [self.alarms[name] for name in AlarmNames if name in self.alarms]
+        else:
+            matches = [alarm for name, alarm in sorted(self.alarms.items()) if name.startswith(AlarmNamePrefix)]
+        for start in range(0, max(len(matches), 1), 100):
+            yield {'MetricAlarms': matches[start:start + 100]}
+
+
+def _resources(count, prefix):
+    return [{'id': f"{prefix}-{n:05d}", 'account_id': '111111111111', 'region': 'us-east-1'} for n in range(count)]
+
+
+class TestAlarmCreatorHandler(unittest.TestCase):
+    """Test cases for the claim-check handoff and desired-state reconciliation"""
+
+    def setUp(self):
+        bootstrap.reset()
+        self.s3 = FakeS3()
+        self.cloudwatch = FakeCloudWatch()
+        bootstrap.set_client('s3', self.s3)
+        bootstrap.set_client('cloudwatch', self.cloudwatch)
+        bootstrap.set_client('cloudwatch', self.cloudwatch, max_attempts=1)
+        sts = mock.Mock()
+        sts.get_caller_identity.return_value = {'Account': '111111111111'}
+        bootstrap.set_client('sts', sts)
+        self.store = inventory.InventoryStore('resource_discoverer', bucket='bucket')
+        patcher = mock.patch.dict(os.environ, {
+            'OBSERVABILITY_BUCKET': 'bucket', 'ALARM_PUT_TPS': '1000000', 'AWS_REGION': 'us-east-1'
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _destination_event(self, payload):
+        """Event the discoverer's EventBridge destination delivers"""
+        return {
+            'source': 'lambda',
+            'detail-type': 'Lambda Function Invocation Result - Success',
+            'detail': {'responsePayload': dict(payload, statusCode=200)}
+        }
+
+    def _delta_event(self, added=None, removed=None):
+        delta = {'added': added or {}, 'changed': {}, 'removed': removed or {}}
+        return self._destination_event({'mode': 'incremental', 'delta_location': self.store.save_delta(delta)})
+
+    def test_large_delta_streams_from_s3(self):
+        """Test tens of thousands of resources flow through in chunks"""
+        event = self._delta_event(added={'ec2_instances': _resources(20000, 'i')})
+        self.assertLess(len(str(event)), 1024)
+
+        with mock.patch.object(inventory, 'read_delta', wraps=inventory.read_delta) as read_delta:
+            response = alarm_handler.handler(event, None)
+
+        self.assertEqual(response['alarms']['created'], 20000)
+        self.assertEqual(read_delta.call_args[0][2], inventory.DEFAULT_CHUNK_SIZE)
+
+    def test_unchanged_alarms_are_not_put_again(self):
+        """Test alarms already matching the desired settings cost only the lookup"""
+        event = self._delta_event(added={'lambda_functions': _resources(250, 'fn')})
+        alarm_handler.handler(event, None)
+        self.cloudwatch.put_metric_alarm.reset_mock()
+
+        response = alarm_handler.handler(event, None)
+
+        self.assertEqual(response['alarms']['unchanged'], 250)
+        self.cloudwatch.put_metric_alarm.assert_not_called()
+        self.assertEqual(response['api_calls'], {'describe_alarms': 3, 'put_metric_alarm': 0, 'delete_alarms': 0})
+
+    def test_drifted_alarm_is_updated(self):
+        """Test an alarm whose settings differ is put again"""
+        resource = _resources(1, 'i')[0]
+        self.cloudwatch.alarms.update({d['AlarmName']: dict(d, Threshold=95.0)
+                                       for d in alarm_definitions('ec2_instances', resource)})
+
+        response = alarm_handler.handler(self._delta_event(added={'ec2_instances': [resource]}), None)
+
+        self.assertEqual(response['alarms']['updated'], 1)
+        self.assertEqual(self.cloudwatch.alarms['AutoDiscovered-EC2-CPU-i-00000']['Threshold'], 80.0)
+
+    def test_removed_resources_have_alarms_deleted_in_batches(self):
+        """Test alarms of removed resources are deleted 100 names at a time"""
+        functions = _resources(250, 'fn')
+        alarm_handler.handler(self._delta_event(added={'lambda_functions': functions}), None)
+
+        response = alarm_handler.handler(self._delta_event(removed={'lambda_functions': functions}), None)
+
+        self.assertEqual(response['alarms']['deleted'], 250)
+        batches = [len(call[1]['AlarmNames']) for call in self.cloudwatch.delete_alarms.call_args_list]
+        self.assertEqual(sorted(batches), [50, 100, 100])
+        self.assertEqual(self.cloudwatch.alarms, {})
+
+    def test_reconciliation_removes_orphans(self):
+        """Test the hourly pass deletes alarms of resources that vanished without an event"""
+        instances = _resources(3, 'i')
+        alarm_handler.handler(self._delta_event(added={'ec2_instances': instances}), None)
+        self.cloudwatch.alarms['Unmanaged-Alarm'] = {'AlarmName': 'Unmanaged-Alarm'}
+        self.store.save({'ec2_instances': instances[:2]})
+
+        response = alarm_handler.handler(self._destination_event({'mode': 'reconciliation'}), None)
+
+        self.assertEqual(response['alarms'], {'created': 0, 'updated': 0, 'unchanged': 2, 'deleted': 1, 'failed': 0})
+        self.cloudwatch.delete_alarms.assert_called_once_with(AlarmNames=['AutoDiscovered-EC2-CPU-i-00002'])
+        self.assertIn('Unmanaged-Alarm', self.cloudwatch.alarms)
+
+    def test_only_home_resources_get_alarms(self):
+        """Test same-named resources in other accounts and regions neither add nor delete alarms"""
+        local = _resources(1, 'i')
+        elsewhere = [dict(local[0], account_id='222222222222'), dict(local[0], region='eu-west-1')]
+        alarm_handler.handler(self._delta_event(added={'ec2_instances': local + elsewhere}), None)
+
+        response = alarm_handler.handler(self._delta_event(removed={'ec2_instances': elsewhere}), None)
+
+        self.assertEqual(self.cloudwatch.put_metric_alarm.call_count, 1)
+        self.assertEqual(response['alarms']['deleted'], 0)
+        self.assertEqual(list(self.cloudwatch.alarms), ['AutoDiscovered-EC2-CPU-i-00000'])
+
+    def test_missing_inventory_skips_full_reconciliation(self):
+        """Test neither the hourly pass nor fleet mode deletes alarms when there is no snapshot yet"""
+        self.s3.get_object = mock.Mock(side_effect=ClientError(
+            {'Error': {'Code': 'NoSuchKey', 'Message': 'missing'}}, 'GetObject'
+        ))
+        self.cloudwatch.alarms['AutoDiscovered-EC2-CPU-i-00000'] = {'AlarmName': 'AutoDiscovered-EC2-CPU-i-00000'}
+
+        response = alarm_handler.handler(self._destination_event({'mode': 'reconciliation'}), None)
+        with mock.patch.dict(os.environ, {'ALARM_MODE': 'fleet'}):
+            fleet = alarm_handler.handler(self._destination_event({'mode': 'incremental'}), None)
+
+        self.cloudwatch.delete_alarms.assert_not_called()
+        self.assertEqual(response['api_calls']['describe_alarms'], 0)
+        self.assertEqual(fleet['api_calls']['describe_alarms'], 0)
+
+    def test_no_delta_is_a_no_op(self):
+        """Test an incremental result without a delta location writes nothing"""
+        response = alarm_handler.handler(self._destination_event({'mode': 'incremental'}), None)
+
+        self.assertEqual(response['api_calls'], {'describe_alarms': 0, 'put_metric_alarm': 0, 'delete_alarms': 0})
+
+    def test_failure_is_raised_for_retry(self):
+        """Test an unreadable delta fails the invocation so Lambda retries it"""
+        event = self._destination_event({'mode': 'incremental', 'delta_location': {'bucket': 'bucket', 'key': 'gone'}})
+
+        with self.assertRaises(KeyError):
+            alarm_handler.handler(event, None)
+
+    def test_fleet_alarms_group_by_tag(self):
+        """Test one query alarm per Auto Scaling group, with per-resource alarms only for untagged instances"""
+        instances = _resources(4, 'i')
+        for instance, group in zip(instances, ['web', 'web', "o'brien"]):
+            instance['tags'] = {'aws:autoscaling:groupName': group}
+
+        definitions = {d['AlarmName']: d for d in fleet_alarm_definitions(
+            {'ec2_instances': instances, 'lambda_functions': _resources(3, 'fn')})}
+
+        self.assertEqual(sorted(definitions), [
+            'AutoDiscovered-EC2-CPU-i-00003', 'AutoDiscovered-Fleet-EC2-CPU-o\'brien',
+            'AutoDiscovered-Fleet-EC2-CPU-web', 'AutoDiscovered-Fleet-Lambda-Errors'
+        ])
+        self.assertEqual(
+            definitions['AutoDiscovered-Fleet-EC2-CPU-web']['Metrics'][0]['Expression'],
+            'SELECT MAX(CPUUtilization) FROM SCHEMA("AWS/EC2", InstanceId) '
+            'WHERE tag."aws:autoscaling:groupName" = \'web\' GROUP BY InstanceId ORDER BY MAX() DESC LIMIT 500'
+        )
+        self.assertIn("= 'o\\'brien'", definitions["AutoDiscovered-Fleet-EC2-CPU-o'brien"]['Metrics'][0]['Expression'])
+        self.assertNotIn('WHERE', definitions['AutoDiscovered-Fleet-Lambda-Errors']['Metrics'][0]['Expression'])
+
+    def test_fleet_mode_replaces_per_resource_alarms(self):
+        """Test switching to fleet mode leaves a handful of alarms however large the fleet"""
+        functions = _resources(250, 'fn')
+        alarm_handler.handler(self._delta_event(added={'lambda_functions': functions}), None)
+        self.store.save({'lambda_functions': functions})
+        self.cloudwatch.put_metric_alarm.reset_mock()
+
+        with mock.patch.dict(os.environ, {'ALARM_MODE': 'fleet'}):
+            response = alarm_handler.handler(self._destination_event({'mode': 'incremental'}), None)
+            again = alarm_handler.handler(self._destination_event({'mode': 'incremental'}), None)
+
+        self.assertEqual(response['alarms'], {'created': 1, 'updated': 0, 'unchanged': 0, 'deleted': 250, 'failed': 0})
+        self.assertEqual(list(self.cloudwatch.alarms), ['AutoDiscovered-Fleet-Lambda-Errors'])
+        self.assertEqual(again['alarms']['unchanged'], 1)
+        self.assertEqual(self.cloudwatch.put_metric_alarm.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
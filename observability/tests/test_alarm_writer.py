@@ -0,0 +1,157 @@
+"""
+Unit tests for the rate-limited alarm writer
+"""
+import os
+import sys
+import time
+import threading
+import unittest
+from unittest import mock
+from botocore.exceptions import ClientError, ReadTimeoutError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+from alarm_creator.alarm_writer import AlarmWriter, TokenBucket
+
+
+def _error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'PutMetricAlarm')
+
+
+def _definitions(count):
+    return [{'AlarmName': f"AutoDiscovered-EC2-CPU-i-{n:03d}"} for n in range(count)]
+
+
+class FakeClock:
+    """Clock that only moves when something sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for TokenBucket"""
+
+    def test_rate_is_never_exceeded(self):
+        """Test tokens beyond the burst are handed out at the configured rate"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=5, clock=clock, sleep=clock.sleep)
+
+        for _ in range(25):
+            bucket.acquire()
+
+        # 5 come from the initial burst, the other 20 take 4 s at 5 per second
+        self.assertAlmostEqual(clock.now, 4.0, places=3)
+
+    def test_throttling_halves_rate_and_success_restores_it(self):
+        """Test the rate backs off multiplicatively and recovers additively"""
+        bucket = TokenBucket(rate=10)
+
+        bucket.throttled()
+        bucket.throttled()
+        self.assertEqual(bucket.rate, 2.5)
+
+        for _ in range(40):
+            bucket.succeeded()
+        self.assertEqual(bucket.rate, 10)
+
+
+class TestAlarmWriter(unittest.TestCase):
+    """Test cases for AlarmWriter"""
+
+    def setUp(self):
+        bootstrap.reset()
+        self.cloudwatch = mock.Mock()
+
+    def _writer(self, **kwargs):
+        return AlarmWriter(self.cloudwatch, rate=1000, workers=4, attempts=3, sleep=mock.Mock(), **kwargs)
+
+    def test_throttled_writes_are_retried(self):
+        """Test throttled alarms go to the retry queue and are written on a later attempt"""
+        throttled = {'AutoDiscovered-EC2-CPU-i-001', 'AutoDiscovered-EC2-CPU-i-002'}
+        seen = set()
+        lock = threading.Lock()
+
+        def put(**kwargs):
+            with lock:
+                first = kwargs['AlarmName'] not in seen
+                seen.add(kwargs['AlarmName'])
+            if first and kwargs['AlarmName'] in throttled:
+                raise _error('Throttling')
+        self.cloudwatch.put_metric_alarm.side_effect = put
+        writer = self._writer()
+
+        failed = writer.put_all(_definitions(10))
+
+        summary = writer.summary()
+        self.assertEqual(failed, set())
+        self.assertEqual((summary['written'], summary['retries'], summary['throttled']), (10, 2, 2))
+        self.assertEqual(writer.sleep.call_count, 1)
+        self.assertLess(summary['final_rate'], 1000)
+
+    def test_permanent_errors_are_not_retried(self):
+        """Test validation errors fail the alarm on the first attempt"""
+        self.cloudwatch.put_metric_alarm.side_effect = _error('ValidationError')
+        writer = self._writer()
+
+        failed = writer.put_all(_definitions(3))
+
+        self.assertEqual(len(failed), 3)
+        self.assertEqual(self.cloudwatch.put_metric_alarm.call_count, 3)
+        self.assertEqual(writer.summary()['retries'], 0)
+
+    def test_quota_errors_are_not_retried(self):
+        """Test the alarm count quota fails the alarm without slowing the bucket down"""
+        self.cloudwatch.put_metric_alarm.side_effect = _error('LimitExceededException')
+        writer = self._writer()
+
+        failed = writer.put_all(_definitions(3))
+
+        self.assertEqual(len(failed), 3)
+        self.assertEqual(self.cloudwatch.put_metric_alarm.call_count, 3)
+        self.assertEqual((writer.summary()['throttled'], writer.summary()['final_rate']), (0, 1000))
+
+    def test_connection_errors_are_retried(self):
+        """Test timeouts go to the retry queue like transient API errors"""
+        self.cloudwatch.put_metric_alarm.side_effect = [ReadTimeoutError(endpoint_url='https://monitoring'), None]
+        writer = self._writer()
+
+        failed = writer.put_all(_definitions(1))
+
+        self.assertEqual(failed, set())
+        self.assertEqual(writer.summary()['retries'], 1)
+
+    def test_writes_past_the_deadline_are_deferred(self):
+        """Test nothing new starts once the deadline has passed"""
+        writer = self._writer(deadline=time.monotonic() - 1)
+
+        deferred = writer.put_all(_definitions(5))
+
+        self.assertEqual(len(deferred), 5)
+        self.assertEqual(writer.summary()['deferred'], 5)
+        self.cloudwatch.put_metric_alarm.assert_not_called()
+
+    def test_writes_run_concurrently(self):
+        """Test puts overlap across all workers"""
+        # No put can return until every worker has one in flight
+        all_running = threading.Barrier(4, timeout=5)
+        self.cloudwatch.put_metric_alarm.side_effect = lambda **kwargs: all_running.wait()
+        writer = self._writer()
+
+        failed = writer.put_all(_definitions(8))
+
+        self.assertEqual(failed, set())
+        self.assertEqual(writer.summary()['written'], 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Unit tests for the alert payload builder
+"""
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+from alert_processor.services.alert_payload import AlertPayloadBuilder, MAX_MESSAGE_BYTES
+
+
+def _alert(detail_bytes=100):
+    return {
+        'timestamp': '2024-01-01T00:00:00+00:00',
+        'alert_type': 'cloudwatch_alarm',
+        'alarm_name': 'api-error',
+        'state': 'ALARM',
+        'reason': 'Threshold crossed',
+        'severity': 'high',
+        'environment': 'dev',
+        'source_detail': {'configuration': {'description': '"q"' * (detail_bytes // 3)}}
+    }
+
+
+class TestAlertPayloadBuilder(unittest.TestCase):
+    """Test cases for AlertPayloadBuilder"""
+
+    def setUp(self):
+        bootstrap.reset()
+
+    def test_serializes_once_per_alert(self):
+        """Test SNS and EventBridge share one compact serialization"""
+        builder = AlertPayloadBuilder(bucket='')
+        alert = _alert()
+
+        with mock.patch('alert_processor.services.alert_payload.json.dumps', wraps=json.dumps) as dumps:
+            detail = builder.eventbridge_detail(alert)
+            builder.sns_message(alert, 'text')
+
+        # One dump of the alert, one of the SNS per-protocol envelope
+        self.assertEqual(dumps.call_count, 2)
+        self.assertEqual(detail, json.dumps(alert, separators=(',', ':')))
+
+    def test_sns_message_per_protocol(self):
+        """Test email gets readable text and other protocols the JSON alert"""
+        message = json.loads(AlertPayloadBuilder(bucket='').sns_message(_alert(), 'Alert: api-error'))
+
+        self.assertEqual(json.loads(message['default'])['alarm_name'], 'api-error')
+        self.assertEqual(message['email'], 'Alert: api-error')
+
+    def test_large_alert_truncated_without_bucket(self):
+        """Test oversized alerts fit the limit even after envelope escaping"""
+        builder = AlertPayloadBuilder(bucket='')
+        alert = _alert(detail_bytes=400 * 1024)
+
+        message = builder.sns_message(alert, 'text')
+        detail = json.loads(builder.eventbridge_detail(alert))
+
+        self.assertLessEqual(len(message.encode('utf-8')), MAX_MESSAGE_BYTES)
+        self.assertTrue(detail['truncated'])
+        self.assertNotIn('source_detail', detail)
+        self.assertEqual(detail['alarm_name'], 'api-error')
+
+    def test_large_alert_offloaded_to_bucket(self):
+        """Test the full alert is stored in S3 and referenced from the payload"""
+        s3 = mock.Mock()
+        bootstrap.set_client('s3', s3)
+        builder = AlertPayloadBuilder(bucket='observability-bucket')
+
+        detail = json.loads(builder.eventbridge_detail(_alert(detail_bytes=300 * 1024)))
+
+        s3.put_object.assert_called_once()
+        self.assertTrue(detail['source_detail_location'].startswith('s3://observability-bucket/alerts/'))
+
+    def test_escaping_heavy_alert_fits_envelope_and_offloads_once(self):
+        """Test the serialized SNS envelope is measured, and re-fitting does not offload again"""
+        s3 = mock.Mock()
+        bootstrap.set_client('s3', s3)
+        builder = AlertPayloadBuilder(bucket='observability-bucket')
+        alert = _alert(detail_bytes=300 * 1024)
+        # Fits once offloaded, but each quote doubles again when escaped inside the envelope
+        alert['reason'] = '"' * 100000
+
+        message = builder.sns_message(alert, 'text')
+
+        self.assertLessEqual(len(message.encode('utf-8')), MAX_MESSAGE_BYTES)
+        s3.put_object.assert_called_once()
+        default = json.loads(json.loads(message)['default'])
+        self.assertTrue(default['source_detail_location'].startswith('s3://observability-bucket/alerts/'))
+
+
+if __name__ == '__main__':
+    unittest.main()
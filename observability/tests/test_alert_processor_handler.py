@@ -0,0 +1,219 @@
+"""
+Unit tests for the alert processor handler
+"""
+import base64
+import json
+import os
+import sys
+import time
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from alert_processor import handler as alert_handler
+from shared import bootstrap
+from shared.metrics import MetricsLogger
+
+
+def _alarm_event(alarm_name, event_id='event-1'):
+    return {
+        'id': event_id,
+        'source': 'aws.cloudwatch',
+        'detail-type': 'CloudWatch Alarm State Change',
+        'detail': {
+            'alarmName': alarm_name,
+            'state': {'value': 'ALARM', 'reason': 'Threshold crossed'}
+        }
+    }
+
+
+class TestAlertProcessorHandler(unittest.TestCase):
+    """Test cases for single-event and batched alert processing"""
+
+    def setUp(self):
+        bootstrap.reset()
+        patcher = mock.patch.object(alert_handler, 'NotificationService')
+        self.notification_service = patcher.start().return_value
+        self.notification_service.send_alert_notification.return_value = True
+        self.notification_service.send_to_eventbridge.return_value = True
+        self.notification_service.flush_events.return_value = []
+        self.notification_service.flush_digests.return_value = []
+        self.notification_service.take_latencies.return_value = {}
+        self.addCleanup(patcher.stop)
+
+    def test_single_cloudwatch_alarm(self):
+        """Test a single EventBridge alarm keeps the original response"""
+        response = alert_handler.handler(_alarm_event('api-critical-down'), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(body['alarm_name'], 'api-critical-down')
+        self.assertEqual(body['severity'], 'critical')
+
+    def test_sqs_batch_reports_failed_records(self):
+        """Test only malformed or undeliverable SQS records are retried"""
+        self.notification_service.send_alert_notification.side_effect = [True, False]
+        event = {'Records': [
+            {'eventSource': 'aws:sqs', 'messageId': 'm1', 'body': json.dumps(_alarm_event('db-error'))},
+            {'eventSource': 'aws:sqs', 'messageId': 'm2', 'body': json.dumps(_alarm_event('db-slow'))},
+            {'eventSource': 'aws:sqs', 'messageId': 'm3', 'body': json.dumps({'detail-type': 'Other'})},
+            {'eventSource': 'aws:sqs', 'messageId': 'm4', 'body': 'not json'},
+            {'eventSource': 'aws:sqs', 'messageId': 'm5', 'body': json.dumps({
+                'source': 'aws.cloudwatch', 'detail': {}
+            })}
+        ]}
+
+        response = alert_handler.handler(event, None)
+
+        failed = sorted(item['itemIdentifier'] for item in response['batchItemFailures'])
+        self.assertEqual(failed, ['m2', 'm4', 'm5'])
+
+    def test_scheduled_sweep_sends_repeat_summaries(self):
+        """Test the schedule event sweeps deduplication windows instead of being rejected"""
+        self.notification_service.sweep.return_value = 2
+
+        response = alert_handler.handler({'source': 'aws.events', 'detail-type': 'Scheduled Event'}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body'])['summaries'], 2)
+
+    def test_kinesis_batch(self):
+        """Test Kinesis records are decoded and identified by sequence number"""
+        data = base64.b64encode(json.dumps(_alarm_event('cpu-high')).encode()).decode()
+        event = {'Records': [
+            {'eventSource': 'aws:kinesis', 'kinesis': {'sequenceNumber': '42', 'data': data}}
+        ]}
+
+        response = alert_handler.handler(event, None)
+
+        self.assertEqual(response['batchItemFailures'], [])
+        self.notification_service.send_to_eventbridge.assert_called_once()
+
+    def test_unreadable_kinesis_record_reported_by_sequence_number(self):
+        """Test a record that cannot be decoded is retried under its sequence number"""
+        event = {'Records': [
+            {'eventSource': 'aws:kinesis', 'eventID': 'shardId-000:42', 'kinesis': {'sequenceNumber': '42', 'data': '!'}}
+        ]}
+
+        response = alert_handler.handler(event, None)
+
+        self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': '42'}])
+
+    def test_batch_error_is_raised_for_the_event_source_to_retry(self):
+        """Test an unexpected batch failure errors the invocation instead of returning success"""
+        with mock.patch.object(alert_handler, '_process_batch', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                alert_handler.handler({'Records': [
+                    {'eventSource': 'aws:sqs', 'messageId': 'm1', 'body': json.dumps(_alarm_event('db-error'))}
+                ]}, None)
+
+    def test_failed_flush_keeps_batch_result(self):
+        """Test a failing end-of-invocation flush does not replace the per-record result"""
+        self.notification_service.flush.side_effect = RuntimeError('boom')
+
+        response = alert_handler.handler([_alarm_event('a-error', 'e1')], None)
+
+        self.assertEqual(response, {'batchItemFailures': []})
+
+    def test_pipes_batch_of_events(self):
+        """Test EventBridge Pipes arrays of plain events are processed together"""
+        self.notification_service.send_to_eventbridge.side_effect = [True, False]
+        event = [_alarm_event('a-error', 'e1'), _alarm_event('b-error', 'e2')]
+
+        response = alert_handler.handler(event, None)
+
+        self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': 'e2'}])
+
+    def test_failed_digest_fails_its_records(self):
+        """Test records are retried when the digest carrying their alerts could not be published"""
+        sent = []
+        self.notification_service.send_alert_notification.side_effect = lambda alert: sent.append(alert) or True
+        self.notification_service.flush_digests.side_effect = lambda: [sent[1]]
+
+        response = alert_handler.handler([_alarm_event('a-warning', 'e1'), _alarm_event('b-warning', 'e2')], None)
+
+        self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': 'e2'}])
+
+    def test_eventbridge_flush_failures_map_to_records(self):
+        """Test entries dropped by the batched forwarder fail their own record"""
+        def fail_second_alarm():
+            return [alert for alert in forwarded if alert['alarm_name'] == 'b-error']
+
+        forwarded = []
+        self.notification_service.send_to_eventbridge.side_effect = lambda alert: forwarded.append(alert) or True
+        self.notification_service.flush_events.side_effect = fail_second_alarm
+
+        response = alert_handler.handler([_alarm_event('a-error', 'e1'), _alarm_event('b-error', 'e2')], None)
+
+        self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': 'e2'}])
+        self.notification_service.flush_events.assert_called_once()
+
+    def test_sns_and_eventbridge_delivery_overlap(self):
+        """Test SNS publishing and EventBridge forwarding are in flight at the same time"""
+        # Neither call can return until the other has started
+        both_running = threading.Barrier(2, timeout=5)
+
+        def meet(result):
+            def call(*args):
+                both_running.wait()
+                return result
+            return call
+
+        self.notification_service.send_alert_notification.side_effect = meet(True)
+        self.notification_service.flush_events.side_effect = meet([])
+
+        response = alert_handler.handler(_alarm_event('api-error'), None)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertFalse(both_running.broken)
+
+    def test_forwarded_alerts_carry_the_source_event_id(self):
+        """Test a retried record forwards an alert automation can recognise as a repeat"""
+        forwarded = []
+        self.notification_service.send_to_eventbridge.side_effect = lambda alert: forwarded.append(alert) or True
+
+        alert_handler.handler({'Records': [
+            {'eventSource': 'aws:sqs', 'messageId': 'm1', 'body': json.dumps(_alarm_event('db-error', 'event-7'))}
+        ]}, None)
+
+        self.assertEqual(forwarded[0]['alert_id'], 'event-7')
+
+    def test_unexpected_delivery_error_is_isolated(self):
+        """Test an exception in one SNS publish fails only its own record"""
+        def publish(alert):
+            if alert['alarm_name'] == 'b-error':
+                raise RuntimeError('boom')
+            return True
+
+        self.notification_service.send_alert_notification.side_effect = publish
+
+        response = alert_handler.handler([_alarm_event('a-error', 'e1'), _alarm_event('b-error', 'e2')], None)
+
+        self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': 'e2'}])
+
+    def test_stage_timings_emitted_as_emf(self):
+        """Test one EMF line carries the stage timings and the event age"""
+        lines = []
+        self.notification_service.take_latencies.return_value = {'sns': [12.5], 'eventbridge': [8.0]}
+        event = _alarm_event('api-error')
+        changed_at = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(time.time() - 60))
+        event['detail']['state']['timestamp'] = f"{changed_at}.000+0000"
+
+        with mock.patch.object(alert_handler, 'MetricsLogger', lambda: MetricsLogger(emit=lines.append)):
+            alert_handler.handler({'Records': [
+                {'eventSource': 'aws:sqs', 'messageId': 'm1', 'body': json.dumps(event)}
+            ]}, None)
+
+        self.assertEqual(len(lines), 1)
+        document = json.loads(lines[0])
+        names = {metric['Name'] for metric in document['_aws']['CloudWatchMetrics'][0]['Metrics']}
+        self.assertTrue({'ParseMs', 'ClassifyMs', 'EnrichMs', 'SnsPublishMs',
+                         'EventBridgeForwardMs', 'EventAgeMs'} <= names)
+        self.assertEqual(document['SnsPublishMs'], [12.5])
+        self.assertGreaterEqual(document['EventAgeMs'][0], 60000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Unit tests for the shared Lambda bootstrap
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+
+
+class TestBootstrap(unittest.TestCase):
+    """Test cases for per-container client and service reuse"""
+
+    def setUp(self):
+        bootstrap.reset()
+
+    def test_clients_are_built_once(self):
+        """Test the same tuned client is returned on every call"""
+        client = bootstrap.get_client('sns', region_name='us-east-1')
+
+        self.assertIs(bootstrap.get_client('sns', region_name='us-east-1'), client)
+        self.assertEqual(client.meta.config.retries['mode'], 'adaptive')
+        self.assertTrue(client.meta.config.tcp_keepalive)
+
+    def test_single_attempt_clients(self):
+        """Test max_attempts builds a separate client that leaves retrying to the caller"""
+        client = bootstrap.get_client('cloudwatch', region_name='us-east-1', max_attempts=1)
+
+        self.assertIsNot(bootstrap.get_client('cloudwatch', region_name='us-east-1'), client)
+        self.assertEqual(client.meta.config.retries['mode'], 'standard')
+        self.assertEqual(client.meta.config.retries['total_max_attempts'], 1)
+        self.assertTrue(client.meta.config.tcp_keepalive)
+
+    def test_services_are_built_once(self):
+        """Test the factory only runs on first use"""
+        factory = mock.Mock(return_value=object())
+
+        first = bootstrap.get_service('example', factory)
+        second = bootstrap.get_service('example', factory)
+
+        self.assertIs(first, second)
+        factory.assert_called_once()
+
+    def test_set_client_overrides_construction(self):
+        """Test installed stubs are returned instead of real clients"""
+        stub = object()
+        bootstrap.set_client('events', stub)
+
+        self.assertIs(bootstrap.get_client('events'), stub)
+
+    def test_assumed_role_clients(self):
+        """Test role clients use assumed credentials and are cached per role"""
+        sts = mock.Mock()
+        sts.assume_role.return_value = {'Credentials': {
+            'AccessKeyId': 'AKIAMEMBER',
+            'SecretAccessKey': 'secret',
+            'SessionToken': 'token',
+            'Expiration': datetime.now(timezone.utc) + timedelta(hours=1)
+        }}
+        bootstrap.set_client('sts', sts)
+        role_arn = 'arn:aws:iam::222222222222:role/OrganizationAccountAccessRole'
+
+        client = bootstrap.get_client('ec2', region_name='eu-west-1', role_arn=role_arn)
+        bootstrap.get_client('lambda', region_name='eu-west-1', role_arn=role_arn)
+
+        self.assertIs(bootstrap.get_client('ec2', region_name='eu-west-1', role_arn=role_arn), client)
+        self.assertEqual(client._request_signer._credentials.get_frozen_credentials().access_key, 'AKIAMEMBER')
+        sts.assume_role.assert_called_once()
+
+    def test_timed_handler_reports_cold_start_once(self):
+        """Test init time is attributed to the cold invocation only"""
+        @bootstrap.timed_handler
+        def handler(event, context):
+            bootstrap.get_service('example', object)
+            return event
+
+        with self.assertLogs(bootstrap.logger, level='INFO') as logs:
+            self.assertEqual(handler('a', None), 'a')
+            handler('b', None)
+
+        self.assertIn('"cold_start": true', logs.output[0])
+        self.assertIn('"cold_start": false', logs.output[1])
+        self.assertIn('"init_ms": 0.0', logs.output[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
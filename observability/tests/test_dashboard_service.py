@@ -0,0 +1,272 @@
+"""
+Unit tests for the dashboard service
+"""
+import json
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+from dashboard_updater.services.dashboard_service import DashboardService
+from dashboard_updater.services.dashboard_layout import DashboardLayout
+
+
+def _resources(key, ids, account_id='111111111111', region='eu-west-1'):
+    resources = {'ec2_instances': [], 'lambda_functions': [], 'ecs_clusters': [], 'ecs_services': [],
+                 'rds_instances': []}
+    resources[key] = [{'id': resource_id, 'account_id': account_id, 'region': region} for resource_id in ids]
+    return resources
+
+
+class TestDashboardService(unittest.TestCase):
+    """Test cases for DashboardService"""
+
+    def setUp(self):
+        bootstrap.reset()
+        self.cloudwatch = mock.Mock()
+        self.cloudwatch.get_dashboard.side_effect = ClientError(
+            {'Error': {'Code': 'ResourceNotFound', 'Message': 'missing'}}, 'GetDashboard'
+        )
+        self.live_dashboards = []
+        self.cloudwatch.get_paginator.return_value.paginate.side_effect = lambda **kwargs: [
+            {'DashboardEntries': [{'DashboardName': name} for name in self.live_dashboards]}
+        ]
+        self.cloudwatch.get_metric_data.side_effect = lambda **kwargs: {'MetricDataResults': [
+            {'Id': query['Id'], 'Values': [float(query['MetricStat']['Metric']['Dimensions'][0]['Value'][-2:])]}
+            for query in kwargs['MetricDataQueries']
+        ]}
+        bootstrap.set_client('cloudwatch', self.cloudwatch)
+        bootstrap.set_client('cloudwatch', self.cloudwatch, region_name='eu-west-1')
+        sts = mock.Mock()
+        sts.get_caller_identity.return_value = {'Account': '111111111111'}
+        bootstrap.set_client('sts', sts)
+
+    def _published(self, name):
+        for call in self.cloudwatch.put_dashboard.call_args_list:
+            if call[1]['DashboardName'] == name:
+                return json.loads(call[1]['DashboardBody'])
+        return None
+
+    def test_widgets_target_resource_account_and_region(self):
+        """Test every metric line carries the account and region of its resource"""
+        DashboardService().update_dashboards(_resources('ec2_instances', ['i-1', 'i-2']))
+
+        body = self._published('Observability-EC2-Auto')
+        cpu = body['widgets'][0]['properties']['metrics']
+        self.assertEqual(cpu[0], ['AWS/EC2', 'CPUUtilization', 'InstanceId', 'i-1',
+                                  {'region': 'eu-west-1', 'accountId': '111111111111'}])
+
+
+    def test_unchanged_dashboard_is_skipped(self):
+        """Test put_dashboard only runs when the rendered body changes"""
+        service = DashboardService()
+        resources = _resources('lambda_functions', ['api', 'worker'])
+
+        first = service.update_dashboards(resources)
+        second = service.update_dashboards(_resources('lambda_functions', ['worker', 'api']))
+        third = service.update_dashboards(_resources('lambda_functions', ['api', 'worker', 'jobs']))
+
+        self.assertEqual(first['updated'], ['Lambda'])
+        self.assertEqual(second['skipped'], ['Lambda'])
+        self.assertEqual(third['updated'], ['Lambda'])
+        self.assertEqual(self.cloudwatch.put_dashboard.call_count, 2)
+
+    def test_live_dashboard_compared_after_cold_start(self):
+        """Test a fresh container reads the live body instead of republishing it"""
+        DashboardService().update_dashboards(_resources('ec2_instances', ['i-1']))
+        live = self.cloudwatch.put_dashboard.call_args[1]['DashboardBody']
+        self.cloudwatch.get_dashboard.side_effect = None
+        self.cloudwatch.get_dashboard.return_value = {'DashboardBody': json.dumps(json.loads(live), indent=2)}
+
+        results = DashboardService().update_dashboards(_resources('ec2_instances', ['i-1']))
+
+        self.assertEqual(results['skipped'], ['EC2'])
+        self.assertEqual(self.cloudwatch.put_dashboard.call_count, 1)
+
+    def test_failed_put_is_retried_next_run(self):
+        """Test a failed publish is reported and not remembered as live"""
+        self.cloudwatch.put_dashboard.side_effect = [Exception('Throttling'), None]
+        service = DashboardService()
+        resources = _resources('ec2_instances', ['i-1'])
+
+        self.assertEqual(service.update_dashboards(resources)['failed'], ['EC2'])
+        self.assertEqual(service.update_dashboards(resources)['updated'], ['EC2'])
+
+
+    def test_large_fleet_spills_into_numbered_dashboards(self):
+        """Test every instance appears and shards respect the widget limits"""
+        service = DashboardService()
+        service.layout = DashboardLayout('eu-west-1', metrics_per_widget=20, widgets_per_dashboard=4)
+
+        service.update_dashboards(_resources('ec2_instances', [f"i-{n:03d}" for n in range(45)]))
+
+        # Shards are published concurrently, so in no particular order
+        names = sorted(call[1]['DashboardName'] for call in self.cloudwatch.put_dashboard.call_args_list)
+        self.assertEqual(names, ['Observability-EC2-Auto', 'Observability-EC2-Auto-2', 'Observability-EC2-Auto-3'])
+        shown = set()
+        for name in names:
+            widgets = self._published(name)['widgets']
+            self.assertLessEqual(len(widgets), 4)
+            for widget in widgets:
+                self.assertLessEqual(len(widget['properties']['metrics']), 20)
+                shown.update(row[3] for row in widget['properties']['metrics'])
+        self.assertEqual(len(shown), 45)
+
+    def test_shrinking_fleet_removes_stale_shards(self):
+        """Test numbered dashboards beyond the current shard count are deleted"""
+        self.live_dashboards = ['Observability-EC2-Auto-2', 'Observability-EC2-Auto-3']
+
+        DashboardService().update_dashboards(_resources('ec2_instances', ['i-1']))
+
+        self.cloudwatch.delete_dashboards.assert_called_once_with(
+            DashboardNames=['Observability-EC2-Auto-2', 'Observability-EC2-Auto-3']
+        )
+
+    def test_shards_respect_the_dashboard_metric_limit(self):
+        """Test large per-widget and per-dashboard settings still spill past 2,500 metrics"""
+        service = DashboardService()
+        service.layout = DashboardLayout('eu-west-1', metrics_per_widget=500, widgets_per_dashboard=500)
+
+        service.update_dashboards(_resources('ec2_instances', [f"i-{n:04d}" for n in range(3000)]))
+
+        names = [call[1]['DashboardName'] for call in self.cloudwatch.put_dashboard.call_args_list]
+        shown = set()
+        for name in names:
+            metrics = [row for widget in self._published(name)['widgets'] for row in widget['properties']['metrics']]
+            self.assertLessEqual(len(metrics), 2500)
+            shown.update(row[3] for row in metrics)
+        self.assertGreater(len(names), 1)
+        self.assertEqual(len(shown), 3000)
+
+    def test_group_by_tag_starts_new_widgets(self):
+        """Test grouped resources get their own titled widgets"""
+        layout = DashboardLayout('eu-west-1', group_by='tag:aws:autoscaling:groupName')
+        service = DashboardService()
+        resources = _resources('ec2_instances', ['i-1', 'i-2', 'i-3'])
+        for resource, group in zip(resources['ec2_instances'], ['web', 'batch', 'web']):
+            resource['tags'] = {'aws:autoscaling:groupName': group}
+        service.layout = layout
+
+        service.update_dashboards(resources)
+
+        widgets = self._published('Observability-EC2-Auto')['widgets']
+        titles = [widget['properties']['title'] for widget in widgets]
+        self.assertEqual(titles, ['EC2 CPU Utilization - batch', 'EC2 Network I/O - batch',
+                                  'EC2 CPU Utilization - web', 'EC2 Network I/O - web'])
+        self.assertEqual([row[3] for row in widgets[2]['properties']['metrics']], ['i-1', 'i-3'])
+
+
+    def test_hotspots_shown_first(self):
+        """Test the hottest resources get their own widgets on the first dashboard"""
+        service = DashboardService()
+        service.top_n = 3
+
+        service.update_dashboards(_resources('ec2_instances', [f"i-{n:02d}" for n in range(30)]))
+
+        widgets = self._published('Observability-EC2-Auto')['widgets']
+        self.assertEqual(widgets[0]['properties']['title'], 'EC2 CPU Utilization - top 3 by CPUUtilization')
+        self.assertEqual([row[3] for row in widgets[0]['properties']['metrics']], ['i-27', 'i-28', 'i-29'])
+
+    def test_ranking_batches_get_metric_data(self):
+        """Test ranking sends at most 500 queries per request"""
+        ranker = DashboardService().ranker
+        resources = _resources('ec2_instances', [f"i-{n:04d}" for n in range(1200)])['ec2_instances']
+
+        top = ranker.top(resources, 'AWS/EC2', 'CPUUtilization', 'InstanceId', 'Average', 5)
+
+        self.assertEqual(len(top), 5)
+        self.assertEqual(self.cloudwatch.get_metric_data.call_count, 3)
+        self.assertTrue(all(len(call[1]['MetricDataQueries']) <= 500
+                            for call in self.cloudwatch.get_metric_data.call_args_list))
+
+    def test_ranking_failure_falls_back_to_unranked(self):
+        """Test dashboards are still published when ranking fails"""
+        self.cloudwatch.get_metric_data.side_effect = Exception('Throttling')
+        service = DashboardService()
+        service.top_n = 3
+
+        results = service.update_dashboards(_resources('ec2_instances', [f"i-{n:02d}" for n in range(30)]))
+
+        self.assertEqual(results['updated'], ['EC2'])
+        widgets = self._published('Observability-EC2-Auto')['widgets']
+        self.assertNotIn('top', widgets[0]['properties']['title'])
+
+    def test_dashboard_types_published_concurrently(self):
+        """Test puts for different types are in flight at the same time"""
+        # Neither put can return until the other has started
+        both_running = threading.Barrier(2, timeout=5)
+        self.cloudwatch.put_dashboard.side_effect = lambda **kwargs: both_running.wait()
+        resources = _resources('ec2_instances', ['i-1'])
+        resources['lambda_functions'] = _resources('lambda_functions', ['api'])['lambda_functions']
+
+        results = DashboardService().update_dashboards(resources)
+
+        self.assertEqual(sorted(results['updated']), ['EC2', 'Lambda'])
+
+    def test_throttled_put_backs_off_and_retries(self):
+        """Test throttling errors are retried after a backoff"""
+        throttled = ClientError({'Error': {'Code': 'Throttling', 'Message': 'Rate exceeded'}}, 'PutDashboard')
+        self.cloudwatch.put_dashboard.side_effect = [throttled, throttled, None]
+        service = DashboardService()
+        service.sleep = mock.Mock()
+
+        results = service.update_dashboards(_resources('ec2_instances', ['i-1']))
+
+        self.assertEqual(results['updated'], ['EC2'])
+        self.assertEqual(service.sleep.call_count, 2)
+
+    def test_failing_type_does_not_block_others(self):
+        """Test a render error fails only its own dashboard type"""
+        service = DashboardService()
+        service._update_ec2_dashboard = mock.Mock(side_effect=RuntimeError('boom'))
+        resources = _resources('ec2_instances', ['i-1'])
+        resources['lambda_functions'] = _resources('lambda_functions', ['api'])['lambda_functions']
+
+        results = service.update_dashboards(resources)
+
+        self.assertEqual(results['failed'], ['EC2'])
+        self.assertEqual(results['updated'], ['Lambda'])
+
+    def test_ecs_service_rows_carry_cluster_dimension(self):
+        """Test service metrics are dimensioned by service and cluster"""
+        resources = _resources('ecs_services', ['api'])
+        resources['ecs_services'][0]['dimensions'] = {'ClusterName': 'web'}
+
+        results = DashboardService().update_dashboards(resources)
+
+        self.assertEqual(results['updated'], ['ECS-Services'])
+        body = self._published('Observability-ECS-Services-Auto')
+        self.assertEqual([w['properties']['title'] for w in body['widgets']],
+                         ['ECS Service CPU Utilization', 'ECS Service Memory Utilization', 'ECS Running Tasks'])
+        self.assertEqual(body['widgets'][2]['properties']['metrics'][0][:6],
+                         ['ECS/ContainerInsights', 'RunningTaskCount', 'ServiceName', 'api', 'ClusterName', 'web'])
+
+    def test_rds_dashboard_shows_database_health(self):
+        """Test RDS dashboards graph CPU, connections, latency and free storage"""
+        DashboardService().update_dashboards(_resources('rds_instances', ['orders']))
+
+        body = self._published('Observability-RDS-Auto')
+        metrics = [row[1] for widget in body['widgets'] for row in widget['properties']['metrics']]
+        self.assertEqual(metrics, ['CPUUtilization', 'DatabaseConnections', 'ReadLatency', 'WriteLatency',
+                                   'FreeStorageSpace'])
+
+    def test_unchanged_inventory_is_not_rendered(self):
+        """Test types missing from the inventory delta are skipped once fully published"""
+        service = DashboardService()
+        resources = _resources('ec2_instances', ['i-1'])
+        service.update_dashboards(resources, {'ec2_instances'})
+        service._update_ec2_dashboard = mock.Mock()
+
+        results = service.update_dashboards(resources, set())
+
+        self.assertEqual(results['skipped'], ['EC2'])
+        service._update_ec2_dashboard.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
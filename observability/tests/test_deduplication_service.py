@@ -0,0 +1,173 @@
+"""
+Unit tests for alert deduplication
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from alert_processor.services.deduplication_service import (
+    DeduplicationService, MemoryDedupStore, SQLiteDedupStore, alert_fingerprint
+)
+
+
+def _alert(alarm_name='api-error', instance_id='i-1', state='ALARM'):
+    return {
+        'alert_type': 'cloudwatch_alarm',
+        'alarm_name': alarm_name,
+        'state': state,
+        'severity': 'high',
+        'environment': 'dev',
+        'source_detail': {'configuration': {'metrics': [
+            {'metricStat': {'metric': {'dimensions': {'InstanceId': instance_id}}}}
+        ]}}
+    }
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDeduplicationService(unittest.TestCase):
+    """Test cases for DeduplicationService"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def _service(self, store):
+        return DeduplicationService(store=store, window_seconds=60, clock=self.clock)
+
+    def test_fingerprint_includes_state_and_dimensions(self):
+        """Test different states or resources never share a window"""
+        self.assertEqual(alert_fingerprint(_alert()), alert_fingerprint(_alert()))
+        self.assertNotEqual(alert_fingerprint(_alert()), alert_fingerprint(_alert(state='OK')))
+        self.assertNotEqual(alert_fingerprint(_alert()), alert_fingerprint(_alert(instance_id='i-2')))
+
+    def test_fingerprint_includes_fleet_alarm_contributor(self):
+        """Test each resource behind one fleet alarm is deduplicated on its own"""
+        def fleet(instance_id):
+            return dict(_alert(alarm_name='AutoDiscovered-Fleet-EC2-CPU-web'), source_detail={},
+                        contributor={'id': 'c1', 'attributes': {'InstanceId': instance_id}})
+
+        self.assertEqual(alert_fingerprint(fleet('i-1')), alert_fingerprint(fleet('i-1')))
+        self.assertNotEqual(alert_fingerprint(fleet('i-1')), alert_fingerprint(fleet('i-2')))
+
+    def test_repeats_suppressed_then_summarized(self):
+        """Test repeats inside the window are counted and summarized on close"""
+        service = self._service(MemoryDedupStore())
+
+        self.assertEqual(service.check(_alert()), (True, None))
+        self.assertEqual(service.check(_alert())[0], False)
+        self.assertEqual(service.check(_alert())[0], False)
+        self.assertEqual(service.flush(), [])
+
+        self.clock.now += 61
+        summaries = service.flush()
+
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0]['repeat_count'], 2)
+        self.assertIn('repeated 2 times', summaries[0]['message'])
+        self.assertEqual(service.suppressed_total, 2)
+
+    def test_refire_after_window_reports_previous_repeats(self):
+        """Test the next occurrence after the window carries the repeat summary"""
+        service = self._service(MemoryDedupStore())
+        service.check(_alert())
+        service.check(_alert())
+
+        self.clock.now += 61
+        publish, summary = service.check(_alert())
+
+        self.assertTrue(publish)
+        self.assertEqual(summary['repeat_count'], 1)
+
+    def test_forget_releases_window(self):
+        """Test an undelivered alert does not suppress its retry"""
+        service = self._service(MemoryDedupStore())
+        service.check(_alert())
+        service.forget(_alert())
+
+        self.assertTrue(service.check(_alert())[0])
+
+    def test_forget_leaves_windows_owned_by_others(self):
+        """Test a container cannot drop a window another container opened"""
+        store = MemoryDedupStore()
+        first = self._service(store)
+        second = self._service(store)
+        first.check(_alert())
+
+        second.forget(_alert())
+        self.assertFalse(second.check(_alert())[0])
+
+        self.clock.now += 61
+        self.assertTrue(second.check(_alert())[0])
+        first.forget(_alert())
+        self.assertFalse(first.check(_alert())[0])
+
+    def test_sweep_summarizes_windows_counted_elsewhere(self):
+        """Test the scheduled sweep reports repeats once, without another alert or the counting container"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dedup.db')
+            counting = self._service(SQLiteDedupStore(path))
+            sweeper = self._service(SQLiteDedupStore(path))
+            counting.check(_alert())
+            counting.check(_alert())
+            counting.check(_alert())
+            counting.flush()
+
+            self.assertEqual(sweeper.sweep(), [])
+            self.clock.now += 61
+            summaries = sweeper.sweep()
+            again = sweeper.sweep()
+
+        self.assertEqual(len(summaries), 1)
+        fingerprint, summary = summaries[0]
+        self.assertEqual(fingerprint, alert_fingerprint(_alert()))
+        self.assertEqual((summary['alarm_name'], summary['repeat_count']), ('api-error', 2))
+        self.assertEqual(again, [])
+
+    def test_restored_repeats_are_swept_again(self):
+        """Test a summary that could not be sent is reported by the next sweep"""
+        service = self._service(MemoryDedupStore())
+        service.check(_alert())
+        service.check(_alert())
+        service.flush()
+        self.clock.now += 61
+
+        fingerprint, summary = service.sweep()[0]
+        service.restore(fingerprint, summary['repeat_count'])
+
+        self.assertEqual([s['repeat_count'] for _, s in service.sweep()], [1])
+
+    def test_sqlite_store_is_shared_between_containers(self):
+        """Test two containers sharing a SQLite store send one summary"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dedup.db')
+            first = self._service(SQLiteDedupStore(path))
+            second = self._service(SQLiteDedupStore(path))
+
+            self.assertTrue(first.check(_alert())[0])
+            self.assertFalse(second.check(_alert())[0])
+            second.flush()
+
+            self.clock.now += 61
+            summaries = first.flush() + second.flush()
+
+        self.assertEqual([summary['repeat_count'] for summary in summaries], [1])
+
+    def test_disabled_window(self):
+        """Test a zero window publishes everything"""
+        service = DeduplicationService(store=MemoryDedupStore(), window_seconds=0)
+
+        self.assertEqual(service.check(_alert()), (True, None))
+        self.assertEqual(service.check(_alert()), (True, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
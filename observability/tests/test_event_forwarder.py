@@ -0,0 +1,101 @@
+"""
+Unit tests for the buffered EventBridge forwarder
+"""
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from botocore.exceptions import ClientError, ReadTimeoutError
+from alert_processor.services.event_forwarder import EventBridgeForwarder, MAX_REQUEST_BYTES
+
+
+def _entry(index, size=10):
+    return {
+        'Source': 'observability.alerts',
+        'DetailType': 'Alert Processed',
+        'Detail': json.dumps({'index': index, 'padding': 'x' * size}),
+        'EventBusName': 'bus'
+    }
+
+
+def _accept_all(Entries):
+    return {'FailedEntryCount': 0, 'Entries': [{'EventId': str(i)} for i in range(len(Entries))]}
+
+
+class TestEventBridgeForwarder(unittest.TestCase):
+    """Test cases for EventBridgeForwarder"""
+
+    def setUp(self):
+        self.events = mock.Mock()
+        self.events.put_events.side_effect = _accept_all
+        self.forwarder = EventBridgeForwarder(self.events, sleep=lambda seconds: None)
+
+    def test_packs_ten_entries_per_call(self):
+        """Test 25 entries need three put_events calls"""
+        for index in range(25):
+            self.forwarder.add(_entry(index), key=index)
+
+        self.assertEqual(self.forwarder.flush(), [])
+        self.assertEqual([len(c.kwargs['Entries']) for c in self.events.put_events.call_args_list], [10, 10, 5])
+
+    def test_packs_by_request_size(self):
+        """Test large entries are split to stay under 256 KB per call"""
+        for index in range(3):
+            self.forwarder.add(_entry(index, size=100 * 1024), key=index)
+
+        self.forwarder.flush()
+
+        self.assertEqual([len(c.kwargs['Entries']) for c in self.events.put_events.call_args_list], [2, 1])
+
+    def test_rejects_oversized_entry(self):
+        """Test a single entry above the limit is refused up front"""
+        self.assertFalse(self.forwarder.add(_entry(0, size=MAX_REQUEST_BYTES)))
+        self.assertEqual(len(self.forwarder), 0)
+
+    def test_retries_only_failed_entries(self):
+        """Test entries reported in FailedEntryCount are resent alone"""
+        self.events.put_events.side_effect = [
+            {'FailedEntryCount': 1, 'Entries': [{'EventId': '1'}, {'ErrorCode': 'InternalFailure'}]},
+            {'FailedEntryCount': 0, 'Entries': [{'EventId': '2'}]}
+        ]
+        self.forwarder.add(_entry(0), key='a')
+        self.forwarder.add(_entry(1), key='b')
+
+        self.assertEqual(self.forwarder.flush(), [])
+        retried = self.events.put_events.call_args_list[1].kwargs['Entries']
+        self.assertEqual([json.loads(e['Detail'])['index'] for e in retried], [1])
+
+    def test_returns_keys_after_exhausting_attempts(self):
+        """Test entries that never succeed are reported, not silently dropped"""
+        self.events.put_events.side_effect = ClientError(
+            {'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'PutEvents'
+        )
+        self.forwarder.add(_entry(0), key='a')
+
+        self.assertEqual(self.forwarder.flush(), ['a'])
+        self.assertEqual(self.events.put_events.call_count, 3)
+
+    def test_connection_errors_are_retried_then_reported(self):
+        """Test a timeout fails its chunk instead of losing the other queued entries"""
+        calls = []
+
+        def put_events(Entries):
+            calls.append(len(Entries))
+            if len(calls) == 1:
+                raise ReadTimeoutError(endpoint_url='https://events.us-east-1.amazonaws.com')
+            return _accept_all(Entries)
+
+        self.events.put_events.side_effect = put_events
+        for index in range(12):
+            self.forwarder.add(_entry(index), key=index)
+
+        self.assertEqual(self.forwarder.flush(), [])
+        self.assertEqual(calls, [10, 2, 10])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Unit tests for the inventory snapshot store
+"""
+import gzip
+import io
+import os
+import sys
+import unittest
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+from shared import inventory
+
+
+def _resource(resource_id, **fields):
+    return dict({'id': resource_id, 'account_id': '111111111111', 'region': 'us-east-1'}, **fields)
+
+
+class FakeS3:
+    """Just enough of S3 to hold objects in memory"""
+
+    def __init__(self):
+        self.objects = {}
+        self.gets = []
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        self.gets.append(Key)
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'missing'}}, 'GetObject')
+        return {'Body': io.BytesIO(self.objects[Key])}
+
+
+class TestInventory(unittest.TestCase):
+    """Test cases for inventory diffs and snapshots"""
+
+    def setUp(self):
+        bootstrap.reset()
+        self.s3 = FakeS3()
+        bootstrap.set_client('s3', self.s3)
+
+    def test_diff_reports_added_removed_and_changed(self):
+        """Test resources are matched by identity and compared by content"""
+        previous = {'ec2_instances': [_resource('i-1'), _resource('i-2', instance_type='t3.micro')]}
+        current = {'ec2_instances': [_resource('i-2', instance_type='t3.large'), _resource('i-3')]}
+
+        delta = inventory.diff(previous, current)
+
+        self.assertEqual([r['id'] for r in delta['added']['ec2_instances']], ['i-3'])
+        self.assertEqual([r['id'] for r in delta['removed']['ec2_instances']], ['i-1'])
+        self.assertEqual([r['id'] for r in delta['changed']['ec2_instances']], ['i-2'])
+
+    def test_volatile_fields_are_not_changes(self):
+        """Test running task counts alone do not count as a change"""
+        service = _resource('api', dimensions={'ClusterName': 'web'}, running_count=2)
+        moved = dict(service, running_count=3)
+
+        delta = inventory.diff({'ecs_services': [service]}, {'ecs_services': [moved]})
+
+        self.assertTrue(inventory.is_empty(delta))
+
+    def test_failed_scope_is_carried_forward(self):
+        """Test resources of a failed scope are kept while other scopes still report removals"""
+        previous = {'ec2_instances': [_resource('i-1'), _resource('i-2', region='eu-west-1')]}
+        failed = [{'type': 'ec2_instances', 'account_id': '111111111111', 'region': 'eu-west-1'}]
+
+        current = inventory.carry_forward(previous, {'ec2_instances': []}, failed)
+        delta = inventory.diff(previous, current)
+
+        self.assertEqual([r['id'] for r in delta['removed']['ec2_instances']], ['i-1'])
+        self.assertEqual([r['id'] for r in current['ec2_instances']], ['i-2'])
+
+    def test_snapshot_round_trip(self):
+        """Test a saved snapshot is gzip JSON lines and reads back as the same inventory"""
+        resources = {'ec2_instances': [_resource('i-2'), _resource('i-1', tags={'Name': 'web'})],
+                     'rds_instances': [_resource('orders')]}
+        store = inventory.InventoryStore('test', bucket='bucket')
+
+        key = store.save(resources)
+
+        lines = gzip.decompress(self.s3.objects[key]).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(key.startswith('inventory/test/snapshots/'))
+
+        loaded = inventory.InventoryStore('test', bucket='bucket').latest()
+        self.assertTrue(inventory.is_empty(inventory.diff(loaded, resources)))
+
+    def test_missing_snapshot_treats_everything_as_added(self):
+        """Test the first run has no previous inventory"""
+        store = inventory.InventoryStore('test', bucket='bucket')
+
+        previous = store.latest()
+        delta = inventory.diff(previous, {'ec2_instances': [_resource('i-1')]})
+
+        self.assertIsNone(previous)
+        self.assertEqual(inventory.summary(delta), {'added': {'ec2_instances': 1}, 'removed': {}, 'changed': {}})
+
+    def test_unreadable_pointer_is_raised(self):
+        """Test errors other than a missing pointer are not mistaken for an empty inventory"""
+        def denied(Bucket, Key):
+            raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'denied'}}, 'GetObject')
+        self.s3.get_object = denied
+
+        with self.assertRaises(ClientError):
+            inventory.InventoryStore('test', bucket='bucket').latest()
+
+    def test_warm_store_reads_only_the_pointer(self):
+        """Test an unchanged pointer does not download the snapshot again"""
+        store = inventory.InventoryStore('test', bucket='bucket')
+        store.save({'ec2_instances': [_resource('i-1')]})
+
+        store.latest()
+
+        self.assertEqual(self.s3.gets, ['inventory/test/latest.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
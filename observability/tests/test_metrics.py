@@ -0,0 +1,62 @@
+"""
+Unit tests for the Embedded Metric Format logger
+"""
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared.metrics import MetricsLogger, MAX_VALUES_PER_METRIC
+
+
+class TestMetricsLogger(unittest.TestCase):
+    """Test cases for MetricsLogger"""
+
+    def setUp(self):
+        self.lines = []
+        self.metrics = MetricsLogger(namespace='Test', dimensions={'FunctionName': 'fn'}, emit=self.lines.append)
+
+    def test_emf_document(self):
+        """Test values are written as one EMF line with their units and dimensions"""
+        self.metrics.put('EnrichMs', 1.5)
+        self.metrics.put('EnrichMs', 2.5)
+        self.metrics.put('Alerts', 2, unit='Count')
+
+        self.metrics.flush()
+
+        document = json.loads(self.lines[0])
+        directive = document['_aws']['CloudWatchMetrics'][0]
+        self.assertEqual(directive['Namespace'], 'Test')
+        self.assertEqual(directive['Dimensions'], [['FunctionName']])
+        self.assertIn({'Name': 'Alerts', 'Unit': 'Count'}, directive['Metrics'])
+        self.assertEqual(document['EnrichMs'], [1.5, 2.5])
+        self.assertEqual(document['FunctionName'], 'fn')
+
+    def test_timer_records_milliseconds(self):
+        """Test the timer records elapsed time of its block"""
+        with self.metrics.timer('ParseMs'):
+            pass
+
+        self.metrics.flush()
+
+        self.assertGreaterEqual(json.loads(self.lines[0])['ParseMs'][0], 0)
+
+    def test_value_limit_splits_lines(self):
+        """Test more values than EMF allows per metric spill into another line"""
+        self.metrics.put_all('SnsPublishMs', [1.0] * (MAX_VALUES_PER_METRIC + 1))
+
+        self.metrics.flush()
+
+        self.assertEqual([len(json.loads(line)['SnsPublishMs']) for line in self.lines], [MAX_VALUES_PER_METRIC, 1])
+
+    def test_empty_flush_writes_nothing(self):
+        """Test nothing is written when no values were recorded"""
+        self.metrics.flush()
+
+        self.assertEqual(self.lines, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
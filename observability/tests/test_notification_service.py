@@ -0,0 +1,169 @@
+"""
+Unit tests for the alert notification service
+"""
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+from alert_processor.services.digest_service import DigestService
+from alert_processor.services.notification_service import NotificationService
+
+TOPIC_ENV = {
+    'TOPIC_ARN_CRITICAL': 'arn:aws:sns:us-east-1:123456789012:critical',
+    'TOPIC_ARN_HIGH': 'arn:aws:sns:us-east-1:123456789012:high',
+    'TOPIC_ARN_MEDIUM': 'arn:aws:sns:us-east-1:123456789012:medium',
+    'TOPIC_ARN_LOW': 'arn:aws:sns:us-east-1:123456789012:low',
+    'DEDUP_WINDOW_SECONDS': '0'
+}
+
+
+def _alert(alarm_name, severity, namespace='AWS/EC2'):
+    return {
+        'timestamp': '2024-01-01T00:00:00+00:00',
+        'alert_type': 'cloudwatch_alarm',
+        'alarm_name': alarm_name,
+        'state': 'ALARM',
+        'reason': 'Threshold crossed',
+        'severity': severity,
+        'environment': 'dev',
+        'source_detail': {'configuration': {'metrics': [
+            {'metricStat': {'metric': {'namespace': namespace}}}
+        ]}}
+    }
+
+
+class TestNotificationService(unittest.TestCase):
+    """Test cases for immediate and digested delivery"""
+
+    def setUp(self):
+        bootstrap.reset()
+        self.sns = mock.Mock()
+        bootstrap.set_client('sns', self.sns)
+        bootstrap.set_client('events', mock.Mock())
+        patcher = mock.patch.dict(os.environ, TOPIC_ENV)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_critical_alerts_publish_immediately(self):
+        """Test critical and high alerts keep the immediate path"""
+        service = NotificationService()
+
+        self.assertTrue(service.send_alert_notification(_alert('db-down', 'critical')))
+
+        self.sns.publish.assert_called_once()
+        publish = self.sns.publish.call_args.kwargs
+        self.assertEqual(publish['TopicArn'], TOPIC_ENV['TOPIC_ARN_CRITICAL'])
+        self.assertEqual(publish['MessageStructure'], 'json')
+        message = json.loads(publish['Message'])
+        self.assertEqual(json.loads(message['default'])['alarm_name'], 'db-down')
+        self.assertIn('Alert: db-down', message['email'])
+
+    def test_fleet_alarm_names_its_contributor(self):
+        """Test the offending resource of a fleet alarm shows in the subject and email"""
+        service = NotificationService()
+        alert = dict(_alert('AutoDiscovered-Fleet-EC2-CPU-web', 'high'),
+                     contributor={'id': 'c1', 'attributes': {'InstanceId': 'i-7'}})
+
+        service.send_alert_notification(alert)
+
+        publish = self.sns.publish.call_args.kwargs
+        self.assertEqual(publish['Subject'], '[HIGH] [DEV] AutoDiscovered-Fleet-EC2-CPU-web (i-7)')
+        self.assertIn('Contributor: InstanceId=i-7', json.loads(publish['Message'])['email'])
+
+    def test_low_and_medium_alerts_are_digested(self):
+        """Test non-critical alerts produce one digest per topic on flush"""
+        service = NotificationService()
+        for _ in range(3):
+            service.send_alert_notification(_alert('disk-usage', 'medium'))
+        service.send_alert_notification(_alert('queue-depth', 'medium', namespace='AWS/SQS'))
+        service.send_alert_notification(_alert('cpu-credits', 'low'))
+
+        self.sns.publish.assert_not_called()
+        self.assertEqual(service.flush_digests(), [])
+
+        self.assertEqual(self.sns.publish.call_count, 2)
+        digests = {
+            call.kwargs['TopicArn']: json.loads(json.loads(call.kwargs['Message'])['default'])
+            for call in self.sns.publish.call_args_list
+        }
+        medium = digests[TOPIC_ENV['TOPIC_ARN_MEDIUM']]
+        self.assertEqual(medium['alert_count'], 4)
+        self.assertEqual([(g['source'], g['count']) for g in medium['groups']], [('AWS/EC2', 3), ('AWS/SQS', 1)])
+
+    def test_failed_digest_returns_its_alerts(self):
+        """Test alerts of a digest that could not be published are handed back for retry"""
+        self.sns.publish.side_effect = ClientError({'Error': {'Code': 'Throttling'}}, 'Publish')
+        service = NotificationService()
+        alerts = [_alert('disk-usage', 'medium'), _alert('cpu-credits', 'low')]
+        for alert in alerts:
+            self.assertTrue(service.send_alert_notification(alert))
+
+        failed = service.flush_digests()
+
+        self.assertEqual(sorted(alert['alarm_name'] for alert in failed), ['cpu-credits', 'disk-usage'])
+        self.sns.publish.reset_mock(side_effect=True)
+        service.flush()
+        self.sns.publish.assert_not_called()
+
+
+    @mock.patch.dict(os.environ, {'DEDUP_WINDOW_SECONDS': '300'})
+    def test_connection_error_releases_the_window(self):
+        """Test an alert whose publish could not connect is published by the retry, not suppressed"""
+        self.sns.publish.side_effect = EndpointConnectionError(endpoint_url='https://sns')
+        service = NotificationService()
+
+        self.assertFalse(service.send_alert_notification(_alert('db-down', 'critical')))
+        self.sns.publish.reset_mock(side_effect=True)
+        self.assertTrue(service.send_alert_notification(_alert('db-down', 'critical')))
+
+        self.sns.publish.assert_called_once()
+
+    @mock.patch.dict(os.environ, {'DEDUP_WINDOW_SECONDS': '300'})
+    def test_raising_flush_releases_digested_windows(self):
+        """Test alerts of a flush that raised are not suppressed when the batch is retried"""
+        self.sns.publish.side_effect = RuntimeError('boom')
+        service = NotificationService()
+        self.assertTrue(service.send_alert_notification(_alert('disk-usage', 'medium')))
+        with self.assertRaises(RuntimeError):
+            service.flush_digests()
+
+        self.sns.publish.reset_mock(side_effect=True)
+        self.assertTrue(service.send_alert_notification(_alert('disk-usage', 'medium')))
+        self.assertEqual(service.flush_digests(), [])
+
+        self.sns.publish.assert_called_once()
+
+
+class TestDigestService(unittest.TestCase):
+    """Test cases for DigestService intervals"""
+
+    def test_interval_holds_buffer_until_due(self):
+        """Test a digest is only emitted once its interval has elapsed"""
+        now = [0.0]
+        digest = DigestService(severities=['low'], interval_seconds=60, clock=lambda: now[0])
+        digest.add('topic', _alert('cpu-credits', 'low'))
+
+        self.assertEqual(digest.flush(), [])
+        now[0] = 61
+        self.assertEqual(len(digest.flush()), 1)
+
+    def test_requeue_keeps_counts(self):
+        """Test a digest that failed to publish is merged back into the buffer"""
+        digest = DigestService(severities=['low'], interval_seconds=0)
+        digest.add('topic', _alert('cpu-credits', 'low'))
+        [(topic_arn, message)] = digest.flush()
+
+        digest.requeue(topic_arn, message)
+        digest.add('topic', _alert('cpu-credits', 'low'))
+
+        self.assertEqual(digest.flush()[0][1]['alert_count'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
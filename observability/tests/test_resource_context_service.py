@@ -0,0 +1,178 @@
+"""
+Unit tests for the resource context service
+"""
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+from alert_processor.services.resource_context_service import ResourceContextService
+
+
+def _alarm(**dimensions):
+    return {
+        'alarmName': 'cpu-high',
+        'configuration': {
+            'metrics': [{'metricStat': {'metric': {'namespace': 'AWS/EC2', 'dimensions': dimensions}}}]
+        }
+    }
+
+
+def _instance(instance_id):
+    return {
+        'InstanceId': instance_id,
+        'InstanceType': 't3.micro',
+        'Placement': {'AvailabilityZone': 'us-east-1a'},
+        'State': {'Name': 'running'},
+        'Tags': [{'Key': 'Owner', 'Value': 'payments'}]
+    }
+
+
+class TestResourceContextService(unittest.TestCase):
+    """Test cases for ResourceContextService"""
+
+    def setUp(self):
+        bootstrap.reset()
+        self.ec2 = mock.Mock()
+        self.ec2.describe_instances.side_effect = lambda Filters: {
+            'Reservations': [{'Instances': [_instance(i) for i in Filters[0]['Values'] if i != 'i-gone']}]
+        }
+        bootstrap.set_client('ec2', self.ec2)
+        self.now = [0.0]
+
+    def _service(self, **kwargs):
+        kwargs.setdefault('ttl_seconds', 60)
+        kwargs.setdefault('timeout_ms', 1000)
+        return ResourceContextService(clock=lambda: self.now[0], **kwargs)
+
+    def test_batch_resolved_with_one_call(self):
+        """Test all instances of a batch are described together"""
+        service = self._service()
+        alarms = [_alarm(InstanceId='i-1'), _alarm(InstanceId='i-2'), _alarm(InstanceId='i-1')]
+
+        service.prefetch(alarms)
+
+        self.ec2.describe_instances.assert_called_once()
+        self.assertEqual(sorted(self.ec2.describe_instances.call_args[1]['Filters'][0]['Values']), ['i-1', 'i-2'])
+        context = service.lookup(alarms[1])['InstanceId=i-2']
+        self.assertEqual(context['owner'], 'payments')
+        self.assertEqual(context['availability_zone'], 'us-east-1a')
+
+    def test_fleet_alarm_resolved_from_contributor(self):
+        """Test a Metrics Insights alarm is resolved through the contributor that fired it"""
+        service = self._service()
+        alarm = {
+            'alarmName': 'AutoDiscovered-Fleet-EC2-CPU-web',
+            'configuration': {'metrics': [{'id': 'q1', 'expression': 'SELECT MAX(CPUUtilization) ...'}]},
+            'alarmContributor': {'id': 'c1', 'attributes': {'InstanceId': 'i-7'}}
+        }
+
+        service.prefetch([alarm])
+
+        self.assertEqual(self.ec2.describe_instances.call_args[1]['Filters'][0]['Values'], ['i-7'])
+        self.assertEqual(service.lookup(alarm)['InstanceId=i-7']['owner'], 'payments')
+
+    def test_cache_hits_until_ttl_expires(self):
+        """Test repeated alarms cost no calls within the TTL, including for missing resources"""
+        service = self._service()
+        alarms = [_alarm(InstanceId='i-1'), _alarm(InstanceId='i-gone')]
+
+        service.prefetch(alarms)
+        service.prefetch(alarms)
+        self.assertEqual(self.ec2.describe_instances.call_count, 1)
+        self.assertEqual(service.lookup(alarms[1]), {})
+
+        self.now[0] = 61
+        service.prefetch(alarms)
+        self.assertEqual(self.ec2.describe_instances.call_count, 2)
+
+    def test_slow_lookup_bounded_by_timeout(self):
+        """Test a slow lookup returns after the timeout and fills the cache later"""
+        release = threading.Event()
+        describe = self.ec2.describe_instances.side_effect
+
+        def slow_describe(**kwargs):
+            release.wait(5)
+            return describe(**kwargs)
+
+        self.ec2.describe_instances.side_effect = slow_describe
+        service = self._service(timeout_ms=50)
+        alarm = _alarm(InstanceId='i-1')
+
+        service.prefetch([alarm])
+        self.assertEqual(service.lookup(alarm), {})
+
+        release.set()
+        bootstrap.get_service('resource_context_pool', None).shutdown(wait=True)
+        self.assertIn('InstanceId=i-1', service.lookup(alarm))
+
+    def test_lookup_failure_falls_back(self):
+        """Test API errors leave alerts without resource context"""
+        self.ec2.describe_instances.side_effect = Exception('AccessDenied')
+        service = self._service()
+        alarm = _alarm(InstanceId='i-1')
+
+        service.prefetch([alarm])
+
+        self.assertEqual(service.lookup(alarm), {})
+
+    def test_failed_lookup_is_not_cached(self):
+        """Test a throttled lookup is tried again by the next alarm instead of cached as a miss"""
+        self.ec2.describe_instances.side_effect = [Exception('RequestLimitExceeded'),
+                                                   {'Reservations': [{'Instances': [_instance('i-1')]}]}]
+        service = self._service()
+        alarm = _alarm(InstanceId='i-1')
+
+        service.prefetch([alarm])
+        service.prefetch([alarm])
+
+        self.assertEqual(self.ec2.describe_instances.call_count, 2)
+        self.assertEqual(service.lookup(alarm)['InstanceId=i-1']['owner'], 'payments')
+
+    def test_instances_described_200_per_call(self):
+        """Test instance ids stay within the EC2 limit of 200 filter values"""
+        service = self._service()
+        alarms = [_alarm(InstanceId=f"i-{n:04d}") for n in range(450)]
+
+        service.prefetch(alarms)
+
+        batches = [len(call[1]['Filters'][0]['Values']) for call in self.ec2.describe_instances.call_args_list]
+        self.assertEqual(sorted(batches), [50, 200, 200])
+
+    def test_lambda_and_rds_lookups(self):
+        """Test functions are resolved through the tagging API and databases through RDS"""
+        sts, tagging, rds = mock.Mock(), mock.Mock(), mock.Mock()
+        sts.get_caller_identity.return_value = {'Account': '123456789012'}
+        tagging.get_resources.return_value = {'ResourceTagMappingList': [{
+            'ResourceARN': 'arn:aws:lambda:us-east-1:123456789012:function:api',
+            'Tags': [{'Key': 'Team', 'Value': 'core'}]
+        }]}
+        rds.describe_db_instances.return_value = {'DBInstances': [{
+            'DBInstanceIdentifier': 'orders', 'Engine': 'postgres', 'TagList': []
+        }]}
+        for name, client in (('sts', sts), ('resourcegroupstaggingapi', tagging), ('rds', rds)):
+            bootstrap.set_client(name, client)
+
+        service = self._service()
+        service.region = 'us-east-1'
+        alarms = [_alarm(FunctionName='api'), _alarm(DBInstanceIdentifier='orders')]
+        service.prefetch(alarms)
+
+        self.assertEqual(service.lookup(alarms[0])['FunctionName=api']['owner'], 'core')
+        self.assertEqual(service.lookup(alarms[1])['DBInstanceIdentifier=orders']['engine'], 'postgres')
+
+    def test_disabled_with_zero_timeout(self):
+        """Test a zero timeout turns resource context off"""
+        service = self._service(timeout_ms=0)
+
+        service.prefetch([_alarm(InstanceId='i-1')])
+
+        self.ec2.describe_instances.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+"""
+Unit tests for the resource discoverer handler and its change events
+"""
+import io
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+from shared import inventory
+from resource_discoverer import handler as discoverer_handler
+from resource_discoverer.events import changes_from_event
+
+ACCOUNT = '111111111111'
+
+
+def _resource(resource_id, **fields):
+    return dict({'id': resource_id, 'account_id': ACCOUNT, 'region': 'us-east-1'}, **fields)
+
+
+def _cloudtrail(event_name, request=None, response=None, source='aws.lambda'):
+    return {
+        'source': source, 'detail-type': 'AWS API Call via CloudTrail', 'account': ACCOUNT, 'region': 'us-east-1',
+        'detail': {'eventName': event_name, 'awsRegion': 'us-east-1', 'recipientAccountId': ACCOUNT,
+                   'requestParameters': request or {}, 'responseElements': response}
+    }
+
+
+def _ec2_state(instance_id, state):
+    return {
+        'source': 'aws.ec2', 'detail-type': 'EC2 Instance State-change Notification',
+        'account': ACCOUNT, 'region': 'us-east-1', 'detail': {'instance-id': instance_id, 'state': state}
+    }
+
+
+class FakeS3:
+    """Just enough of S3 to hold objects in memory"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'missing'}}, 'GetObject')
+        return {'Body': io.BytesIO(self.objects[Key])}
+
+
+class TestChangeEvents(unittest.TestCase):
+    """Test cases for translating events into inventory changes"""
+
+    def test_lambda_create_and_delete(self):
+        """Test functions are upserted from the response and removed by name or ARN"""
+        upserts, _, _ = changes_from_event(_cloudtrail('CreateFunction20150331', response={'functionName': 'api'}))
+        _, removals, _ = changes_from_event(_cloudtrail(
+            'DeleteFunction20150331', request={'functionName': f"arn:aws:lambda:us-east-1:{ACCOUNT}:function:api"}
+        ))
+
+        self.assertEqual(upserts, {'lambda_functions': [_resource('api')]})
+        self.assertEqual(removals, {'lambda_functions': [_resource('api')]})
+
+    def test_rds_create_left_to_the_scan(self):
+        """Test created DB instances wait for the scan to see them available, while deletes apply at once"""
+        created = changes_from_event(_cloudtrail('CreateDBInstance', source='aws.rds', response={
+            'dBInstanceIdentifier': 'orders', 'engine': 'postgres', 'dBInstanceClass': 'db.t3.micro'
+        }))
+        _, removals, _ = changes_from_event(_cloudtrail(
+            'DeleteDBInstance', source='aws.rds', request={'dBInstanceIdentifier': 'orders'}
+        ))
+
+        self.assertEqual(created, ({}, {}, []))
+        self.assertEqual(removals, {'rds_instances': [_resource('orders')]})
+
+    def test_failed_calls_are_ignored(self):
+        """Test API calls that errored change nothing"""
+        event = _cloudtrail('CreateFunction20150331', request={'functionName': 'api'})
+        event['detail']['errorCode'] = 'AccessDenied'
+
+        self.assertEqual(changes_from_event(event), ({}, {}, []))
+
+
+class TestResourceDiscovererHandler(unittest.TestCase):
+    """Test cases for incremental updates and reconciliation"""
+
+    def setUp(self):
+        bootstrap.reset()
+        self.s3 = FakeS3()
+        bootstrap.set_client('s3', self.s3)
+        patcher = mock.patch.dict(os.environ, {'OBSERVABILITY_BUCKET': 'bucket'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.discovery = mock.Mock()
+        self.discovery.take_api_stats.return_value = ({}, {})
+        patcher = mock.patch.object(discoverer_handler, 'ResourceDiscoveryService', return_value=self.discovery)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        inventory.InventoryStore('resource_discoverer', bucket='bucket').save({
+            'ec2_instances': [_resource('i-1'), _resource('i-2')],
+            'lambda_functions': [_resource('api')]
+        })
+
+    def test_state_change_updates_inventory_without_scanning(self):
+        """Test a terminated instance is removed and nothing else is discovered"""
+        response = discoverer_handler.handler(_ec2_state('i-1', 'terminated'), None)
+
+        self.assertEqual(response['mode'], 'incremental')
+        self.assertEqual(response['delta'], {'added': {}, 'removed': {'ec2_instances': 1}, 'changed': {}})
+        self.discovery.discover_all_resources.assert_not_called()
+        latest = inventory.InventoryStore('resource_discoverer', bucket='bucket').latest()
+        self.assertEqual([r['id'] for r in latest['ec2_instances']], ['i-2'])
+
+    def test_running_instance_is_described(self):
+        """Test a newly running instance is looked up so it carries its tags"""
+        self.discovery.describe_ec2_instances.return_value = [_resource('i-3', tags={'Name': 'web'})]
+
+        response = discoverer_handler.handler(_ec2_state('i-3', 'running'), None)
+
+        self.discovery.describe_ec2_instances.assert_called_once_with(['i-3'], ACCOUNT, 'us-east-1')
+        changes = [r for chunk in inventory.read_delta('bucket', response['delta_location']['key']) for r in chunk]
+        self.assertEqual(changes, [_resource('i-3', tags={'Name': 'web'}, change='added', type='ec2_instances')])
+
+    def test_failed_describe_fails_the_event(self):
+        """Test a running instance that could not be described is retried rather than dropped"""
+        self.discovery.describe_ec2_instances.side_effect = Exception('Throttling')
+        snapshots = len(self.s3.objects)
+
+        with self.assertRaises(Exception):
+            discoverer_handler.handler(_ec2_state('i-3', 'running'), None)
+
+        self.assertEqual(len(self.s3.objects), snapshots)
+
+    def test_scheduled_scan_reconciles(self):
+        """Test the scheduled scan diffs a full discovery and skips the snapshot when nothing changed"""
+        self.discovery.discover_all_resources.return_value = ({
+            'ec2_instances': [_resource('i-1'), _resource('i-2')],
+            'lambda_functions': [_resource('api')]
+        }, [])
+        snapshots = len(self.s3.objects)
+
+        response = discoverer_handler.handler({'source': 'aws.events', 'detail-type': 'Scheduled Event'}, None)
+
+        self.assertEqual(response['mode'], 'reconciliation')
+        self.assertIsNone(response['snapshot'])
+        self.assertNotIn('delta_location', response)
+        self.assertEqual(len(self.s3.objects), snapshots)
+
+    def test_failed_scope_keeps_previous_resources(self):
+        """Test a scope whose scan failed is carried forward instead of reported removed"""
+        self.discovery.discover_all_resources.return_value = (
+            {'ec2_instances': [_resource('i-1'), _resource('i-2')], 'lambda_functions': []},
+            [{'type': 'lambda_functions', 'account_id': ACCOUNT, 'region': 'us-east-1'}]
+        )
+
+        response = discoverer_handler.handler({'source': 'aws.events', 'detail-type': 'Scheduled Event'}, None)
+
+        self.assertEqual(response['delta'], {'added': {}, 'removed': {}, 'changed': {}})
+        latest = inventory.InventoryStore('resource_discoverer', bucket='bucket').latest()
+        self.assertEqual(latest['lambda_functions'], [_resource('api')])
+
+    def test_failure_is_raised_for_retry(self):
+        """Test a failed scan fails the invocation instead of returning an error payload"""
+        self.discovery.discover_all_resources.side_effect = Exception('AccessDenied')
+
+        with self.assertRaises(Exception):
+            discoverer_handler.handler({'source': 'aws.events', 'detail-type': 'Scheduled Event'}, None)
+
+    def test_construction_error_is_not_masked(self):
+        """Test a service that fails to build surfaces its own error, not one from the stats"""
+        with mock.patch.object(discoverer_handler, 'ResourceDiscoveryService', side_effect=[ValueError('bad config'), RuntimeError('stats')]):
+            with self.assertRaisesRegex(ValueError, 'bad config'):
+                discoverer_handler.handler({'source': 'aws.events', 'detail-type': 'Scheduled Event'}, None)
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_api_call_stats_published_as_emf(self, stdout):
+        """Test per-operation call counts and durations become metrics"""
+        self.discovery.discover_all_resources.return_value = ({}, [])
+        self.discovery.take_api_stats.return_value = ({'DescribeInstances': 3}, {'DescribeInstances': 42.0})
+
+        discoverer_handler.handler({'source': 'aws.events', 'detail-type': 'Scheduled Event'}, None)
+
+        document = json.loads(stdout.getvalue().strip().splitlines()[-1])
+        self.assertEqual(document['_aws']['CloudWatchMetrics'][0]['Namespace'], 'Observability/ResourceDiscovery')
+        self.assertEqual(document['DescribeInstancesCalls'], [3])
+        self.assertEqual(document['DescribeInstancesMs'], [42.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
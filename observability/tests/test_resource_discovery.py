@@ -0,0 +1,166 @@
+"""
+Unit tests for the dashboard updater resource discovery service
+"""
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from shared import bootstrap
+from dashboard_updater.services.resource_discovery import ResourceDiscoveryService
+
+HOME_ACCOUNT = '111111111111'
+MEMBER_ACCOUNT = '222222222222'
+MEMBER_ROLE = f"arn:aws:iam::{MEMBER_ACCOUNT}:role/OrganizationAccountAccessRole"
+
+
+def _client(operation, pages, gate=None, **other_pages):
+    """Client whose paginator for operation (and any other_pages) yields pages
+
+    gate, when given, is called before the first page of operation.
+    """
+    def paginator_for(pages, gate=None):
+        def paginate(**kwargs):
+            if gate:
+                gate()
+            for page in pages:
+                yield page
+
+        paginator = mock.Mock()
+        paginator.paginate.side_effect = paginate
+        return paginator
+
+    paginators = {name: paginator_for(pages) for name, pages in other_pages.items()}
+    paginators[operation] = paginator_for(pages, gate)
+    client = mock.Mock()
+    client.get_paginator.side_effect = lambda name: paginators.get(name)
+    return client
+
+
+class TestResourceDiscoveryService(unittest.TestCase):
+    """Test cases for ResourceDiscoveryService"""
+
+    def setUp(self):
+        bootstrap.reset()
+        sts = mock.Mock()
+        sts.get_caller_identity.return_value = {'Account': HOME_ACCOUNT}
+        bootstrap.set_client('sts', sts)
+
+        patcher = mock.patch.dict(os.environ, {'AWS_REGION': 'us-east-1'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ('DISCOVERY_ACCOUNTS', 'DISCOVERY_REGIONS'):
+            os.environ.pop(name, None)
+
+    def _install(self, region='us-east-1', role_arn=None, gate=None):
+        clients = {
+            'ec2': _client('describe_instances', [
+                {'Reservations': [{'Instances': [{'InstanceId': 'i-1'}]}]},
+                {'Reservations': [{'Instances': [{'InstanceId': 'i-2'}, {'InstanceId': 'i-3'}]}]}
+            ], gate),
+            'lambda': _client('list_functions', [
+                {'Functions': [{'FunctionName': 'api'}]},
+                {'Functions': [{'FunctionName': 'worker'}]}
+            ], gate),
+            'ecs': _client('list_clusters', [
+                {'clusterArns': ['arn:aws:ecs:us-east-1:111111111111:cluster/web']}
+            ], gate, list_services=[{'serviceArns': []}]),
+            'rds': _client('describe_db_instances', [
+                {'DBInstances': [
+                    {'DBInstanceIdentifier': 'orders', 'DBInstanceStatus': 'available'},
+                    {'DBInstanceIdentifier': 'old', 'DBInstanceStatus': 'deleting'}
+                ]}
+            ], gate)
+        }
+        for name, client in clients.items():
+            bootstrap.set_client(name, client, region_name=region, role_arn=role_arn)
+        return clients
+
+    def test_discovers_every_page(self):
+        """Test all pages of every service are collected and tagged"""
+        self._install()
+
+        resources, _ = ResourceDiscoveryService().discover_all_resources()
+
+        self.assertEqual([r['id'] for r in resources['ec2_instances']], ['i-1', 'i-2', 'i-3'])
+        self.assertEqual([r['id'] for r in resources['lambda_functions']], ['api', 'worker'])
+        self.assertEqual(resources['ecs_clusters'], [{'id': 'web', 'account_id': HOME_ACCOUNT, 'region': 'us-east-1'}])
+        self.assertEqual([r['id'] for r in resources['rds_instances']], ['orders'])
+
+    def test_services_discovered_concurrently(self):
+        """Test every service is being discovered at the same time"""
+        # No discoverer gets its first page until all five (ECS clusters and services both list clusters) ask
+        all_running = threading.Barrier(5, timeout=5)
+        self._install(gate=all_running.wait)
+
+        resources, failed = ResourceDiscoveryService().discover_all_resources()
+
+        self.assertEqual(failed, [])
+        self.assertEqual(len(resources['rds_instances']), 1)
+
+    def test_failed_service_reported_as_failed_scope(self):
+        """Test one failing service does not fail the whole pass and is reported as failed"""
+        clients = self._install()
+        clients['rds'].get_paginator.side_effect = Exception('Throttling')
+
+        resources, failed = ResourceDiscoveryService().discover_all_resources()
+
+        self.assertEqual(resources['rds_instances'], [])
+        self.assertEqual(len(resources['ecs_clusters']), 1)
+        self.assertEqual(failed, [{'type': 'rds_instances', 'account_id': HOME_ACCOUNT, 'region': 'us-east-1'}])
+
+    def test_ecs_services_described_in_batches(self):
+        """Test services are listed per cluster and described ten at a time"""
+        self._install()
+        arns = [f"arn:aws:ecs:us-east-1:111111111111:service/web/svc-{n:02d}" for n in range(25)]
+        ecs = _client('list_clusters', [{'clusterArns': ['arn:aws:ecs:us-east-1:111111111111:cluster/web']}],
+                      list_services=[{'serviceArns': arns[:20]}, {'serviceArns': arns[20:]}])
+        ecs.describe_services.side_effect = lambda cluster, services, include: {'services': [
+            {'serviceName': arn.split('/')[-1], 'status': 'ACTIVE' if arn != arns[0] else 'DRAINING',
+             'launchType': 'FARGATE', 'desiredCount': 2, 'runningCount': 2}
+            for arn in services
+        ]}
+        bootstrap.set_client('ecs', ecs, region_name='us-east-1')
+
+        services = ResourceDiscoveryService().discover_all_resources()[0]['ecs_services']
+
+        self.assertEqual([len(call[1]['services']) for call in ecs.describe_services.call_args_list], [10, 10, 5])
+        self.assertEqual(len(services), 24)
+        self.assertEqual(services[0]['dimensions'], {'ClusterName': 'web'})
+
+    def test_api_calls_counted_per_operation(self):
+        """Test every page request is counted under its API name"""
+        self._install()
+        service = ResourceDiscoveryService()
+
+        service.discover_all_resources()
+        calls, durations = service.take_api_stats()
+
+        self.assertEqual(calls['DescribeInstances'], 2)
+        self.assertEqual(calls['ListFunctions'], 2)
+        self.assertEqual(calls['DescribeDBInstances'], 1)
+        self.assertEqual(set(durations), set(calls))
+        self.assertEqual(service.take_api_stats(), ({}, {}))
+
+    def test_fans_out_across_accounts_and_regions(self):
+        """Test member accounts are scanned through the assumed role in every region"""
+        os.environ['DISCOVERY_ACCOUNTS'] = f"{HOME_ACCOUNT},{MEMBER_ACCOUNT}"
+        os.environ['DISCOVERY_REGIONS'] = 'us-east-1,eu-west-1'
+        for region in ('us-east-1', 'eu-west-1'):
+            self._install(region)
+            self._install(region, role_arn=MEMBER_ROLE)
+
+        resources, _ = ResourceDiscoveryService().discover_all_resources()
+
+        targets = {(r['account_id'], r['region']) for r in resources['ecs_clusters']}
+        self.assertEqual(targets, {
+            (HOME_ACCOUNT, 'us-east-1'), (HOME_ACCOUNT, 'eu-west-1'),
+            (MEMBER_ACCOUNT, 'us-east-1'), (MEMBER_ACCOUNT, 'eu-west-1')
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
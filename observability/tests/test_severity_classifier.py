@@ -0,0 +1,96 @@
+"""
+Unit tests for the severity classification engine
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from alert_processor.services.severity_classifier import DEFAULT_RULES, KeywordAutomaton, SeverityClassifier
+
+
+class TestKeywordAutomaton(unittest.TestCase):
+    """Test cases for the Aho-Corasick matcher"""
+
+    def test_overlapping_keywords(self):
+        """Test every keyword occurrence is reported, including suffix matches"""
+        automaton = KeywordAutomaton()
+        for keyword_id, keyword in enumerate(['he', 'she', 'his', 'hers']):
+            automaton.add(keyword, keyword_id)
+        automaton.build()
+
+        self.assertEqual(sorted(automaton.search('ushers')), [0, 1, 3])
+
+
+class TestSeverityClassifier(unittest.TestCase):
+    """Test cases for SeverityClassifier"""
+
+    def test_default_rules_match_previous_behaviour(self):
+        """Test the built-in keywords keep their original priority"""
+        classifier = SeverityClassifier()
+
+        self.assertEqual(classifier.classify('API-Outage-Error'), 'critical')
+        self.assertEqual(classifier.classify('lambda-timeout'), 'high')
+        self.assertEqual(classifier.classify('queue-slow-consumers'), 'medium')
+        self.assertEqual(classifier.classify('disk-usage'), 'low')
+
+    def test_scoped_rules(self):
+        """Test team, namespace and dimension narrow where a rule applies"""
+        classifier = SeverityClassifier([
+            {'severity': 'critical', 'keywords': ['latency'], 'team': 'payments'},
+            {'severity': 'high', 'keywords': ['latency'], 'namespace': 'AWS/Lambda', 'dimension': 'FunctionName'},
+            {'severity': 'medium', 'keywords': ['latency']}
+        ])
+
+        self.assertEqual(classifier.classify('p99-latency', team='payments'), 'critical')
+        self.assertEqual(classifier.classify('p99-latency', 'AWS/Lambda', ['FunctionName']), 'high')
+        self.assertEqual(classifier.classify('p99-latency', 'AWS/Lambda', ['Resource']), 'medium')
+        self.assertEqual(classifier.classify('p99-latency', team='search'), 'medium')
+
+    def test_results_are_memoized(self):
+        """Test repeated alarm names are served from the LRU cache"""
+        classifier = SeverityClassifier(cache_size=2)
+        classifier.classify('db-down')
+        classifier.classify('db-down')
+
+        self.assertEqual(classifier.cache_info().hits, 1)
+
+    def test_invalid_severity(self):
+        """Test unknown severities are rejected at compile time"""
+        with self.assertRaises(ValueError):
+            SeverityClassifier([{'severity': 'urgent', 'keywords': ['x']}])
+
+    def test_from_config_file(self):
+        """Test rules and default severity are loaded from SEVERITY_RULES_FILE"""
+        config = {'default_severity': 'medium', 'rules': [{'severity': 'high', 'keywords': ['5xx']}]}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config_file:
+            json.dump(config, config_file)
+        self.addCleanup(os.remove, config_file.name)
+
+        with mock.patch.dict(os.environ, {'SEVERITY_RULES_FILE': config_file.name}):
+            classifier = SeverityClassifier.from_config()
+
+        self.assertEqual(classifier.classify('alb-5xx'), 'high')
+        self.assertEqual(classifier.classify('alb-down'), 'medium')
+
+    def test_invalid_config_falls_back_to_defaults(self):
+        """Test a bad rule in the configuration never stops classification"""
+        for rules in ([{'severity': 'urgent', 'keywords': ['x']}], [{'severity': 'high'}],
+                      [{'severity': 'high', 'keywords': 'error'}]):
+            with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config_file:
+                json.dump({'rules': rules}, config_file)
+            self.addCleanup(os.remove, config_file.name)
+
+            with mock.patch.dict(os.environ, {'SEVERITY_RULES_FILE': config_file.name}):
+                classifier = SeverityClassifier.from_config()
+
+            self.assertEqual(classifier.rule_count, len(DEFAULT_RULES))
+            self.assertEqual(classifier.classify('api-outage'), 'critical')
+
+
+if __name__ == '__main__':
+    unittest.main()